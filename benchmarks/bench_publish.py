@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+publish_report.py ベンチマーク（ローカルスタブサーバー使用）
+
+合成レポートを規模別に生成し、stub_server.py に向けた publish_report.py を
+別プロセスで実行して、壁時計時間・API リクエスト数・429 件数・Notion 制限
+違反数を計測する。結果は JSON で benchmarks/results/ に保存し、--compare で
+過去の結果と比較できる。
+
+モード:
+  flat     — 1ページに全ブロック（既定の公開方法）
+  sections — 見出しごとの子ページを並列アップロード（NOTION_LAYOUT=sections）
+  upsert   — 当日ページの差分更新（同じ内容で2回目の実行を計測）
+
+Usage:
+    python3 benchmarks/bench_publish.py --lines 200,400,800,1600
+    python3 benchmarks/bench_publish.py --latency-ms 300 --throttle 0.05 \\
+        --compare benchmarks/results/publish-xxx.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run_benchmarks import git_revision  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+REPORT_NAME = "レポート-2026-02-27.md"
+MODES = ["flat", "sections", "upsert"]
+CHANNELS = ["TOP", "LIS", "DIS", "FAX・EDM", "その他"]
+
+
+# ================================================================
+# 合成レポート
+# ================================================================
+
+def synthetic_report(n_lines, seed=0):
+    """本番レポートと同じ構成要素（見出し・表・箇条書き・番号付きリスト）で
+    n_lines 行程度の Markdown を作る。"""
+    rng = random.Random(seed)
+    lines = ["# デモ電話チーム 月次進捗レポート（2026年02月）",
+             "データ取得日: 2026-02-27 ｜ 参照期間: 2026-02-01 〜 2026-02-27", "",
+             "## 1. エグゼクティブサマリ", "",
+             "着電は全体109%で目標クリアだが、**SAL全体94%・商談実施96%と後工程が未達**。", ""]
+    section = 1
+    while len(lines) < n_lines:
+        section += 1
+        lines += ["---", "", f"## {section}. セクション{section}", ""]
+        for sub in range(1, rng.randint(3, 6)):
+            lines += [f"### {section}-{sub}. 分析{sub}", ""]
+            lines.append("| チャネル | リード数 | CN率 | SAL率 | 前月比 | 判定 |")
+            lines.append("|---|---|---|---|---|---|")
+            for ch in CHANNELS + ["全体"] * rng.randint(0, 1):
+                lines.append(f"| {ch} | {rng.randint(50, 900)} | {rng.uniform(20, 70):.1f}% | "
+                             f"{rng.uniform(0, 50):.1f}% | {rng.uniform(-30, 30):+.1f}pp | "
+                             f"{rng.choice(['🟢', '🟡', '🔴'])} |")
+            lines += ["", f"※ 前月同期間との比較。対象 {rng.randint(1000, 5000)} 件", ""]
+            for _ in range(rng.randint(2, 5)):
+                ch = rng.choice(CHANNELS)
+                lines.append(f"- **{ch}**: CN率{rng.uniform(20, 70):.1f}%"
+                             f"({rng.uniform(-15, 15):+.1f}pp)、SAL率は前月並み")
+            lines.append("")
+        lines += ["### 考察", ""]
+        for i in range(1, rng.randint(3, 5)):
+            lines.append(f"{i}. **【重要】施策{i}**")
+            lines.append("   - 対象: CVコンテンツの見直し")
+            lines.append(f"   - 期待効果: SAL+{rng.randint(1, 9)}件/月")
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+# ================================================================
+# 計測
+# ================================================================
+
+def run_publish(workdir, server, mode):
+    """publish_report.py を1回実行 → (壁時計秒, スタブの集計)"""
+    env = {k: v for k, v in os.environ.items()
+           if not k.startswith(("NOTION_", "SLACK_", "PUBLISH_"))}
+    env.update(server.env())
+    if mode == "sections":
+        env["NOTION_LAYOUT"] = "sections"
+    elif mode == "upsert":
+        env["NOTION_PAGE_MODE"] = "day"
+    cmd = [sys.executable, str(ROOT / "scripts" / "publish_report.py")]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0 or "Publish error" in proc.stderr:
+        raise RuntimeError(f"publish_report.py failed: {proc.stderr}")
+    return elapsed, server.stats()
+
+
+def bench_size(workdir, server, n_lines, modes, repeat):
+    reports = Path(workdir) / "reports"
+    reports.mkdir(parents=True, exist_ok=True)
+    report = reports / REPORT_NAME
+    report.write_text(synthetic_report(n_lines), encoding="utf-8")
+
+    results = {}
+    for mode in modes:
+        best = None
+        for _ in range(repeat):
+            for f in reports.glob("*.notion.json"):
+                f.unlink()  # チェックポイントによる再利用を避ける
+            server.reset()
+            if mode == "upsert":
+                run_publish(workdir, server, mode)  # 1回目でページを作成
+            elapsed, stats = run_publish(workdir, server, mode)
+            if best is None or elapsed < best["wall_s"]:
+                best = {"wall_s": elapsed, **{k: stats[k] for k in (
+                    "total_requests", "throttled", "violations", "blocks", "pages",
+                    "slack_messages", "requests")}}
+                if stats["violations"]:
+                    best["violation_samples"] = stats["violation_samples"]
+        results[mode] = best
+        print(f"  {mode:<9} {best['wall_s']:6.2f}s, {best['total_requests']:4d} req "
+              f"(429: {best['throttled']}), 違反 {best['violations']}")
+    return {"lines": n_lines, "bytes": report.stat().st_size, "modes": results}
+
+
+# ================================================================
+# 結果の保存・比較
+# ================================================================
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_by_lines = {r["lines"]: r for r in baseline["results"]}
+    print(f"\n比較: {baseline_path} (rev {baseline.get('git_rev', '?')})")
+    for r in current["results"]:
+        b = base_by_lines.get(r["lines"])
+        if not b:
+            continue
+        print(f"  lines={r['lines']:,}")
+        for mode, m in r["modes"].items():
+            bm = b["modes"].get(mode)
+            if bm:
+                print(f"    {mode:<9} {bm['wall_s']:6.2f}s → {m['wall_s']:6.2f}s "
+                      f"({m['wall_s'] / bm['wall_s']:5.2f}x), req "
+                      f"{bm['total_requests']} → {m['total_requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="publish_report.py ベンチマーク")
+    parser.add_argument("--lines", default="200,400,800,1600",
+                        help="合成レポートの行数（カンマ区切り）")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help=f"計測するモード（{', '.join(MODES)}）")
+    parser.add_argument("--latency-ms", type=float, default=150.0,
+                        help="スタブの1リクエストあたり固定遅延")
+    parser.add_argument("--per-block-ms", type=float, default=1.0,
+                        help="スタブの送信ブロック1件あたり追加遅延")
+    parser.add_argument("--throttle", type=float, default=0.0, help="429 を返す確率")
+    parser.add_argument("--repeat", type=int, default=1, help="試行回数（最短値を採用）")
+    parser.add_argument("--output", help="結果JSONの出力先")
+    parser.add_argument("--compare", help="比較対象の過去の結果JSON")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.lines.split(",") if s]
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    results = []
+    with StubServer(latency_ms=args.latency_ms, per_block_ms=args.per_block_ms,
+                    throttle=args.throttle) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        for n_lines in sizes:
+            print(f"lines={n_lines:,} 計測中...")
+            results.append(bench_size(workdir, server, n_lines, modes, args.repeat))
+
+    report = {
+        "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stub": {"latency_ms": args.latency_ms, "per_block_ms": args.per_block_ms,
+                 "throttle": args.throttle},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"publish-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果: {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用 合成データ生成スクリプト
+
+本番エクスポートと同じスキーマの Q1-Q6 CSV を、任意の規模で生成する。
+出力は data/ と同じレイアウト（{out}/{date}/{prefix}-{date}.csv）。
+
+Usage:
+    python3 benchmarks/generate_data.py --out /tmp/bench-data --date 2026-02-27 \\
+        --leads 100000 --reps 20 --cv-contents 200
+"""
+
+import argparse
+import csv
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from compute_tables import (  # noqa: E402
+    CHANNEL_ORDER, CHANNELS, CSV_PREFIXES, IS_REPS, OUTSOURCE_REPS,
+    Q4_REQUIRED, Q5_REQUIRED,
+)
+
+# ================================================================
+# 定数
+# ================================================================
+
+LANDING_HEADER = [
+    "lead_date", "dimension", "daily_leads", "cumulative_actual",
+    "landing_forecast", "monthly_target", "achievement_pct",
+]
+
+Q5_HEADER = [
+    "created_date_jst", "f_initial_deal_acquisition_date",
+    "business_hours_class", "is_holiday", "user_name",
+] + [c for c in Q5_REQUIRED if c != "created_date_jst"]
+
+# Q6 は本番と同じ 131 カラム。集計で使うのは first_meeting_date と
+# inflow_route_media_lasttouch のみで、他はパース負荷を再現するための埋め草。
+Q6_HEADER = (
+    "account_id,business_meeting_scheduled_date,business_meeting_scheduled_date_jst,"
+    "campaign_id,campaign_member_id,campaign_name,client_id,cm_customer_class_summary,"
+    "cm_customer_classification_fy25_3q,cm_number_of_offices,company_name,"
+    "contact_customer_class_fy25_3q,contact_customer_class_summary,contact_email,"
+    "contact_exhibition_memo,contact_first_name,contact_id,contact_last_name,"
+    "contact_personal_flag,contact_phone,contact_reasons_for_ineligible_leads,"
+    "contact_registration_status,contact_stage_name,created_date,created_date_jst,"
+    "cv_content_general_lasttouch,cv_content_sub_lasttouch,department,do_not_call,"
+    "duplication_record,email,estimated_arpa,estimated_arpu,"
+    "exhibition_lead_classification,existing_flags,f_initial_deal_acquisition_date,"
+    "f_initial_deal_acquisition_date_flg,f_initial_deal_acquisition_date_jst,"
+    "first_meeting_date,first_meeting_date_comming,first_meeting_date_flg,"
+    "first_meeting_date_jst,first_month_mrr,first_name,first_payment_month,flg_issue,"
+    "freemium_flag,ga4_client_id_first_touch,ga4_client_id_last_touch,"
+    "ga4_session_id_first_touch,ga4_session_id_last_touch,industry,"
+    "inflow_route_general_lasttouch,inflow_route_media_lasttouch,inflow_route_pd,"
+    "inflow_route_pd_lasttouch,inflow_route_sub_lasttouch,inflow_route_sub_lasttouch__v2,"
+    "inflow_route_summary,initial_browsing_page,initial_browsing_page_nonparam,"
+    "inquiry_date_and_time,introducer,is_deleted,is_first_meeting_date_comming,is_needs,"
+    "is_nextaction_date,is_owner,jsic_level1,jsic_level2,kojin_flag,landing_page_url,"
+    "landing_page_url_last_touch,last_modified_date,last_name,max_mrr_after_3rd_month,"
+    "max_mrr_month,media_name_pd,media_name_pd_lasttouch,median_mrr_after_3rd_month,"
+    "min_mrr_after_3rd_month,min_mrr_month,monthly_call_count_int,name,no,"
+    "number_of_call_per_day,number_of_call_per_month,number_of_offices,"
+    "number_of_offices_formula,number_of_offices_formula_rev,opportunity_id,"
+    "paid_start_date,paid_start_date_flg,phone,phone_challenges_resolved_2,"
+    "previous_browsing_page,product_last_touch,reasons_not_negotiated,"
+    "registration_status,sansan_corporate_number,sansan_industry_major_category,"
+    "sansan_industry_medium_classification,scheduled_initialdead_interval_days,"
+    "scheduled_initialdead_interval_days_category,sci_tdb_tdb_major_industrial_class_name,"
+    "sci_tdb_tdb_middle_industrial_class_name,second_month_mrr,second_payment_month,"
+    "signal_classification,signal_last_session,stage_name,territory_fy26,"
+    "territory_fy26_re,third_month_mrr,third_payment_month,"
+    "tier_classification_campaign_member,tier_classification_summary,tier_plg,"
+    "upper_flag,usage_scene_lasttouch,use_start_date,utm_campaign_last_touch,"
+    "utm_campaign_last_touch__v2,utm_content_last_touch,utm_content_last_touch__v2,"
+    "utm_medium_last_touch,utm_medium_last_touch__v2,utm_source_last_touch,"
+    "utm_source_last_touch__v2,utm_term_last_touch,utm_term_last_touch__v2"
+).split(",")
+
+CHANNEL_WEIGHTS = [4470, 4424, 7050, 2768, 1614]  # TOP, LIS, DIS, FAX・EDM, その他
+INELIGIBLE_REASONS = ["01_間違い電話", "02_既存顧客", "03_テスト", "04_データ重複"]
+INELIGIBLE_RATE = 0.07
+CONNECT_RATE = 0.45
+SAL_RATE = 0.12
+TASK_RATE = 0.03
+DUPLICATE_RATE = 0.04  # 同じ lead id が複数行に現れる割合（本番エクスポートと同程度）
+
+
+# ================================================================
+# 生成
+# ================================================================
+
+def rep_names(n):
+    """本番の分析対象担当者を含む n 人分の担当者名。"""
+    names = IS_REPS + OUTSOURCE_REPS
+    i = 0
+    while len(names) < n:
+        i += 1
+        names.append(f"担当者 {i:03d}")
+    return names[:max(n, 1)]
+
+
+def month_start(d, back):
+    y, m = d.year, d.month - back
+    while m <= 0:
+        y, m = y - 1, m + 12
+    return date(y, m, 1)
+
+
+def generate_leads(rng, end_date, n_leads, reps, cv_contents, months):
+    """Q4 相当の lead 行を新しい順に生成する。"""
+    start = month_start(end_date, months - 1)
+    span_days = (end_date - start).days + 1
+    cvs = [f"デモ電話_合成CV_{i:04d}" for i in range(cv_contents)]
+    # CVコンテンツの件数は本番同様に裾の長い分布（Zipf 風）にする
+    cv_cum = []
+    acc = 0.0
+    for i in range(cv_contents):
+        acc += 1.0 / (i + 1)
+        cv_cum.append(acc)
+    rows = []
+    for i in range(n_leads):
+        d = start + timedelta(days=rng.randrange(span_days))
+        ts = datetime(d.year, d.month, d.day, rng.randrange(24), rng.randrange(60),
+                      rng.randrange(60))
+        ch = rng.choices(CHANNELS, CHANNEL_WEIGHTS)[0]
+        connect = rng.random() < CONNECT_RATE
+        sal = connect and rng.random() < SAL_RATE
+        row = {
+            "id": f"00QSYN{i:012d}",
+            "reasons_for_ineligible_leads": (
+                rng.choice(INELIGIBLE_REASONS) if rng.random() < INELIGIBLE_RATE else ""
+            ),
+            "inflow_route_media": ch,
+            "cv_content_sub__c": rng.choices(cvs, cum_weights=cv_cum)[0],
+            "is_connect": "1" if connect else "0",
+            "is_sal": "1" if sal else "0",
+            "is_task_complete": "完了" if rng.random() < TASK_RATE else "未完了",
+            "created_date_jst": ts.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "month": f"{d.year}-{d.month:02d}-01",
+            "business_hours_class": (
+                "営業時間内(10_19)" if 10 <= ts.hour < 19 else "営業時間外"
+            ),
+            "is_holiday": "休日" if d.weekday() >= 5 else "平日",
+            "phone_type_flag": "携帯" if rng.random() < 0.86 else "固定電話",
+            "user_name": rng.choice(reps),
+        }
+        rows.append(row)
+        if rng.random() < DUPLICATE_RATE:
+            dup = dict(row)
+            dup["user_name"] = rng.choice(reps)
+            rows.append(dup)
+    rows.sort(key=lambda r: r["created_date_jst"], reverse=True)
+    return rows
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=header, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def q5_rows(rng, leads):
+    out = []
+    for r in leads:
+        sal = r["is_sal"] == "1"
+        bucket = rng.randrange(7) if sal else -1
+        out.append({
+            "created_date_jst": r["created_date_jst"],
+            "f_initial_deal_acquisition_date": "",
+            "business_hours_class": r["business_hours_class"],
+            "is_holiday": r["is_holiday"],
+            "user_name": r["user_name"],
+            "demo_call_type_summary_v2": r["inflow_route_media"],
+            "cv_content_sub__c": r["cv_content_sub__c"],
+            "total_leads": "1",
+            "total_sal": "1" if sal else "0",
+            "sal_within_1d": "1" if bucket == 0 else "0",
+            "sal_within_3d": "1" if bucket == 1 else "0",
+            "sal_7d_diff": "1" if bucket == 2 else "0",
+            "sal_14d_diff": "1" if bucket == 3 else "0",
+            "sal_21d_diff": "1" if bucket == 4 else "0",
+            "sal_30d_diff": "1" if bucket == 5 else "0",
+            "sal_after_30d": "1" if bucket == 6 else "0",
+        })
+    return out
+
+
+def q6_rows(rng, leads, end_date):
+    out = []
+    for r in leads:
+        if r["is_sal"] != "1":
+            continue
+        created = datetime.strptime(r["created_date_jst"][:10], "%Y-%m-%d").date()
+        meeting = min(created + timedelta(days=rng.randrange(1, 21)), end_date)
+        i = len(out)
+        out.append({
+            "account_id": f"001SYN{i:012d}",
+            "campaign_member_id": f"00vSYN{i:012d}",
+            "company_name": f"株式会社サンプル{i}",
+            "contact_email": f"user{i}@example.com",
+            "contact_phone": f"03-0000-{i % 10000:04d}",
+            "created_date_jst": r["created_date_jst"],
+            "cv_content_sub_lasttouch": r["cv_content_sub__c"],
+            "first_meeting_date": meeting.isoformat(),
+            "inflow_route_media_lasttouch": r["inflow_route_media"],
+            "opportunity_id": f"006SYN{i:012d}",
+            "stage_name": "商談実施",
+        })
+    return out
+
+
+def landing_rows(leads, end_date, metric):
+    """Q1-Q3 相当の日次 x チャネル 着地予測行を、当月分の lead から組み立てる。"""
+    month = f"{end_date.year}-{end_date.month:02d}"
+    days_in_month = (month_start(end_date, -1) - timedelta(days=1)).day
+    daily = {}
+    for r in leads:
+        if r["created_date_jst"][:7] != month or r["reasons_for_ineligible_leads"]:
+            continue
+        if metric == "sal" and r["is_sal"] != "1":
+            continue
+        if metric == "meeting" and not (r["is_sal"] == "1" and r["id"][-1] in "02468"):
+            continue
+        key = (r["created_date_jst"][:10], r["inflow_route_media"])
+        daily[key] = daily.get(key, 0) + 1
+
+    out = []
+    for dim in CHANNEL_ORDER:
+        cum = 0
+        target = None
+        for day in range(1, end_date.day + 1):
+            ds = f"{month}-{day:02d}"
+            n = sum(v for (d, ch), v in daily.items()
+                    if d == ds and (dim == "全体" or ch == dim))
+            cum += n
+            if target is None:
+                total = sum(v for (d, ch), v in daily.items() if dim == "全体" or ch == dim)
+                target = max(int(total / end_date.day * days_in_month * 1.05), 1)
+            forecast = cum / day * days_in_month if day > 1 else None
+            out.append({
+                "lead_date": ds,
+                "dimension": dim,
+                "daily_leads": n,
+                "cumulative_actual": cum,
+                "landing_forecast": f"{forecast:.2f}" if forecast is not None else "",
+                "monthly_target": target,
+                "achievement_pct": (
+                    f"{forecast / target:.2f}" if forecast is not None else ""
+                ),
+            })
+    return out
+
+
+def generate(out_dir, date_str, n_leads, n_reps=20, cv_contents=200, months=12,
+             seed=0):
+    """out_dir/{date_str}/ に Q1-Q6 の合成CSVを書き出し、そのディレクトリを返す。"""
+    rng = random.Random(seed)
+    end_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    leads = generate_leads(rng, end_date, n_leads, rep_names(n_reps), cv_contents, months)
+
+    day_dir = Path(out_dir) / date_str
+    day_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(qid):
+        return day_dir / f"{CSV_PREFIXES[qid]}-{date_str}.csv"
+
+    write_csv(path("q4"), Q4_REQUIRED, leads)
+    write_csv(path("q5"), Q5_HEADER, q5_rows(rng, leads))
+    write_csv(path("q6"), Q6_HEADER, q6_rows(rng, leads, end_date))
+    write_csv(path("q1"), LANDING_HEADER, landing_rows(leads, end_date, "call"))
+    write_csv(path("q2"), LANDING_HEADER, landing_rows(leads, end_date, "sal"))
+    write_csv(path("q3"), LANDING_HEADER, landing_rows(leads, end_date, "meeting"))
+    return day_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成 Q1-Q6 CSV を生成する")
+    parser.add_argument("--out", required=True, help="出力データディレクトリ")
+    parser.add_argument("--date", default="2026-02-27", help="データ日付 (YYYY-MM-DD)")
+    parser.add_argument("--leads", type=int, default=20000, help="lead 数")
+    parser.add_argument("--reps", type=int, default=20, help="担当者数")
+    parser.add_argument("--cv-contents", type=int, default=200, help="CVコンテンツ数")
+    parser.add_argument("--months", type=int, default=12, help="履歴の月数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+
+    day_dir = generate(args.out, args.date, args.leads, args.reps, args.cv_contents,
+                       args.months, args.seed)
+    print(f"生成完了: {day_dir}/")
+
+
+if __name__ == "__main__":
+    main()
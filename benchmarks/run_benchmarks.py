@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+compute_tables.py ベンチマーク
+
+合成データ（generate_data.py）を規模別に生成し、各 compute_step* 関数と
+compute_tables.py のエンドツーエンド実行を計測する。結果は JSON で
+benchmarks/results/ に保存し、--compare で過去の結果と比較できる。
+
+Usage:
+    python3 benchmarks/run_benchmarks.py --scales 10000,100000
+    python3 benchmarks/run_benchmarks.py --scales 10000 --compare benchmarks/results/xxx.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import compute_tables as ct  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+DATE = "2026-02-27"
+
+
+# ================================================================
+# 計測
+# ================================================================
+
+def best_of(func, repeat):
+    """func を repeat 回実行し、(最短秒, 最後の戻り値) を返す。"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def maxrss_bytes(ru_maxrss):
+    # Linux は KiB、macOS はバイト単位
+    return ru_maxrss if sys.platform == "darwin" else ru_maxrss * 1024
+
+
+def bench_steps(data_dir, repeat):
+    """読み込み〜各 compute_step* を個別に計測する（キャッシュなし）。"""
+    timings = {}
+    paths = {qid: ct.find_csv(data_dir, qid, DATE) for qid in ct.CSV_PREFIXES}
+
+    t, (q4, current_month) = best_of(lambda: ct.load_q4_window(paths["q4"]), repeat)
+    timings["load_q4_window"] = t
+    previous_month = ct.prev_month_str(current_month)
+    months = [current_month, previous_month]
+
+    t, q5 = best_of(lambda: ct.load_csv_projected(
+        paths["q5"], ct.Q5_REQUIRED,
+        keep=lambda r: r.created_date_jst[:7] in months), repeat)
+    timings["load_q5"] = t
+    t, q6 = best_of(lambda: ct.load_csv_projected(
+        paths["q6"], ct.Q6_REQUIRED,
+        keep=lambda r: r.first_meeting_date[:7] == previous_month), repeat)
+    timings["load_q6"] = t
+    t, q1 = best_of(lambda: ct.load_csv_snapshot(paths["q1"]), repeat)
+    timings["load_q1"] = t
+    q2 = ct.load_csv_snapshot(paths["q2"])
+    q3 = ct.load_csv_snapshot(paths["q3"])
+
+    t, cols = best_of(lambda: ct.Q4Columns.from_rows(q4.rows, months), repeat)
+    timings["Q4Columns.from_rows"] = t
+    t, cubes = best_of(lambda: ct.build_funnel_cubes(cols), repeat)
+    timings["build_funnel_cubes"] = t
+    timings["build_count_cubes"], _ = best_of(lambda: ct.build_count_cubes(cols), repeat)
+    if ct.np is not None:
+        timings["build_count_cubes[numpy]"], _ = best_of(
+            lambda: ct.build_count_cubes(cols, use_numpy=True), repeat)
+    cube_cur, cube_prev = cubes[current_month], cubes[previous_month]
+
+    fallback = ct.build_prev_actuals_from_q4(cube_prev)
+    q5_cur = ct.filter_q5(q5.rows, current_month)
+    q5_prev = ct.filter_q5(q5.rows, previous_month)
+
+    steps = {
+        "compute_step1_landing": lambda: ct.compute_step1_landing(
+            q1.rows, None, "着電", fallback),
+        "compute_step2_funnel": lambda: ct.compute_step2_funnel(cube_cur, cube_prev),
+        "compute_step2_sal_speed": lambda: ct.compute_step2_sal_speed(q5_cur, q5_prev),
+        "compute_step2_timeseries": lambda: ct.compute_step2_timeseries(cube_cur),
+        "compute_step2_user_summary": lambda: ct.compute_step2_user_summary(
+            cube_cur, cube_prev),
+        "compute_step2_user_channel": lambda: ct.compute_step2_user_channel(cube_cur),
+        "compute_step2_user_impact": lambda: ct.compute_step2_user_impact(cube_cur),
+        "compute_step2_user_weekly": lambda: ct.compute_step2_user_weekly(cube_cur),
+    }
+    for name, func in steps.items():
+        timings[name], _ = best_of(func, repeat)
+
+    _, funnel = best_of(steps["compute_step2_funnel"], 1)
+    timings["compute_step2_cv"], _ = best_of(
+        lambda: ct.compute_step2_cv(cube_cur, cube_prev, funnel[1]), repeat)
+    _, r1 = best_of(steps["compute_step1_landing"], 1)
+    r2 = ct.compute_step1_landing(q2.rows, None, "SAL", fallback)
+    r3 = ct.compute_step1_landing(q3.rows, None, "商談実施", fallback)
+    timings["compute_step1_issues"], _ = best_of(
+        lambda: ct.compute_step1_issues(r1[1], r2[1], r3[1]), repeat)
+
+    rows = {"q4_total": q4.total, "q4_window": len(q4.rows), "q5_total": q5.total,
+            "q6_total": q6.total}
+    return timings, rows
+
+
+def bench_end_to_end(data_dir, out_dir, extra_args=()):
+    """compute_tables.py を別プロセスで実行し、壁時計時間とピークRSSを計測する。"""
+    cmd = [
+        sys.executable, str(ROOT / "scripts" / "compute_tables.py"),
+        "--date", DATE, "--data-dir", str(data_dir), "--output-dir", str(out_dir),
+        *extra_args,
+    ]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"compute_tables.py failed: {proc.stderr.read().decode()}")
+    proc.stderr.close()
+    return {"wall_s": elapsed, "peak_rss_bytes": maxrss_bytes(rusage.ru_maxrss)}
+
+
+def run_scale(workdir, leads, reps, cv_contents, repeat):
+    data_dir = Path(workdir) / f"data-{leads}"
+    start = time.perf_counter()
+    generate(data_dir, DATE, leads, reps, cv_contents)
+    gen_s = time.perf_counter() - start
+
+    timings, rows = bench_steps(data_dir, repeat)
+    out_dir = Path(workdir) / f"computed-{leads}"
+    e2e = {
+        "cold": bench_end_to_end(data_dir, out_dir, []),
+        "warm_cache": bench_end_to_end(data_dir, out_dir, []),
+        "no_cache": bench_end_to_end(data_dir, out_dir, ["--no-cache"]),
+    }
+    return {
+        "leads": leads, "reps": reps, "cv_contents": cv_contents,
+        "generate_s": gen_s, "rows": rows, "steps_s": timings, "end_to_end": e2e,
+    }
+
+
+# ================================================================
+# 結果の保存・比較
+# ================================================================
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_by_leads = {r["leads"]: r for r in baseline["results"]}
+    print(f"\n比較: {baseline_path} (rev {baseline.get('git_rev', '?')})")
+    for r in current["results"]:
+        b = base_by_leads.get(r["leads"])
+        if not b:
+            continue
+        print(f"  leads={r['leads']:,}")
+        for name, t in r["steps_s"].items():
+            bt = b["steps_s"].get(name)
+            if bt:
+                print(f"    {name:<32} {bt * 1000:9.1f}ms → {t * 1000:9.1f}ms "
+                      f"({t / bt:5.2f}x)")
+        for mode, e in r["end_to_end"].items():
+            be = b["end_to_end"].get(mode)
+            if be:
+                print(f"    e2e {mode:<28} {be['wall_s']:8.2f}s → {e['wall_s']:8.2f}s "
+                      f"({e['wall_s'] / be['wall_s']:5.2f}x), RSS "
+                      f"{be['peak_rss_bytes'] / 2**20:.0f}MB → "
+                      f"{e['peak_rss_bytes'] / 2**20:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compute_tables.py ベンチマーク")
+    parser.add_argument("--scales", default="10000,100000",
+                        help="lead 数のカンマ区切り（例: 10000,100000,1000000,5000000）")
+    parser.add_argument("--reps", type=int, default=20, help="担当者数")
+    parser.add_argument("--cv-contents", type=int, default=200, help="CVコンテンツ数")
+    parser.add_argument("--repeat", type=int, default=3, help="各ステップの試行回数（最短値を採用）")
+    parser.add_argument("--workdir", help="合成データの出力先（省略時は一時ディレクトリ）")
+    parser.add_argument("--output", help="結果JSONの出力先")
+    parser.add_argument("--compare", help="比較対象の過去の結果JSON")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        results = []
+        for leads in scales:
+            print(f"leads={leads:,} 計測中...")
+            r = run_scale(workdir, leads, args.reps, args.cv_contents, args.repeat)
+            e2e = r["end_to_end"]["cold"]
+            print(f"  e2e(cold) {e2e['wall_s']:.2f}s, "
+                  f"peak RSS {e2e['peak_rss_bytes'] / 2**20:.0f}MB")
+            results.append(r)
+
+    report = {
+        "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果: {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Notion / Slack API のローカルスタブサーバー（publish_report.py の計測用）
+
+publish_report.py が使うエンドポイントだけを http.server で再現する。
+  - Notion: POST /v1/pages, POST /v1/databases/{id}/query,
+            GET/PATCH /v1/blocks/{id}/children, PATCH/DELETE /v1/blocks/{id}
+  - Slack:  POST /api/chat.postMessage, POST /hook/...（Incoming Webhook）
+
+応答遅延（固定 + ブロック数比例）と 429 の注入ができ、Notion の制限
+（children 100件・1リクエスト1000ブロック・rich_text 2000文字/100要素）に
+違反したリクエストは 400 validation_error を返して記録する。
+GET /_stats で集計を返し、POST /_reset で状態を消去する。
+
+Usage:
+    python3 benchmarks/stub_server.py --port 8765 --latency-ms 150 --throttle 0.05
+    NOTION_API_URL=http://127.0.0.1:8765/v1 SLACK_API_URL=http://127.0.0.1:8765/api \\
+        NOTION_API_KEY=stub SLACK_WEBHOOK_URL=http://127.0.0.1:8765/hook/x \\
+        python3 scripts/publish_report.py
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ================================================================
+# 定数（Notion API の制限）
+# ================================================================
+
+MAX_CHILDREN = 100
+MAX_REQUEST_BLOCKS = 1000
+MAX_RT_LEN = 2000
+MAX_RT_ITEMS = 100
+MAX_DEPTH = 2
+MAX_SLACK_TEXT = 40000
+
+DEFAULT_ANNOTATIONS = {
+    "bold": False, "italic": False, "strikethrough": False, "underline": False,
+    "code": False, "color": "default",
+}
+
+
+class ValidationError(Exception):
+    pass
+
+
+# ================================================================
+# 検証
+# ================================================================
+
+def _check_rich_text(rich_text, where):
+    if len(rich_text) > MAX_RT_ITEMS:
+        raise ValidationError(f"{where}.rich_text.length should be ≤ {MAX_RT_ITEMS}, "
+                              f"instead was {len(rich_text)}")
+    for rt in rich_text:
+        content = (rt.get("text") or {}).get("content", "")
+        if len(content) > MAX_RT_LEN:
+            raise ValidationError(f"{where}.rich_text.text.content.length should be "
+                                  f"≤ {MAX_RT_LEN}, instead was {len(content)}")
+
+
+def validate_children(children, depth=1, where="body.children"):
+    """children 配列を検証し、ネストを含むブロック数を返す。"""
+    if len(children) > MAX_CHILDREN:
+        raise ValidationError(f"{where}.length should be ≤ {MAX_CHILDREN}, "
+                              f"instead was {len(children)}")
+    if depth > MAX_DEPTH + 1:
+        raise ValidationError(f"{where}: nesting exceeds {MAX_DEPTH} levels")
+    total = 0
+    for i, block in enumerate(children):
+        btype = block.get("type")
+        body = block.get(btype)
+        if not btype or body is None:
+            raise ValidationError(f"{where}[{i}] should define a block type")
+        if "rich_text" in body:
+            _check_rich_text(body["rich_text"], f"{where}[{i}].{btype}")
+        if btype == "table_row":
+            for cell in body["cells"]:
+                _check_rich_text(cell, f"{where}[{i}].table_row.cells")
+        total += 1
+        kids = body.get("children", [])
+        if btype == "table":
+            if not kids:
+                raise ValidationError(f"{where}[{i}].table.children should be defined")
+            for row in kids:
+                if len(row["table_row"]["cells"]) != body.get("table_width"):
+                    raise ValidationError(f"{where}[{i}]: table_row cells must match "
+                                          f"table_width")
+        if kids:
+            total += validate_children(kids, depth + 1, f"{where}[{i}].{btype}.children")
+    return total
+
+
+# ================================================================
+# 状態
+# ================================================================
+
+class StubState:
+    """ページ・ブロックの木と集計。ハンドラスレッド間で lock を共有する。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._ids = itertools.count(1)
+        self.blocks = {}      # id -> {"type", "body", "children": [id], "parent"}
+        self.pages = {}       # id -> {"title", "database_id"}
+        self.requests = Counter()
+        self.throttled = 0
+        self.violations = []
+        self.slack_messages = 0
+
+    def new_id(self):
+        return f"{next(self._ids):08x}-0000-4000-8000-000000000000"
+
+    def store(self, block, parent):
+        bid = self.new_id()
+        btype = block["type"]
+        body = dict(block.get(btype) or {})
+        kids = body.pop("children", [])
+        if "rich_text" in body:
+            body["rich_text"] = _api_rich_text(body["rich_text"])
+        if btype == "table_row":
+            body["cells"] = [_api_rich_text(c) for c in body["cells"]]
+        self.blocks[bid] = {"type": btype, "body": body, "children": [], "parent": parent}
+        self.blocks[bid]["children"] = [self.store(k, bid) for k in kids]
+        return bid
+
+    def view(self, bid):
+        b = self.blocks[bid]
+        return {
+            "object": "block", "id": bid, "type": b["type"], b["type"]: b["body"],
+            "has_children": bool(b["children"]),
+        }
+
+    def stats(self):
+        return {
+            "requests": dict(self.requests),
+            "total_requests": sum(self.requests.values()),
+            "throttled": self.throttled,
+            "violations": len(self.violations),
+            "violation_samples": self.violations[:10],
+            "pages": len(self.pages),
+            "blocks": len(self.blocks) - len(self.pages),
+            "slack_messages": self.slack_messages,
+        }
+
+
+def _api_rich_text(rich_text):
+    """送信形式の rich_text を API の返却形式（annotations 全項目・plain_text 付き）にする"""
+    out = []
+    for rt in rich_text:
+        content = (rt.get("text") or {}).get("content", "")
+        annotations = dict(DEFAULT_ANNOTATIONS)
+        annotations.update(rt.get("annotations") or {})
+        out.append({
+            "type": "text", "text": {"content": content, "link": None},
+            "annotations": annotations, "plain_text": content, "href": None,
+        })
+    return out
+
+
+def _count_blocks(children):
+    total = 0
+    for block in children:
+        total += 1
+        total += _count_blocks((block.get(block.get("type")) or {}).get("children", []))
+    return total
+
+
+# ================================================================
+# ハンドラ
+# ================================================================
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "PublishStub/1.0"
+
+    def setup(self):
+        super().setup()
+        # ヘッダとボディの別送で Nagle 待ちが入らないようにする
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    # ---- 応答 ----
+
+    def _reply(self, status, payload, headers=None):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, code, message):
+        self._reply(status, {"object": "error", "status": status, "code": code,
+                             "message": message})
+
+    # ---- ディスパッチ ----
+
+    def _handle(self):
+        cfg = self.server.config
+        state = self.server.state
+        parts = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            return self._error(400, "invalid_json", "Body failed to parse as JSON")
+
+        if parts.path == "/_stats":
+            with state.lock:
+                return self._reply(200, state.stats())
+        if parts.path == "/_reset":
+            with state.lock:
+                state.reset()
+            return self._reply(200, {"ok": True})
+
+        route = re.sub(r"/[0-9a-f-]{36}|/[0-9A-Za-z]{20,}", "/{id}", parts.path)
+        with state.lock:
+            state.requests[f"{self.command} {route}"] += 1
+            throttled = cfg["rng"].random() < cfg["throttle"]
+            if throttled:
+                state.throttled += 1
+        if throttled:
+            time.sleep(cfg["latency"])
+            return self._reply(429, {"object": "error", "status": 429, "code": "rate_limited",
+                                     "message": "Rate limited"},
+                               {"Retry-After": str(cfg["retry_after"])})
+
+        children = body.get("children", []) if isinstance(body, dict) else []
+        time.sleep(cfg["latency"] + cfg["per_block"] * _count_blocks(children))
+
+        if parts.path.startswith("/v1/"):
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._error(401, "unauthorized", "API token is invalid.")
+            try:
+                if children:
+                    total = validate_children(children)
+                    if total > MAX_REQUEST_BLOCKS:
+                        raise ValidationError(f"body.children: request contains {total} "
+                                              f"blocks, limit is {MAX_REQUEST_BLOCKS}")
+                return self._notion(parts, body)
+            except ValidationError as e:
+                with state.lock:
+                    state.violations.append(f"{self.command} {route}: {e}")
+                return self._error(400, "validation_error", str(e))
+        if parts.path == "/api/chat.postMessage":
+            return self._slack_api(body)
+        if parts.path.startswith("/hook/"):
+            return self._slack_webhook(body)
+        return self._error(404, "object_not_found", f"No route for {parts.path}")
+
+    def _notion(self, parts, body):
+        state = self.server.state
+        base = f"http://{self.headers.get('Host')}"
+        path = parts.path[len("/v1"):]
+        with state.lock:
+            if self.command == "POST" and path == "/pages":
+                parent = body.get("parent") or {}
+                props = body.get("properties") or {}
+                title_prop = next(iter(props.values()), {}).get("title", [{}])
+                title = (title_prop[0].get("text") or {}).get("content", "") if title_prop else ""
+                pid = state.new_id()
+                state.pages[pid] = {"title": title, "database_id": parent.get("database_id")}
+                state.blocks[pid] = {"type": "page", "body": {}, "children": [], "parent": None}
+                if "page_id" in parent:
+                    if parent["page_id"] not in state.blocks:
+                        raise ValidationError("parent.page_id: Could not find page")
+                    state.blocks[pid]["parent"] = parent["page_id"]
+                    state.blocks[parent["page_id"]]["children"].append(pid)
+                    state.blocks[pid]["type"] = "child_page"
+                    state.blocks[pid]["body"] = {"title": title}
+                state.blocks[pid]["children"] = [
+                    state.store(b, pid) for b in body.get("children", [])
+                ]
+                return self._reply(200, {"object": "page", "id": pid,
+                                         "url": f"{base}/{pid.replace('-', '')}"})
+
+            m = re.fullmatch(r"/databases/([^/]+)/query", path)
+            if m and self.command == "POST":
+                want = ((body.get("filter") or {}).get("title") or {}).get("equals")
+                hits = [
+                    {"object": "page", "id": pid, "url": f"{base}/{pid.replace('-', '')}"}
+                    for pid, page in state.pages.items()
+                    if page["database_id"] == m.group(1)
+                    and (want is None or page["title"] == want)
+                ]
+                size = int(body.get("page_size", 100))
+                return self._reply(200, {"object": "list", "results": hits[:size],
+                                         "has_more": len(hits) > size, "next_cursor": None})
+
+            m = re.fullmatch(r"/blocks/([^/]+)/children", path)
+            if m:
+                bid = m.group(1)
+                if bid not in state.blocks:
+                    return self._error(404, "object_not_found", f"Could not find block {bid}")
+                kids = state.blocks[bid]["children"]
+                if self.command == "GET":
+                    q = parse_qs(parts.query)
+                    start = int(q.get("start_cursor", ["0"])[0])
+                    size = min(int(q.get("page_size", ["100"])[0]), 100)
+                    page = kids[start : start + size]
+                    more = start + size < len(kids)
+                    return self._reply(200, {
+                        "object": "list", "results": [state.view(k) for k in page],
+                        "has_more": more, "next_cursor": str(start + size) if more else None,
+                    })
+                if self.command == "PATCH":
+                    new = [state.store(b, bid) for b in body.get("children", [])]
+                    after = body.get("after")
+                    if after is not None and after not in kids:
+                        raise ValidationError("after: block is not a child of the parent")
+                    pos = kids.index(after) + 1 if after is not None else len(kids)
+                    kids[pos:pos] = new
+                    return self._reply(200, {"object": "list",
+                                             "results": [state.view(k) for k in new]})
+
+            m = re.fullmatch(r"/blocks/([^/]+)", path)
+            if m and m.group(1) in state.blocks:
+                bid = m.group(1)
+                block = state.blocks[bid]
+                if self.command == "DELETE":
+                    parent = state.blocks.get(block["parent"])
+                    if parent and bid in parent["children"]:
+                        parent["children"].remove(bid)
+                    return self._reply(200, dict(state.view(bid), archived=True))
+                if self.command == "PATCH":
+                    update = body.get(block["type"]) or {}
+                    if "rich_text" in update:
+                        _check_rich_text(update["rich_text"], f"body.{block['type']}")
+                        update = dict(update, rich_text=_api_rich_text(update["rich_text"]))
+                    block["body"].update(update)
+                    return self._reply(200, state.view(bid))
+        return self._error(404, "object_not_found", f"No route for {self.command} {path}")
+
+    def _slack_api(self, body):
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._reply(200, {"ok": False, "error": "not_authed"})
+        if not body.get("channel"):
+            return self._reply(200, {"ok": False, "error": "channel_not_found"})
+        if len(body.get("text", "")) > MAX_SLACK_TEXT:
+            return self._reply(200, {"ok": False, "error": "msg_too_long"})
+        with self.server.state.lock:
+            self.server.state.slack_messages += 1
+        return self._reply(200, {"ok": True, "channel": body["channel"], "ts": f"{time.time():.6f}"})
+
+    def _slack_webhook(self, body):
+        if not body.get("text"):
+            return self._reply(400, b"no_text")
+        with self.server.state.lock:
+            self.server.state.slack_messages += 1
+        return self._reply(200, b"ok")
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+
+# ================================================================
+# サーバー
+# ================================================================
+
+class StubServer:
+    """スレッドで動かすスタブサーバー。with 文でも使える。"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=100.0, per_block_ms=1.0,
+                 throttle=0.0, retry_after=0.2, seed=0):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = StubState()
+        self.httpd.config = {
+            "latency": latency_ms / 1000, "per_block": per_block_ms / 1000,
+            "throttle": throttle, "retry_after": retry_after, "rng": random.Random(seed),
+        }
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """publish_report.py をこのサーバーに向ける環境変数"""
+        return {
+            "NOTION_API_URL": f"{self.url}/v1",
+            "SLACK_API_URL": f"{self.url}/api",
+            "NOTION_API_KEY": "stub-notion-key",
+            "SLACK_WEBHOOK_URL": f"{self.url}/hook/stub",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self.httpd.state.lock:
+            return self.httpd.state.stats()
+
+    def reset(self):
+        with self.httpd.state.lock:
+            self.httpd.state.reset()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notion / Slack API スタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="1リクエストの固定遅延")
+    parser.add_argument("--per-block-ms", type=float, default=1.0,
+                        help="送信ブロック1件あたりの追加遅延")
+    parser.add_argument("--throttle", type=float, default=0.0, help="429 を返す確率")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="429 の Retry-After 秒")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency_ms, args.per_block_ms,
+                        args.throttle, args.retry_after, args.seed)
+    print(f"Stub server: {server.url}")
+    for k, v in server.env().items():
+        print(f"  {k}={v}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
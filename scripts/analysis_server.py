@@ -0,0 +1,398 @@
+"""
+compute_tables.py の常駐モード（--serve、標準ライブラリ asyncio のみ）
+
+最新日付の入力（CSV・Q4 キューブ）と全テーブルをメモリに保持し、ローカルの
+HTTP（127.0.0.1 の TCP ポート、または Unix ソケット）で問い合わせに答える。
+  - 起動時に --date（省略時は data/ の最新日付）を読み込む。日付を指定した場合
+    （--date・/refresh?date=）は最新日付に追従せず、その日付のファイルの更新だけを見る
+  - data/ を --poll 秒ごとに確認し、新しい日付フォルダ（または当日ファイルの更新）が
+    1回の確認間隔のあいだ変化しなければ読み込み直す（取得途中のファイルは読まない）。
+    解析済みCSVキャッシュを使い、--incremental 指定時は Q4 キューブを前日の集計状態から
+    差分更新する
+  - 読み込み直しはスレッドで行い、完了するまでは直前の状態で応答する
+  - 読み込みでは --output-dir に何も書き出さない（_validation.md を含め /write のときだけ）
+
+エンドポイント（JSON。テーブル本文のみ text/markdown）:
+  GET  /status                       読み込み済みの日付・当月・前月・読み込み時間
+  GET  /tables                       テーブル一覧（ファイル名とノード名）
+  GET  /table/{ファイル名|ノード名}   テーブル本文（front matter 付き、ファイル出力と同じ）
+  GET  /slice?kind=cv&ch=LIS         ファネル指標。kind は CUBE_KINDS の種別、軸
+                                     （ch/cv/bh/hol/rep/wk=YYYY-Www）を指定した分だけ絞り込む。
+                                     month=cur（既定）/prev/YYYY-MM
+  POST /refresh[?date=YYYY-MM-DD]    すぐに読み込み直す（date なしは最新日付への追従に戻す）
+  POST /write                        保持しているテーブルを --output-dir に書き出す
+                                     （compute_tables.py --date と同じファイル）
+
+例:
+    python3 scripts/compute_tables.py --serve --socket /tmp/demo-call.sock
+    curl --unix-socket /tmp/demo-call.sock "http://localhost/slice?kind=cv&ch=LIS"
+    curl --unix-socket /tmp/demo-call.sock -X POST http://localhost/write
+"""
+
+import asyncio
+import json
+import os
+import re
+import socket
+import stat
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from compute_tables import (
+    CUBE_KINDS, TABLE_OUTPUTS, TaskGraph, add_table_tasks, add_write_tasks, find_archive,
+    find_csv, prepare_date, write_file,
+)
+from perf import PerfRecorder
+
+DATE_DIR = re.compile(r"\d{4}-\d{2}-\d{2}")
+WEEK = re.compile(r"(\d{4})-W(\d{1,2})")
+CUBE_DIMS = {kind: dims for kind, dims, _ in CUBE_KINDS}
+MAX_REQUEST_BYTES = 1 << 16
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ================================================================
+# 保持する状態
+# ================================================================
+
+def folder_signature(folder):
+    """日付フォルダ内のファイルの (名前, サイズ, 更新時刻)。取得途中かどうかの判定用。"""
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return ()
+    return tuple(sorted(
+        (e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in entries if e.is_file()
+    ))
+
+
+def latest_snapshot_date(data_dir):
+    """Q4（CSV またはアーカイブ）がある最新の日付フォルダ。"""
+    try:
+        names = sorted(
+            (e.name for e in os.scandir(data_dir) if e.is_dir() and DATE_DIR.fullmatch(e.name)),
+            reverse=True,
+        )
+    except OSError:
+        return None
+    for name in names:
+        if find_csv(data_dir, "q4", name) or find_archive(data_dir, "q4", name):
+            return name
+    return None
+
+
+class WarmState:
+    """1日付分の入力とテーブル（読み込み後は変更しない）。"""
+
+    def __init__(self, inp, results, signature, perf, elapsed):
+        self.inp = inp
+        self.results = results
+        self.signature = signature
+        self.perf = perf
+        self.elapsed = elapsed
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        fm = inp.frontmatter()
+        self.tables = {
+            filename: fm + pick(results[node]) for filename, node, pick in TABLE_OUTPUTS
+        }
+        self.nodes = {node: filename for filename, node, _ in TABLE_OUTPUTS}
+
+    @property
+    def date_str(self):
+        return self.inp.date_str
+
+    def status(self):
+        return {
+            "date": self.date_str, "current_month": self.inp.current_month,
+            "previous_month": self.inp.previous_month,
+            "period": list(self.inp.period), "loaded_at": self.loaded_at,
+            "load_s": round(self.elapsed, 3),
+        }
+
+    def table(self, name):
+        name = self.nodes.get(name, name)
+        text = self.tables.get(name) or self.tables.get(f"{name}.md")
+        if text is None:
+            raise HttpError(404, f"unknown table: {name}")
+        return text
+
+    def cube(self, month):
+        inp = self.inp
+        month = {"cur": inp.current_month, "prev": inp.previous_month}.get(month, month)
+        cube = inp.cubes.get(month)
+        if cube is None:
+            raise HttpError(404, f"month not loaded: {month}")
+        return month, cube
+
+    def slice(self, kind, month, filters):
+        """kind のキーのうち filters（軸 → 値）に一致するものの指標。"""
+        dims = CUBE_DIMS.get(kind)
+        if dims is None:
+            raise HttpError(400, f"unknown kind: {kind} (choose from {sorted(CUBE_DIMS)})")
+        unknown = sorted(set(filters) - set(dims))
+        if unknown:
+            raise HttpError(400, f"{kind} has no axis {unknown} (axes: {list(dims)})")
+        month, cube = self.cube(month)
+        rows = []
+        for key in cube.groups:
+            if key[0] != kind:
+                continue
+            values = dict(zip(dims, key[1:]))
+            if any(values[d] != v for d, v in filters.items()):
+                continue
+            if "wk" in values:
+                values["wk"] = "%d-W%02d" % values["wk"]
+            rows.append({**values, **cube.funnel(key)})
+        return {"date": self.date_str, "month": month, "kind": kind, "rows": rows}
+
+
+# ================================================================
+# サーバー
+# ================================================================
+
+class AnalysisServer:
+    def __init__(self, args):
+        self.args = args
+        self.data_dir = Path(args.data_dir)
+        self.output_dir = Path(args.output_dir)
+        self.state = None
+        self._lock = asyncio.Lock()
+        self._pending = None   # 変化待ちの (日付, 署名)
+        self._failed = None    # 読み込みに失敗した (日付, 署名)。変わるまで再試行しない
+        self.pinned = args.date  # 日付を指定して読み込んだ場合は最新日付に追従しない
+
+    # ---- 読み込み ----
+
+    def _load(self, date_str, signature):
+        """prepare_date + 全テーブル計算（スレッドで実行）。
+
+        output_dir には何も書き出さない（_validation.md も /write まで保持するだけ）。
+        """
+        start = time.perf_counter()
+        perf = PerfRecorder("compute_tables")
+        inp = prepare_date(self.args, date_str, None, perf)
+        if inp is None:
+            return None
+        graph = TaskGraph(perf=perf)
+        add_table_tasks(graph, inp)
+        results = graph.run(max_workers=self.args.workers)
+        return WarmState(inp, results, signature, perf, time.perf_counter() - start)
+
+    async def refresh(self, date_str=None, force=False):
+        """data/ を確認し、必要なら読み込み直す。→ 結果の説明（ログ・応答用）"""
+        async with self._lock:
+            date_str = date_str or self.pinned or latest_snapshot_date(self.data_dir)
+            if date_str is None:
+                return "no data"
+            signature = folder_signature(self.data_dir / date_str)
+            cur = self.state
+            if not force:
+                if cur is not None and (cur.date_str, cur.signature) == (date_str, signature):
+                    return "unchanged"
+                if self._failed == (date_str, signature):
+                    return "failed"
+                # 取得途中のファイルを読まないよう、前回の確認から変化がないことを待つ
+                if self._pending != (date_str, signature):
+                    self._pending = (date_str, signature)
+                    return "pending"
+            self._pending = None
+            print(f"[serve] {date_str} を読み込み中...", flush=True)
+            loop = asyncio.get_running_loop()
+            try:
+                state = await loop.run_in_executor(None, self._load, date_str, signature)
+            except Exception as e:  # 壊れた CSV など。同じファイルのまま再試行しない
+                print(f"[serve] ⚠️ {date_str}: {type(e).__name__}: {e}", flush=True)
+                state = None
+            if state is None:
+                self._failed = (date_str, signature)
+                print(f"[serve] ❌ {date_str} の読み込みに失敗（直前の状態で応答を続けます）",
+                      flush=True)
+                return "failed"
+            self.state = state
+            self._failed = None
+            print(f"[serve] {date_str} 読み込み完了 ({state.elapsed:.2f}s)", flush=True)
+            return "loaded"
+
+    async def watch(self, poll):
+        while True:
+            await asyncio.sleep(poll)
+            try:
+                await self.refresh()
+            except Exception as e:  # 監視は止めない
+                print(f"[serve] ⚠️ data/ の確認に失敗: {e}", flush=True)
+
+    def write(self):
+        """保持しているテーブルを output_dir に書き出す（run_date と同じファイル）。"""
+        state = self._require_state()
+        graph = TaskGraph()
+        for node, result in state.results.items():
+            graph.add(node, lambda result=result: result)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        write_file(self.output_dir / "_validation.md", state.inp.validation)
+        add_write_tasks(graph, state.inp, self.output_dir)
+        graph.run(max_workers=self.args.workers)
+        state.perf.save(self.output_dir)
+        return {"date": state.date_str, "output_dir": str(self.output_dir),
+                "files": ["_validation.md"] + [filename for filename, _, _ in TABLE_OUTPUTS]}
+
+    def _require_state(self, date_str=None):
+        state = self.state
+        if state is None:
+            raise HttpError(503, "no snapshot loaded yet")
+        if date_str and date_str != state.date_str:
+            raise HttpError(404, f"{date_str} is not loaded (loaded: {state.date_str})")
+        return state
+
+    # ---- HTTP ----
+
+    async def route(self, method, target):
+        url = urlsplit(target)
+        path = unquote(url.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if method == "GET" and path == "/status":
+            state = self.state
+            return {"loaded": state.status() if state else None,
+                    "latest_on_disk": latest_snapshot_date(self.data_dir)}
+        if method == "GET" and path == "/tables":
+            state = self._require_state(query.get("date"))
+            return {"date": state.date_str,
+                    "tables": [{"file": f, "node": n} for f, n, _ in TABLE_OUTPUTS]}
+        if method == "GET" and path.startswith("/table/"):
+            return self._require_state(query.get("date")).table(path[len("/table/"):])
+        if method == "GET" and path == "/slice":
+            state = self._require_state(query.pop("date", None))
+            kind = query.pop("kind", "ch")
+            month = query.pop("month", "cur")
+            filters = dict(query)
+            if "wk" in filters:
+                m = WEEK.fullmatch(filters["wk"])
+                if not m:
+                    raise HttpError(400, "wk must be YYYY-Www")
+                filters["wk"] = (int(m.group(1)), int(m.group(2)))
+            return state.slice(kind, month, filters)
+        if method == "POST" and path == "/refresh":
+            self.pinned = query.get("date")
+            result = await self.refresh(force=True)
+            return {"result": result, "loaded": self.state.status() if self.state else None}
+        if method == "POST" and path == "/write":
+            return await asyncio.get_running_loop().run_in_executor(None, self.write)
+        raise HttpError(404, f"no route: {method} {path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                if length:
+                    await reader.readexactly(length)  # 本文は使わない
+
+                start = time.perf_counter()
+                try:
+                    body = await self.route(method, target)
+                    status = 200
+                except HttpError as e:
+                    status, body = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+                if isinstance(body, str):
+                    data, ctype = body.encode("utf-8"), "text/markdown; charset=utf-8"
+                else:
+                    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                    ctype = "application/json; charset=utf-8"
+                keep = (version == "HTTP/1.1"
+                        and headers.get("connection", "").lower() != "close")
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: {ctype}\r\nContent-Length: {len(data)}\r\n"
+                    f"Server-Timing: app;dur={elapsed_ms:.2f}\r\n"
+                    f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n".encode("ascii")
+                    + data
+                )
+                await writer.drain()
+                if not keep:
+                    break
+        finally:
+            writer.close()
+
+
+def remove_stale_socket(path):
+    """前回の異常終了で残った Unix ソケットを削除する。
+
+    接続できる（別のサーバーが使用中）場合とソケット以外のファイルの場合は
+    上書きせずに OSError を送出する。
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"{path} はソケットではありません")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+        else:
+            raise OSError(f"{path} は別のサーバーが使用中です")
+    os.unlink(path)
+    print(f"[serve] 残っていたソケット {path} を削除しました", flush=True)
+
+
+async def _serve(args):
+    if args.socket:
+        remove_stale_socket(args.socket)
+    server = AnalysisServer(args)
+    result = await server.refresh(force=True)
+    if server.state is None:
+        print(f"[serve] ⚠️ 初回読み込み: {result}（data/ の更新を待ちます）", flush=True)
+    if args.socket:
+        srv = await asyncio.start_unix_server(server.handle, path=args.socket,
+                                              limit=MAX_REQUEST_BYTES)
+        where = f"unix:{args.socket}"
+    else:
+        srv = await asyncio.start_server(server.handle, "127.0.0.1", args.port,
+                                         limit=MAX_REQUEST_BYTES)
+        where = f"http://127.0.0.1:{srv.sockets[0].getsockname()[1]}"
+    print(f"[serve] {where} で待機中（data/ の確認間隔 {args.poll:g}s）", flush=True)
+    async with srv:
+        watcher = asyncio.create_task(server.watch(args.poll))
+        try:
+            await srv.serve_forever()
+        finally:
+            watcher.cancel()
+            if args.socket and os.path.exists(args.socket):
+                os.unlink(args.socket)
+
+
+def serve(args):
+    """compute_tables.py --serve のエントリポイント（Ctrl-C で終了）。"""
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"[serve] ❌ {e}", flush=True)
+        return False
+    return True
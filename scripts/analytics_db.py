@@ -0,0 +1,289 @@
+"""
+Q4/Q5/Q6 スナップショットの SQLite 分析ストア（data/analytics.sqlite、標準ライブラリ sqlite3）
+
+日付ごとのスナップショットを型付きのテーブルに取り込み、集計軸にインデックスを張る。
+compute_tables.py の集計（ファネル・SALスピード・前月商談実施数）は SQL で
+同じ値を出せるので、新しい切り口はコードを足さずにクエリで答えられる。
+
+  q4: リード明細（eligible・対象月・担当者区分・ISO週を取り込み時に算出）
+  q5: SAL率_積み上げ（日数別SAL数は INTEGER）
+  q6: 商談明細（PII列は取り込まない）
+  snapshots: 取り込み済みの (クエリ, 日付, 行数, 作成元CSV)
+
+作成は scripts/ingest.py sqlite、アドホック集計は scripts/ingest.py sql。
+"""
+
+import sqlite3
+from pathlib import Path
+
+from compute_tables import (
+    CHANNELS, CUBE_KINDS, classify_user, funnel_metrics, get_row_month, is_eligible,
+    parse_date,
+)
+
+DB_NAME = "analytics.sqlite"
+
+Q5_INT_COLUMNS = [
+    "total_leads", "total_sal", "sal_within_1d", "sal_within_3d", "sal_7d_diff",
+    "sal_14d_diff", "sal_21d_diff", "sal_30d_diff", "sal_after_30d",
+]
+
+# Q6 はスキーマが日によって変わるため、どの日にもある列（+ opportunity_id）だけを持つ
+Q6_COLUMNS = [
+    "opportunity_id", "created_date", "f_initial_deal_acquisition_date",
+    "first_meeting_date", "business_meeting_scheduled_date",
+    "inflow_route_media_lasttouch", "cv_content_sub_lasttouch", "stage_name",
+    "reasons_not_negotiated",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    query TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    source TEXT,
+    sha256 TEXT,
+    PRIMARY KEY (query, snapshot_date)
+);
+CREATE TABLE IF NOT EXISTS q4 (
+    snapshot_date TEXT NOT NULL,
+    lead_id TEXT,
+    eligible INTEGER NOT NULL,
+    month TEXT,
+    inflow_route_media TEXT,
+    cv_content_sub__c TEXT,
+    business_hours_class TEXT,
+    is_holiday TEXT,
+    phone_type_flag TEXT,
+    user_name TEXT,
+    rep TEXT,
+    is_connect INTEGER NOT NULL,
+    is_sal INTEGER NOT NULL,
+    is_task_complete INTEGER NOT NULL,
+    created_at TEXT,
+    created_date TEXT,
+    iso_year INTEGER,
+    iso_week INTEGER,
+    reasons_for_ineligible_leads TEXT
+);
+CREATE INDEX IF NOT EXISTS q4_slice
+    ON q4 (snapshot_date, month, inflow_route_media, cv_content_sub__c);
+CREATE INDEX IF NOT EXISTS q4_user ON q4 (snapshot_date, user_name, month);
+CREATE INDEX IF NOT EXISTS q4_created ON q4 (snapshot_date, created_date);
+CREATE TABLE IF NOT EXISTS q5 (
+    snapshot_date TEXT NOT NULL,
+    created_at TEXT,
+    created_date TEXT,
+    month TEXT,
+    f_initial_deal_acquisition_date TEXT,
+    business_hours_class TEXT,
+    is_holiday TEXT,
+    user_name TEXT,
+    demo_call_type_summary_v2 TEXT,
+    cv_content_sub__c TEXT,
+    {", ".join(f"{c} INTEGER" for c in Q5_INT_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS q5_slice
+    ON q5 (snapshot_date, month, demo_call_type_summary_v2, cv_content_sub__c);
+CREATE INDEX IF NOT EXISTS q5_user ON q5 (snapshot_date, user_name, month);
+CREATE INDEX IF NOT EXISTS q5_created ON q5 (snapshot_date, created_date);
+CREATE TABLE IF NOT EXISTS q6 (
+    snapshot_date TEXT NOT NULL,
+    first_meeting_month TEXT,
+    {", ".join(f"{c} TEXT" for c in Q6_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS q6_slice
+    ON q6 (snapshot_date, first_meeting_month, inflow_route_media_lasttouch);
+"""
+
+# FunnelCube のキー要素 → q4 の列（SQL 式）
+FUNNEL_DIMS = {
+    "ch": ["inflow_route_media"],
+    "cv": ["COALESCE(NULLIF(cv_content_sub__c, ''), '(空)')"],
+    "bh": ["business_hours_class"],
+    "hol": ["is_holiday"],
+    "rep": ["rep"],
+    "wk": ["iso_year", "iso_week"],
+}
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _int(v):
+    return int(v) if v not in ("", None) else None
+
+
+def _q4_record(date_str, row):
+    created = row.get("created_date_jst") or ""
+    d = parse_date(created)
+    iso = d.isocalendar() if d else (None, None)
+    return (
+        date_str, row.get("id") or None, int(is_eligible(row)), get_row_month(row),
+        row.get("inflow_route_media", ""), row.get("cv_content_sub__c", ""),
+        row.get("business_hours_class", ""), row.get("is_holiday", ""),
+        row.get("phone_type_flag", ""), row.get("user_name", ""),
+        classify_user(row.get("user_name", "")),
+        int(str(row.get("is_connect", "0")) == "1"), int(str(row.get("is_sal", "0")) == "1"),
+        int(row.get("is_task_complete", "") == "完了"),
+        created or None, d.isoformat() if d else None, iso[0], iso[1],
+        row.get("reasons_for_ineligible_leads", ""),
+    )
+
+
+def _q5_record(date_str, row):
+    created = row.get("created_date_jst") or ""
+    d = parse_date(created)
+    return (
+        date_str, created or None, d.isoformat() if d else None, created[:7] or None,
+        row.get("f_initial_deal_acquisition_date", ""), row.get("business_hours_class", ""),
+        row.get("is_holiday", ""), row.get("user_name", ""),
+        row.get("demo_call_type_summary_v2", ""), row.get("cv_content_sub__c", ""),
+        *(_int(row.get(c)) for c in Q5_INT_COLUMNS),
+    )
+
+
+def _q6_record(date_str, row):
+    first = row.get("first_meeting_date") or ""
+    return (date_str, first[:7] or None, *(row.get(c) for c in Q6_COLUMNS))
+
+
+RECORDS = {"q4": (_q4_record, 19), "q5": (_q5_record, 10 + len(Q5_INT_COLUMNS)),
+           "q6": (_q6_record, 2 + len(Q6_COLUMNS))}
+
+
+def load_snapshot(conn, qid, date_str, header, rows, source=None):
+    """1日付分のスナップショットを取り込む（同じ日付の既存行は置き換える）。"""
+    make, width = RECORDS[qid]
+    # アーカイブ由来の不足セル（None）は CSV と同じく列なしとして扱う
+    records = (
+        make(date_str, {k: v for k, v in zip(header, row) if v is not None})
+        for row in rows if row
+    )
+    with conn:
+        conn.execute(f"DELETE FROM {qid} WHERE snapshot_date = ?", (date_str,))
+        cur = conn.executemany(
+            f"INSERT INTO {qid} VALUES ({', '.join('?' * width)})", records
+        )
+        n = cur.rowcount
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+            (qid, date_str, n, (source or {}).get("name"), (source or {}).get("sha256")),
+        )
+    return n
+
+
+def latest_snapshot(conn, qid):
+    row = conn.execute(
+        "SELECT MAX(snapshot_date) FROM snapshots WHERE query = ?", (qid,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def run_sql(conn, sql, params=()):
+    """→ (カラム名リスト, 行リスト)"""
+    cur = conn.execute(sql, params)
+    columns = [d[0] for d in cur.description] if cur.description else []
+    return columns, cur.fetchall()
+
+
+# ================================================================
+# compute_tables.py の集計に対応するクエリ
+# ================================================================
+
+def funnel_sql(kind):
+    """CUBE_KINDS の1種別を GROUP BY で表した SQL（パラメータ: 日付, 月）。"""
+    spec = {k: (dims, conds) for k, dims, conds in CUBE_KINDS}
+    dims, conds = spec[kind]
+    exprs = [e for d in dims for e in FUNNEL_DIMS[d]]
+    where = ["snapshot_date = ?", "eligible = 1", "month = ?"]
+    # rep / wk が NULL の行はそのキーに寄与しない（row_cube_keys と同じ）
+    for d in dims + conds:
+        if d in ("rep", "wk"):
+            where += [f"{e} IS NOT NULL" for e in FUNNEL_DIMS[d]]
+    select = exprs + [
+        "COUNT(DISTINCT lead_id)",
+        "COUNT(DISTINCT CASE WHEN is_connect THEN lead_id END)",
+        "COUNT(DISTINCT CASE WHEN is_sal THEN lead_id END)",
+        "COUNT(DISTINCT CASE WHEN is_task_complete THEN lead_id END)",
+    ]
+    sql = f"SELECT {', '.join(select)} FROM q4 WHERE {' AND '.join(where)}"
+    if exprs:
+        sql += f" GROUP BY {', '.join(exprs)}"
+    return sql
+
+
+def funnel(conn, month, snapshot_date=None, kinds=None):
+    """FunnelCube と同じキー → funnel_metrics の辞書。"""
+    snapshot_date = snapshot_date or latest_snapshot(conn, "q4")
+    result = {}
+    for kind, dims, _ in CUBE_KINDS:
+        if kinds is not None and kind not in kinds:
+            continue
+        for row in conn.execute(funnel_sql(kind), (snapshot_date, month)):
+            values = list(row[:-4])
+            key = [kind]
+            for d in dims:
+                if d == "wk":
+                    key.append((values.pop(0), values.pop(0)))
+                else:
+                    key.append(values.pop(0))
+            result[tuple(key)] = funnel_metrics(*row[-4:])
+    return result
+
+
+SAL_SPEED_SQL = """
+SELECT demo_call_type_summary_v2,
+       SUM(total_leads), SUM(total_sal), SUM(sal_within_1d), SUM(sal_within_3d),
+       SUM(sal_7d_diff), SUM(sal_14d_diff), SUM(sal_21d_diff), SUM(sal_30d_diff)
+FROM q5
+WHERE snapshot_date = ? AND month = ? AND demo_call_type_summary_v2 != ''
+GROUP BY demo_call_type_summary_v2
+"""
+
+
+def sal_speed(conn, month, snapshot_date=None):
+    """compute_step2_sal_speed の集計部分（チャネル → 累積SAL率）。"""
+    snapshot_date = snapshot_date or latest_snapshot(conn, "q5")
+    result = {}
+    for ch, tl, ts, w1, w3, d7, d14, d21, d30 in conn.execute(
+            SAL_SPEED_SQL, (snapshot_date, month)):
+        c3 = w1 + w3
+        c7 = c3 + d7
+        c14 = c7 + d14
+        c30 = c14 + d21 + d30
+        result[ch] = {
+            "total_leads": tl, "total_sal": ts,
+            "w1d_rate": w1 / tl if tl else None,
+            "cum_3d_rate": c3 / tl if tl else None,
+            "cum_7d_rate": c7 / tl if tl else None,
+            "cum_14d_rate": c14 / tl if tl else None,
+            "cum_30d_rate": c30 / tl if tl else None,
+        }
+    return result
+
+
+MEETINGS_SQL = """
+SELECT CASE WHEN inflow_route_media_lasttouch IN ('TOP', 'LIS', 'DIS', 'FAX・EDM')
+            THEN inflow_route_media_lasttouch ELSE 'その他' END AS ch,
+       COUNT(*)
+FROM q6
+WHERE snapshot_date = ? AND first_meeting_month = ?
+GROUP BY ch
+"""
+
+
+def prev_meetings(conn, month, snapshot_date=None):
+    """build_prev_meetings_from_q6 と同じチャネル別商談実施数。"""
+    snapshot_date = snapshot_date or latest_snapshot(conn, "q6")
+    counts = dict(conn.execute(MEETINGS_SQL, (snapshot_date, month)).fetchall())
+    result = {ch: counts.get(ch, 0) for ch in CHANNELS}
+    result["全体"] = sum(result.values())
+    return result
+
+
+def default_db_path(data_dir):
+    return Path(data_dir) / DB_NAME
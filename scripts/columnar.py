@@ -0,0 +1,231 @@
+"""
+日次CSVスナップショットの列指向アーカイブ（.dca、標準ライブラリのみ）
+
+1スナップショット = 1ファイル。行を月ごとのパーティションに分け、パーティション×
+カラムごとに独立して圧縮するため、読み込み時は必要なパーティションとカラムだけを
+展開する。
+  - 文字列は辞書コード化（辞書はカラムごとにファイル全体で共有）
+  - コードは語彙数に応じて 1/2/4 バイト幅、語彙2種のカラム（フラグ）は1行1ビット
+  - 圧縮は zlib（既定）または lzma
+
+ファイル構成: MAGIC | uint32 メタデータ長 | メタデータ(JSON) | データブロック...
+作成は scripts/ingest.py archive、読み込みは compute_tables.py が行う。
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+ARCHIVE_SUFFIX = ".dca"
+ARCHIVE_VERSION = 1
+MAGIC = b"DCA1"
+
+CODECS = {
+    "zlib": (lambda b: zlib.compress(b, 9), zlib.decompress),
+    "lzma": (lambda b: lzma.compress(b, preset=6), lzma.decompress),
+}
+
+# 1バイト → 8行分の 0/1 バイト列（ビット列の展開用）
+_BIT_TABLE = [bytes((b >> k) & 1 for k in range(8)) for b in range(256)]
+
+
+def file_sha256(filepath):
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_info(filepath):
+    st = os.stat(filepath)
+    return {"name": Path(filepath).name, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(filepath)}
+
+
+# ================================================================
+# コード列のエンコード
+# ================================================================
+
+def _encode_codes(codes, n_labels):
+    """→ (エンコード名, バイト列)"""
+    if n_labels <= 1:
+        return "const", b""
+    if n_labels == 2:
+        out = bytearray((len(codes) + 7) // 8)
+        for i, c in enumerate(codes):
+            if c:
+                out[i >> 3] |= 1 << (i & 7)
+        return "bits", bytes(out)
+    if n_labels <= 1 << 8:
+        return "u8", bytes(codes)
+    typecode, name = ("H", "u16") if n_labels <= 1 << 16 else ("I", "u32")
+    arr = array(typecode, codes)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return name, arr.tobytes()
+
+
+def _decode_codes(encoding, data, n_rows):
+    if encoding == "const":
+        return [0] * n_rows
+    if encoding == "bits":
+        return b"".join(map(_BIT_TABLE.__getitem__, data))[:n_rows]
+    if encoding == "u8":
+        return data
+    arr = array("H" if encoding == "u16" else "I")
+    arr.frombytes(data)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+# ================================================================
+# 書き込み
+# ================================================================
+
+def write_archive(path, header, rows, partition_of, codec="zlib", source=None, query=None):
+    """CSV の行（header と同じ並びの値リスト）を月パーティションに分けて書き出す。
+
+    partition_of(values) はパーティションキー（"YYYY-MM" など、なしは ""）を返す。
+    query（q1-q6）と source（作成元CSVの情報）はメタデータに記録する。
+    ヘッダより短い行の不足セルは None として保存する（読み込み時に missing へ置換）。
+    戻り値はメタデータ。
+    """
+    compress = CODECS[codec][0]
+    width = len(header)
+    vocabs = [{} for _ in range(width)]
+    parts = {}
+    total = 0
+    for raw in rows:
+        if not raw:
+            continue
+        total += 1
+        n = len(raw)
+        values = raw[:width] if n >= width else list(raw) + [None] * (width - n)
+        key = partition_of(values) or ""
+        cols = parts.get(key)
+        if cols is None:
+            cols = parts[key] = [[] for _ in range(width)]
+        for vocab, col, v in zip(vocabs, cols, values):
+            code = vocab.get(v)
+            if code is None:
+                code = vocab[v] = len(vocab)
+            col.append(code)
+
+    blocks = []
+    offset = 0
+
+    def add(data):
+        nonlocal offset
+        blob = compress(data)
+        blocks.append(blob)
+        offset += len(blob)
+        return [offset - len(blob), len(blob)]
+
+    dicts = [add(json.dumps(list(v), ensure_ascii=False).encode("utf-8")) for v in vocabs]
+    partitions = []
+    for key in sorted(parts):
+        cols = parts[key]
+        entry = {"key": key, "rows": len(cols[0]), "columns": []}
+        for vocab, codes in zip(vocabs, cols):
+            encoding, data = _encode_codes(codes, len(vocab))
+            entry["columns"].append([encoding, *add(data)])
+        partitions.append(entry)
+
+    meta = {
+        "version": ARCHIVE_VERSION, "query": query, "codec": codec, "header": list(header),
+        "total": total, "source": source, "dicts": dicts, "partitions": partitions,
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(meta_bytes)))
+        f.write(meta_bytes)
+        for blob in blocks:
+            f.write(blob)
+    os.replace(tmp, path)
+    return meta
+
+
+# ================================================================
+# 読み込み
+# ================================================================
+
+class ColumnarArchive:
+    """.dca ファイル。メタデータだけを読んで開き、列は read で必要な分だけ展開する。"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"{self.path}: not a columnar archive")
+            (meta_len,) = struct.unpack("<I", f.read(4))
+            self.meta = json.loads(f.read(meta_len))
+        if self.meta.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"{self.path}: unsupported archive version")
+        self._data_start = 8 + meta_len
+        self._decompress = CODECS[self.meta["codec"]][1]
+        self.header = self.meta["header"]
+        self.total = self.meta["total"]
+        self.source = self.meta.get("source")
+        self._pos = {name: i for i, name in enumerate(self.header)}
+        self._parts = {p["key"]: p for p in self.meta["partitions"]}
+
+    def partition_keys(self):
+        return sorted(self._parts)
+
+    def partition_rows(self, key):
+        part = self._parts.get(key)
+        return part["rows"] if part else 0
+
+    def matches_source(self, csv_path):
+        """csv_path がアーカイブ作成元と同じ内容か（サイズ + mtime、違えば sha256）"""
+        src = self.source
+        if not src:
+            return False
+        st = os.stat(csv_path)
+        if st.st_size != src["size"]:
+            return False
+        return st.st_mtime_ns == src["mtime_ns"] or file_sha256(csv_path) == src["sha256"]
+
+    def read(self, columns, partitions=None, missing=""):
+        """columns の値リストを列ごとに返す（partitions の順に連結、None は全パーティション）。
+
+        ヘッダにないカラムと、行の不足セルは missing になる。
+        """
+        keys = self.partition_keys() if partitions is None else [
+            k for k in partitions if k in self._parts
+        ]
+        n_rows = sum(self._parts[k]["rows"] for k in keys)
+        out = []
+        with open(self.path, "rb") as f:
+            def block(ref):
+                f.seek(self._data_start + ref[0])
+                return self._decompress(f.read(ref[1]))
+
+            for name in columns:
+                j = self._pos.get(name)
+                if j is None:
+                    out.append([missing] * n_rows)
+                    continue
+                labels = json.loads(block(self.meta["dicts"][j]))
+                labels = [missing if v is None else sys.intern(v) if len(v) < 32 else v
+                          for v in labels]
+                values = []
+                for k in keys:
+                    part = self._parts[k]
+                    encoding, off, length = part["columns"][j]
+                    data = block([off, length]) if length else b""
+                    values.extend(map(labels.__getitem__,
+                                      _decode_codes(encoding, data, part["rows"])))
+                out.append(values)
+        return out
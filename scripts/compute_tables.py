@@ -7,15 +7,41 @@ LLMによる計算を排除し、再現可能で正確な数値を保証する
 
 Usage:
     python3 scripts/compute_tables.py --date 2026-02-25
+    python3 scripts/compute_tables.py --from 2026-02-01 --to 2026-02-28  # バックフィル
 """
 
 import argparse
 import csv
+import hashlib
+import io
+import json
+import os
+import pickle
 import sys
-from collections import defaultdict
-from datetime import datetime, timedelta
+import time
+from array import array
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
+from columnar import ARCHIVE_SUFFIX, ColumnarArchive, file_sha256
+from csv_scan import iter_scan, scan_csv
+from manifest import DataManifest
+from perf import PerfRecorder
+from report_format import (
+    PP_WORSEN, RESULTS_FILENAME, RESULTS_VERSION, fmt_count_diff, fmt_int, fmt_pct, fmt_pp,
+)
+from snapshot_store import STORE_DIR, SnapshotStore
+
+try:
+    import numpy as np
+except ImportError:  # 標準ライブラリのみの環境では array バックエンドを使う
+    np = None
+
 # ================================================================
 # 定数
 # ================================================================
@@ -25,7 +51,6 @@ OUTSOURCE_REPS = ["中里 奎太", "金 旭光"]
 CHANNEL_ORDER = ["全体", "TOP", "LIS", "DIS", "FAX・EDM", "その他"]
 CHANNELS = ["TOP", "LIS", "DIS", "FAX・EDM", "その他"]
 
-PP_WORSEN = -5.0
 BELOW_AVG_RATIO = 0.20
 IMPACT_WARN = -3
 IMPACT_CRIT = -5
@@ -55,6 +80,9 @@ Q5_REQUIRED = [
     "sal_after_30d",
 ]
 
+# build_prev_meetings_from_q6 が参照する Q6 カラム（Q6 はPII列が多いため射影必須）
+Q6_REQUIRED = ["first_meeting_date", "inflow_route_media_lasttouch"]
+
 
 # ================================================================
 # ユーティリティ
@@ -66,34 +94,6 @@ def safe_div(num, den):
     return num / den
 
 
-def fmt_pct(val, dec=1):
-    if val is None:
-        return "-"
-    return f"{val * 100:.{dec}f}%"
-
-
-def fmt_pp(val, warn_threshold=PP_WORSEN):
-    if val is None:
-        return "N/A"
-    sign = "+" if val >= 0 else ""
-    mark = "📉" if val <= warn_threshold else ""
-    return f"{sign}{val:.1f}pp{mark}"
-
-
-def fmt_count_diff(cur, prev):
-    if prev is None or prev == 0:
-        return "N/A"
-    diff_pct = (cur - prev) / prev * 100
-    sign = "+" if diff_pct >= 0 else ""
-    return f"{sign}{diff_pct:.1f}%"
-
-
-def fmt_int(val):
-    if val is None:
-        return "-"
-    return f"{val:,}"
-
-
 def prev_month_str(ym):
     """'2026-02' → '2026-01'"""
     y, m = int(ym[:4]), int(ym[5:7])
@@ -149,6 +149,26 @@ period_end: {period_end}
 def write_file(path, content):
     with open(path, "w", encoding="utf-8") as f:
         f.write(content)
+    return path
+
+
+def write_results(path, meta, landing, issues, funnel, cv):
+    """STEP1/STEP2 の計算結果を _results.json に書き出す。
+
+    landing は {ラベル: compute_step1_landing の results}、issues / funnel / cv は
+    各 compute_* が Markdown と一緒に返すレコード。
+    """
+    data = {"version": RESULTS_VERSION, **meta}
+    data["landing"] = {
+        label: [{"channel": ch, **r} for ch, r in results.items()]
+        for label, results in landing.items()
+    }
+    data["issues"] = issues
+    data["funnel"] = funnel
+    data["cv"] = cv
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return path
 
 
 # ================================================================
@@ -175,6 +195,24 @@ def find_prev_month_csv(data_dir, query_id, current_date_str):
     else:
         prev_y, prev_m = current.year, current.month - 1
 
+    # マニフェストに前月の記録があれば data/ を走査しない。ただしマニフェストは
+    # ingest.py 実行時点の記録なので、記録した日付より後の前月の日付フォルダが
+    # 増えていないかを月末まで確かめる（最大30回ほどの stat）
+    manifest = DataManifest.load(data_dir)
+    hit = manifest.latest_in_month(query_id, f"{prev_y:04d}-{prev_m:02d}") if manifest else None
+    if hit is not None:
+        recorded, path = hit
+        day = datetime.strptime(recorded, "%Y-%m-%d").date() + timedelta(days=1)
+        while day.month == prev_m:
+            later = data_dir / day.isoformat() / f"{prefix}-{day.isoformat()}.csv"
+            if later.exists() or later.with_suffix(ARCHIVE_SUFFIX).exists():
+                print(f"  注意: マニフェストにない前月の日付 {day.isoformat()} があるため"
+                      "ディレクトリを探します（ingest.py manifest で更新できます）")
+                break
+            day += timedelta(days=1)
+        else:
+            return path
+
     candidates = []
     # New structure: search date subfolders
     for d in sorted(data_dir.iterdir()):
@@ -185,6 +223,9 @@ def find_prev_month_csv(data_dir, query_id, current_date_str):
                     f = d / f"{prefix}-{d.name}.csv"
                     if f.exists():
                         candidates.append(f)
+                    elif f.with_suffix(ARCHIVE_SUFFIX).exists():
+                        # CSV を削除してアーカイブだけ残した日付
+                        candidates.append(f.with_suffix(ARCHIVE_SUFFIX))
             except ValueError:
                 pass
     if candidates:
@@ -203,15 +244,298 @@ def find_prev_month_csv(data_dir, query_id, current_date_str):
     return candidates[-1] if candidates else None
 
 
+def load_prev_month_landing(data_dir, date_str):
+    """前月の Q1-Q3 CSV（あれば最新日付のもの）を読み込む。"""
+    result = {}
+    for qid in ("q1", "q2", "q3"):
+        path = find_prev_month_csv(data_dir, qid, date_str)
+        if path is None:
+            result[qid] = None
+        elif path.suffix == ARCHIVE_SUFFIX:
+            result[qid] = load_archive_snapshot(ColumnarArchive(path)).rows
+        else:
+            result[qid] = load_csv_file(path)
+    return result
+
+
+def find_archive(data_dir, query_id, date_str, csv_path=None):
+    """列指向アーカイブ（scripts/ingest.py archive で作成）を開く。
+
+    csv_path があり、その内容がアーカイブ作成元と異なる場合は古いとみなして
+    None を返す（CSV を読む）。CSV が削除済みならアーカイブだけで読む。
+    """
+    prefix = CSV_PREFIXES[query_id]
+    path = data_dir / date_str / f"{prefix}-{date_str}{ARCHIVE_SUFFIX}"
+    if not path.exists():
+        return None
+    try:
+        arch = ColumnarArchive(path)
+    except (OSError, ValueError) as e:
+        print(f"   ⚠️ {path.name}: アーカイブを読めません ({e})")
+        return None
+    if csv_path is not None and not arch.matches_source(csv_path):
+        print(f"   ⚠️ {path.name}: CSV が更新されているためアーカイブを使いません")
+        return None
+    return arch
+
+
 def load_csv_file(filepath):
+    """csv.DictReader と同じ dict のリストを返す（列ごとにスキャンして組み立てる）。"""
+    stats = {}
     rows = []
-    with open(filepath, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
+    for values in iter_scan(filepath, None, stats, missing=None):
+        if stats["fallback_rows"]:
+            break
+        header = stats["header"]
+        rows.extend(dict(zip(header, v)) for v in zip(*values))
+    if stats["fallback_rows"]:
+        # 列数の合わない行は DictReader の restkey / restval の扱いに任せる
+        with open(filepath, "r", encoding="utf-8", newline="") as f:
+            return list(csv.DictReader(f))
     return rows
 
 
+class CsvSnapshot:
+    """読み込み済みCSV。rows は保持対象の行のみ、total はファイル全体の行数。"""
+
+    def __init__(self, path, header, rows, total):
+        self.path = path
+        self.header = header
+        self.rows = rows
+        self.total = total
+
+
+def _record_get(self, key, default=None):
+    return getattr(self, key, default)
+
+
+_RECORD_TYPES = {}
+
+
+def record_type(columns):
+    """射影カラムだけを持つ軽量レコード型（namedtuple + dict互換の get）。"""
+    key = tuple(columns)
+    cls = _RECORD_TYPES.get(key)
+    if cls is None:
+        base = namedtuple("CsvRecord", key)
+        cls = type("CsvRecord", (base,), {"__slots__": (), "get": _record_get})
+        _RECORD_TYPES[key] = cls
+    return cls
+
+
+class CsvCache:
+    """解析済みCSVの永続キャッシュ（data/.cache/ 配下、列指向・辞書コード化）。
+
+    エントリは「ファイルパス + 射影カラム」ごとに1つ。size と mtime が一致すれば
+    そのまま使い、mtime だけ異なる場合（git checkout 直後など）は sha256 を照合する。
+    ファイル内容が変わったエントリは次回の読み込み時に自動で作り直される。
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def _entry_path(self, filepath, columns):
+        key = f"{Path(filepath).resolve()}|{','.join(columns)}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return self.cache_dir / f"{digest}.pickle"
+
+    def load(self, filepath, columns):
+        """有効なエントリがあれば (header, total, 列ごとの値リスト) を返す。"""
+        entry_path = self._entry_path(filepath, columns)
+        try:
+            with open(entry_path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if entry.get("version") != self.VERSION:
+            return None
+
+        st = os.stat(filepath)
+        if entry["size"] != st.st_size:
+            return None
+        if entry["mtime_ns"] != st.st_mtime_ns:
+            if entry["sha256"] != file_sha256(filepath):
+                return None
+            entry["mtime_ns"] = st.st_mtime_ns
+            self._write(entry_path, entry)
+
+        values = []
+        for labels, codes in entry["columns"]:
+            idx = array("I")
+            idx.frombytes(codes)
+            values.append([labels[c] for c in idx])
+        return entry["header"], entry["total"], values
+
+    def store(self, filepath, columns, header, total, values):
+        encoded = []
+        for col in values:
+            vocab = {}
+            codes = array("I", [vocab.setdefault(v, len(vocab)) for v in col])
+            encoded.append((list(vocab), codes.tobytes()))
+        st = os.stat(filepath)
+        entry = {
+            "version": self.VERSION,
+            "path": str(filepath),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(filepath),
+            "header": header,
+            "total": total,
+            "columns": encoded,
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._write(self._entry_path(filepath, columns), entry)
+
+    def _write(self, entry_path, entry):
+        # 並列実行時に読みかけのファイルを掴まないよう一時ファイル経由で置き換える
+        tmp = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry_path)
+
+
+def iter_csv_records(filepath, columns, stats, cache=None):
+    """CSVを列ごとにスキャンし（csv_scan）、columns だけを持つレコードを yield する。
+
+    stats にはヘッダ（header）と読み込んだ全データ行数（total）を書き込む。
+    ヘッダにないカラムは空文字として扱う（不足は validate_data で検出）。
+    cache があれば解析済みの列から復元し、なければ解析結果を保存する。
+    """
+    make = record_type(columns)._make
+    if cache is None:
+        # チャンクごとに流す（全行分の列を同時に持たない）
+        for values in iter_scan(filepath, columns, stats):
+            yield from map(make, zip(*values))
+        return
+
+    hit = cache.load(filepath, columns)
+    if hit is not None:
+        stats["header"], stats["total"], values = hit
+        stats["cached"] = True
+        yield from map(make, zip(*values))
+        return
+    scan = scan_csv(filepath, columns)
+    stats["header"] = scan.header
+    stats["total"] = scan.total
+    cache.store(filepath, columns, scan.header, scan.total, scan.values)
+    yield from map(make, zip(*scan.values))
+
+
+def load_csv_projected(filepath, columns, keep=None, cache=None):
+    """射影 + 行フィルタ付きで読み込み、keep を満たす行だけを保持する。"""
+    stats = {}
+    rows = [
+        r for r in iter_csv_records(filepath, columns, stats, cache)
+        if keep is None or keep(r)
+    ]
+    return CsvSnapshot(filepath, stats["header"], rows, stats["total"])
+
+
+def load_csv_snapshot(filepath):
+    """Q1-Q3 のような小さいCSVを全カラムのまま読み込む。"""
+    rows = load_csv_file(filepath)
+    header = list(rows[0].keys()) if rows else []
+    return CsvSnapshot(filepath, header, rows, len(rows))
+
+
+def load_q4_window(filepath, cache=None):
+    """Q4をストリーム読みし、eligible かつ最新月・前月の行だけを残す。
+
+    最新月は読み進めながら更新し、その前月より古くなった月の行は
+    その時点で破棄する。戻り値は (CsvSnapshot, 最新月)。
+    """
+    stats = {}
+    buckets = {}
+    latest = None
+    floor = None
+    for r in iter_csv_records(filepath, Q4_REQUIRED, stats, cache):
+        if not is_eligible(r):
+            continue
+        m = get_row_month(r)
+        if not m:
+            continue
+        if latest is None or m > latest:
+            latest = m
+            floor = prev_month_str(latest)
+            for old in [k for k in buckets if k < floor]:
+                del buckets[old]
+        elif m < floor:
+            continue
+        buckets.setdefault(m, []).append(r)
+
+    rows = [r for m in sorted(buckets) for r in buckets[m]]
+    snap = CsvSnapshot(filepath, stats["header"], rows, stats["total"])
+    return snap, latest
+
+
+def load_q4_window_archive(arch):
+    """load_q4_window のアーカイブ版。最新月と前月のパーティションだけを展開する。"""
+    reason = "reasons_for_ineligible_leads"
+    latest = None
+    for key in reversed(arch.partition_keys()):
+        if not key:
+            continue  # 月不明（get_row_month が None）の行
+        (reasons,) = arch.read([reason], [key])
+        if any(v == "" or v.lower() == "null" for v in reasons):
+            latest = key
+            break
+
+    rows = []
+    if latest:
+        make = record_type(Q4_REQUIRED)._make
+        values = arch.read(Q4_REQUIRED, [prev_month_str(latest), latest])
+        rows = [r for r in map(make, zip(*values)) if is_eligible(r)]
+    return CsvSnapshot(arch.path, arch.header, rows, arch.total), latest
+
+
+def load_archive_projected(arch, columns, partitions):
+    """load_csv_projected のアーカイブ版。行の絞り込みはパーティション単位で行う。"""
+    make = record_type(columns)._make
+    rows = list(map(make, zip(*arch.read(columns, partitions))))
+    return CsvSnapshot(arch.path, arch.header, rows, arch.total)
+
+
+def load_archive_snapshot(arch):
+    """load_csv_snapshot のアーカイブ版（全カラム、不足セルは None）。"""
+    header = arch.header
+    rows = [dict(zip(header, values)) for values in zip(*arch.read(header, missing=None))]
+    return CsvSnapshot(arch.path, header if rows else [], rows, len(rows))
+
+
+def stored_day_info(data_dir, query_id, date_str, csv_path=None):
+    """重複排除ストア（scripts/ingest.py store）の日付情報。
+
+    CSV があり、ストア登録時と内容が異なる場合は古いとみなして None。サイズと mtime が
+    同じなら同一とし、mtime だけ違う場合は sha256 で確かめる（ColumnarArchive.matches_source
+    と同じ）。作成元情報に sha256 がない古い登録も古いとみなす。
+    """
+    info = SnapshotStore(data_dir / STORE_DIR).day_info(query_id, date_str)
+    if info is None:
+        return None
+    if csv_path is None:
+        return info
+    src = info.get("source")
+    if not src or "sha256" not in src:
+        return None
+    st = csv_path.stat()
+    if st.st_size != src["size"]:
+        return None
+    if st.st_mtime_ns != src.get("mtime_ns") and file_sha256(csv_path) != src["sha256"]:
+        return None
+    return info
+
+
+def count_csv_rows(filepath, columns=None, cache=None):
+    """行を保持せずにCSVのデータ行数だけを数える（キャッシュがあればそれを使う）。"""
+    if cache is not None and columns is not None:
+        hit = cache.load(filepath, columns)
+        if hit is not None:
+            return hit[1]
+    return scan_csv(filepath, []).total
+
+
 # ================================================================
 # グローバルフィルタ
 # ================================================================
@@ -231,16 +555,6 @@ def get_row_month(row):
     return None
 
 
-def detect_current_month_q4(rows):
-    months = set()
-    for row in rows:
-        if is_eligible(row):
-            m = get_row_month(row)
-            if m:
-                months.add(m)
-    return sorted(months)[-1] if months else None
-
-
 def detect_current_month_q5(rows):
     months = set()
     for row in rows:
@@ -250,10 +564,6 @@ def detect_current_month_q5(rows):
     return sorted(months)[-1] if months else None
 
 
-def filter_q4(rows, month_str):
-    return [r for r in rows if is_eligible(r) and get_row_month(r) == month_str]
-
-
 def filter_q5(rows, month_str):
     return [r for r in rows if r.get("created_date_jst", "")[:7] == month_str]
 
@@ -262,37 +572,24 @@ def filter_q5(rows, month_str):
 # Q1-Q3 前月フォールバック（前月CSVがない場合、Q4/Q6から代替計算）
 # ================================================================
 
-def build_prev_actuals_from_q4(q4_prev):
-    """Q4前月データから各チャネルの着電数を集計。Q1前月CSVの代替。"""
-    ch_ids = defaultdict(set)
-    for r in q4_prev:
-        ch = r.get("inflow_route_media", "その他")
-        rid = r.get("id", "")
-        if rid:
-            ch_ids[ch].add(rid)
+def build_prev_actuals_from_q4(cube_prev):
+    """Q4前月キューブから各チャネルの着電数を集計。Q1前月CSVの代替。"""
     result = {}
     total = 0
     for ch in CHANNELS:
-        c = len(ch_ids.get(ch, set()))
+        c = cube_prev.funnel(("ch", ch))["leads"]
         result[ch] = c
         total += c
     result["全体"] = total
     return result
 
 
-def build_prev_sal_from_q4(q4_prev):
-    """Q4前月データから各チャネルのSAL数を集計。Q2前月CSVの代替。"""
-    ch_ids = defaultdict(set)
-    for r in q4_prev:
-        if str(r.get("is_sal", "0")) == "1":
-            ch = r.get("inflow_route_media", "その他")
-            rid = r.get("id", "")
-            if rid:
-                ch_ids[ch].add(rid)
+def build_prev_sal_from_q4(cube_prev):
+    """Q4前月キューブから各チャネルのSAL数を集計。Q2前月CSVの代替。"""
     result = {}
     total = 0
     for ch in CHANNELS:
-        c = len(ch_ids.get(ch, set()))
+        c = cube_prev.funnel(("ch", ch))["sals"]
         result[ch] = c
         total += c
     result["全体"] = total
@@ -336,25 +633,7 @@ def extract_targets(q_rows):
 # 集計ヘルパー
 # ================================================================
 
-def count_distinct(rows, key="id"):
-    return len(set(r[key] for r in rows if r.get(key)))
-
-
-def count_distinct_where(rows, predicate, key="id"):
-    return len(set(r[key] for r in rows if predicate(r) and r.get(key)))
-
-
-def compute_funnel(rows):
-    leads = count_distinct(rows)
-    connects = count_distinct_where(
-        rows, lambda r: str(r.get("is_connect", "0")) == "1"
-    )
-    sals = count_distinct_where(
-        rows, lambda r: str(r.get("is_sal", "0")) == "1"
-    )
-    tasks = count_distinct_where(
-        rows, lambda r: r.get("is_task_complete", "") == "完了"
-    )
+def funnel_metrics(leads, connects, sals, tasks):
     return {
         "leads": leads,
         "connects": connects,
@@ -389,6 +668,677 @@ def pp_diff(cur_rate, prev_rate):
     return None
 
 
+# ================================================================
+# Q4 列ストア + ファネルキューブ（1パス集計）
+# ================================================================
+
+# 集計軸として使う Q4 の文字列カラム（辞書コード化して保持）
+Q4_DIM_COLUMNS = ["inflow_route_media", "cv_content_sub__c",
+                  "business_hours_class", "is_holiday", "rep"]
+
+
+class Q4Columns:
+    """eligible な Q4 行を、対象月に絞ってインターン済みの列配列に格納する。
+
+    文字列カラムは辞書コード化して array('i') に、フラグは bytearray に持つ。
+    lead id は密な整数コード（空は -1）に変換し、distinct 集計を整数で行う。
+    lead_codes を渡すと既存のコード割り当てを引き継ぐ（差分更新用）。
+    """
+
+    def __init__(self, months, lead_codes=None):
+        self.months = list(months)
+        self.month_codes = {m: i for i, m in enumerate(self.months)}
+        self.lead_codes = lead_codes if lead_codes is not None else {}
+        self.vocab = {c: {} for c in Q4_DIM_COLUMNS}
+        self.labels = {c: [] for c in Q4_DIM_COLUMNS}
+        self.dims = {c: array("i") for c in Q4_DIM_COLUMNS}
+        self.lead = array("i")
+        self.month = array("i")
+        self.day = array("i")  # date.toordinal()、日付なしは 0
+        self.connect = bytearray()
+        self.sal = bytearray()
+        self.task = bytearray()
+        self.row_counts = {m: 0 for m in self.months}
+        self.periods = {}  # month -> [最小日付文字列, 最大日付文字列]
+
+    def __len__(self):
+        return len(self.lead)
+
+    def _code(self, col, value):
+        vocab = self.vocab[col]
+        code = vocab.get(value)
+        if code is None:
+            code = len(vocab)
+            vocab[value] = code
+            self.labels[col].append(sys.intern(value))
+        return code
+
+    def label(self, col, code):
+        return self.labels[col][code] if code >= 0 else None
+
+    def append(self, row, month):
+        self.month.append(self.month_codes[month])
+        self.row_counts[month] += 1
+
+        rid = row.get("id", "")
+        if rid:
+            code = self.lead_codes.get(rid)
+            if code is None:
+                code = len(self.lead_codes)
+                self.lead_codes[rid] = code
+            self.lead.append(code)
+        else:
+            self.lead.append(-1)
+
+        self.dims["inflow_route_media"].append(
+            self._code("inflow_route_media", row.get("inflow_route_media", "")))
+        self.dims["cv_content_sub__c"].append(
+            self._code("cv_content_sub__c", row.get("cv_content_sub__c") or "(空)"))
+        self.dims["business_hours_class"].append(
+            self._code("business_hours_class", row.get("business_hours_class", "")))
+        self.dims["is_holiday"].append(
+            self._code("is_holiday", row.get("is_holiday", "")))
+        rep = classify_user(row.get("user_name", ""))
+        self.dims["rep"].append(self._code("rep", rep) if rep is not None else -1)
+
+        created = row.get("created_date_jst", "")
+        d = parse_date(created)
+        self.day.append(d.toordinal() if d else 0)
+        if created:
+            ds = created[:10]
+            period = self.periods.get(month)
+            if period is None:
+                self.periods[month] = [ds, ds]
+            elif ds < period[0]:
+                period[0] = ds
+            elif ds > period[1]:
+                period[1] = ds
+
+        self.connect.append(str(row.get("is_connect", "0")) == "1")
+        self.sal.append(str(row.get("is_sal", "0")) == "1")
+        self.task.append(row.get("is_task_complete", "") == "完了")
+
+    def facts(self):
+        """行ごとに (月コード, lead, 集計軸ラベル, フラグ) のタプルを返す。"""
+        ch_col = self.dims["inflow_route_media"]
+        cv_col = self.dims["cv_content_sub__c"]
+        bh_col = self.dims["business_hours_class"]
+        hol_col = self.dims["is_holiday"]
+        rep_col = self.dims["rep"]
+        week_of_day = {}
+        for i in range(len(self)):
+            day = self.day[i]
+            wk = None
+            if day:
+                wk = week_of_day.get(day)
+                if wk is None:
+                    wk = iso_week_key(date.fromordinal(day))
+                    week_of_day[day] = wk
+            yield (
+                self.month[i], self.lead[i],
+                self.label("inflow_route_media", ch_col[i]),
+                self.label("cv_content_sub__c", cv_col[i]),
+                self.label("business_hours_class", bh_col[i]),
+                self.label("is_holiday", hol_col[i]),
+                self.label("rep", rep_col[i]),
+                wk, self.connect[i], self.sal[i], self.task[i],
+            )
+
+    @classmethod
+    def from_rows(cls, rows, months, lead_codes=None):
+        cols = cls(months, lead_codes)
+        wanted = set(cols.months)
+        for row in rows:
+            if not is_eligible(row):
+                continue
+            m = get_row_month(row)
+            if m in wanted:
+                cols.append(row, m)
+        return cols
+
+
+# lead 単位フラグのビット位置（FunnelCube.flags の並びと同じ）
+FLAG_CONNECT, FLAG_SAL, FLAG_TASK = 1, 2, 4
+
+
+def flag_bits(connect, sal, task):
+    return (FLAG_CONNECT if connect else 0) | (FLAG_SAL if sal else 0) | (
+        FLAG_TASK if task else 0)
+
+
+def set_bit(bits, i):
+    byte = i >> 3
+    if byte >= len(bits):
+        bits.extend(bytes(byte + 1 - len(bits)))
+    bits[byte] |= 1 << (i & 7)
+
+
+def clear_bit(bits, i):
+    byte = i >> 3
+    if byte < len(bits):
+        bits[byte] &= ~(1 << (i & 7)) & 0xFF
+
+
+class FunnelCube:
+    """1ヶ月分の Q4 ファネル集計キューブ。
+
+    キーは集計軸のタプル（例: ("ch", "LIS"), ("cv", "LIS", "デモ電話_LP")）。
+    distinct 集計は lead コードのビットマップで行う。キーごとに所属 lead の
+    ビットマップを持ち、接続/SAL/タスク完了数は lead 単位のフラグビットマップとの
+    積の popcount で求める。
+
+    同じ月の行が複数の集計軸の組に分かれる lead（重複行で担当者が違う等）は
+    キーごとにフラグが異なりうるので、ビットマップには入れず、キーごとの
+    split 辞書（lead → フラグ）で個別に持つ。children() はキーの登録順
+    （行の出現順）を返す。
+    """
+
+    def __init__(self, n_leads=0):
+        # ビットマップは n_leads ビット分を確保しておき、超えた分は set_bit で伸ばす
+        self.nbytes = (n_leads + 7) >> 3
+        self.groups = {}  # key -> (所属 lead ビットマップ, split 辞書)
+        self.row_counts = {}
+        self.members = defaultdict(list)
+        self.flags = tuple(bytearray(self.nbytes) for _ in range(3))  # connect/sal/task
+        self._flag_ints = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_flag_ints"] = None
+        return state
+
+    def register(self, key):
+        """1行分のキーを登録する（lead の有無に関わらずグループの存在を数える）。"""
+        if key not in self.row_counts:
+            self.groups[key] = (bytearray(self.nbytes), {})
+            self.row_counts[key] = 0
+            self.members[key[:-1]].append(key[-1])
+        self.row_counts[key] += 1
+
+    def unregister(self, key):
+        """register の逆操作。寄与行がなくなったキーは削除する。"""
+        self.row_counts[key] -= 1
+        if self.row_counts[key] == 0:
+            del self.groups[key]
+            del self.row_counts[key]
+            self.members[key[:-1]].remove(key[-1])
+
+    def set_lead(self, lead, facts):
+        """lead の当月の全行 [(キー列, フラグ), ...] を反映する。
+
+        キーは register 済みであること。同じ lead を反映し直すときは先に clear_lead する。
+        """
+        keys = facts[0][0]
+        if all(k == keys for k, _ in facts):
+            flags = 0
+            for _, f in facts:
+                flags |= f
+            groups = self.groups
+            for key in keys:
+                set_bit(groups[key][0], lead)
+            for i, bits in enumerate(self.flags):
+                if flags >> i & 1:
+                    set_bit(bits, lead)
+                else:
+                    clear_bit(bits, lead)
+            self._flag_ints = None
+        else:
+            for keys, f in facts:
+                self.add_split(lead, keys, f)
+
+    def add_split(self, lead, keys, flags):
+        """集計軸の違う行を持つ lead の1行分を、キーごとの split 辞書に加える。"""
+        for key in keys:
+            split = self.groups[key][1]
+            split[lead] = split.get(lead, 0) | flags
+
+    def split_lead(self, lead, keys):
+        """ビットマップで持っていた lead を split 辞書へ移す（keys は既存行のキー列）。"""
+        byte, shift = lead >> 3, lead & 7
+        flags = 0
+        for i, bits in enumerate(self.flags):
+            if byte < len(bits) and bits[byte] >> shift & 1:
+                flags |= 1 << i
+            clear_bit(bits, lead)
+        for key in keys:
+            clear_bit(self.groups[key][0], lead)
+        self.add_split(lead, keys, flags)
+        self._flag_ints = None
+
+    def clear_lead(self, lead, facts):
+        """set_lead の逆操作（unregister より先に呼ぶ）。"""
+        keys = facts[0][0]
+        if all(k == keys for k, _ in facts):
+            for key in keys:
+                clear_bit(self.groups[key][0], lead)
+            for bits in self.flags:
+                clear_bit(bits, lead)
+            self._flag_ints = None
+        else:
+            for keys, _ in facts:
+                for key in keys:
+                    self.groups[key][1].pop(lead, None)
+
+    def has(self, key):
+        return key in self.groups
+
+    def children(self, *prefix):
+        """prefix 直下のキー要素を登録順で返す。"""
+        return self.members.get(prefix, [])
+
+    def flag_ints(self):
+        flag_ints = self._flag_ints
+        if flag_ints is None:
+            flag_ints = tuple(int.from_bytes(bits, "little") for bits in self.flags)
+            self._flag_ints = flag_ints
+        return flag_ints
+
+    def funnel(self, key):
+        g = self.groups.get(key)
+        if g is None:
+            return funnel_metrics(0, 0, 0, 0)
+        bits, split = g
+        members = int.from_bytes(bits, "little")
+        connect, sal, task = self.flag_ints()
+        counts = [
+            members.bit_count(), (members & connect).bit_count(),
+            (members & sal).bit_count(), (members & task).bit_count(),
+        ]
+        for f in split.values():
+            counts[0] += 1
+            for i, flag in enumerate((FLAG_CONNECT, FLAG_SAL, FLAG_TASK), 1):
+                if f & flag:
+                    counts[i] += 1
+        return funnel_metrics(*counts)
+
+    def week_label(self, key):
+        year, week = key[-1]
+        return iso_week_label(date.fromisocalendar(year, week, 1))
+
+
+def row_cube_keys(ch, cv, bh, hol, rep, wk):
+    """1行が寄与するキューブキーを列挙する。"""
+    keys = [("all",), ("ch", ch), ("cv", ch, cv), ("bh", ch, bh), ("hol", ch, hol)]
+    if wk is not None:
+        keys.append(("wk", ch, wk))
+    if rep is not None:
+        keys += [("reps",), ("rep", rep), ("rep_ch", rep, ch), ("reps_ch", ch)]
+        if wk is not None:
+            keys.append(("rep_wk", rep, wk))
+    return tuple(keys)
+
+
+def build_funnel_cubes(cols):
+    """Q4Columns を1回走査し、月ごとの FunnelCube を構築する。
+
+    lead のビットは最初の行で立て、同じ月に集計軸の違う行が来た lead だけを
+    split 辞書へ移す。
+    """
+    n_leads = len(cols.lead_codes)
+    n_months = len(cols.months)
+    cubes = {m: FunnelCube(n_leads) for m in cols.months}
+    by_code = [cubes[m] for m in cols.months]
+    first_keys = {}  # lead * 月数 + 月コード -> 最初の行のキー列。split 済みなら None
+    for month, lead, ch, cv, bh, hol, rep, wk, connect, sal, task in cols.facts():
+        cube = by_code[month]
+        row_counts = cube.row_counts
+        keys = row_cube_keys(ch, cv, bh, hol, rep, wk)
+        for key in keys:
+            if key in row_counts:
+                row_counts[key] += 1
+            else:
+                cube.register(key)
+        if lead < 0:
+            continue
+
+        slot = lead * n_months + month
+        seen = first_keys.get(slot, ())
+        if seen == () or seen == keys:
+            byte, mask = lead >> 3, 1 << (lead & 7)
+            if seen == ():
+                first_keys[slot] = keys
+                groups = cube.groups
+                for key in keys:
+                    groups[key][0][byte] |= mask
+            connect_bits, sal_bits, task_bits = cube.flags
+            if connect:
+                connect_bits[byte] |= mask
+            if sal:
+                sal_bits[byte] |= mask
+            if task:
+                task_bits[byte] |= mask
+        else:
+            if seen is not None:
+                cube.split_lead(lead, seen)
+                first_keys[slot] = None
+            cube.add_split(lead, keys, flag_bits(connect, sal, task))
+    for cube in by_code:
+        cube._flag_ints = None
+    return cubes
+
+
+# ================================================================
+# Q4 集計キューブ（bincount 方式の代替バックエンド）
+# ================================================================
+
+# (キー種別, キーに含める集計軸, キーには含めないが行の対象条件となる集計軸)
+# row_cube_keys と同じキー体系を、種別ごとの列演算で構築する。
+CUBE_KINDS = [
+    ("all", (), ()),
+    ("ch", ("ch",), ()),
+    ("cv", ("ch", "cv"), ()),
+    ("bh", ("ch", "bh"), ()),
+    ("hol", ("ch", "hol"), ()),
+    ("wk", ("ch", "wk"), ()),
+    ("reps", (), ("rep",)),
+    ("rep", ("rep",), ()),
+    ("rep_ch", ("rep", "ch"), ()),
+    ("reps_ch", ("ch",), ("rep",)),
+    ("rep_wk", ("rep", "wk"), ()),
+]
+
+
+class CountCube(FunnelCube):
+    """distinct lead 数だけを持つ読み取り専用の FunnelCube。
+
+    groups の値は lead ビットマップではなく (leads, connects, sals, tasks) の件数。
+    register / set_lead 等による差分更新はできない。
+    """
+
+    def _read_only(self, *args):
+        raise TypeError("CountCube は読み取り専用です")
+
+    register = unregister = set_lead = clear_lead = _read_only
+
+    def funnel(self, key):
+        g = self.groups.get(key)
+        if g is None:
+            return funnel_metrics(0, 0, 0, 0)
+        return funnel_metrics(*g)
+
+
+def cube_axes(cols):
+    """集計軸名 → (行ごとのコード列, コード→キー要素ラベル)。対象外の行は -1。"""
+    day_weeks = {}
+    week_codes = {}
+    week_labels = []
+    wk = array("i")
+    for day in cols.day:
+        if not day:
+            wk.append(-1)
+            continue
+        code = day_weeks.get(day)
+        if code is None:
+            key = iso_week_key(date.fromordinal(day))
+            code = week_codes.get(key)
+            if code is None:
+                code = week_codes[key] = len(week_labels)
+                week_labels.append(key)
+            day_weeks[day] = code
+        wk.append(code)
+
+    axes = {"wk": (wk, week_labels)}
+    for axis, col in [("ch", "inflow_route_media"), ("cv", "cv_content_sub__c"),
+                      ("bh", "business_hours_class"), ("hol", "is_holiday"),
+                      ("rep", "rep")]:
+        axes[axis] = (cols.dims[col], cols.labels[col])
+    return axes
+
+
+def _bincount(values, size):
+    counts = Counter(values)
+    return [counts[i] for i in range(size)]
+
+
+def _group_counts_py(codes, lead, flag_cols):
+    """合成コード列を出現順の密なグループ番号に振り直し、bincount で集計する。
+
+    戻り値は (出現順の合成コード, 行数, leads, connects, sals, tasks)。
+    distinct lead 数は (グループ番号, lead) の組を重複排除してから数える。
+    flag_cols はフラグごとの「lead のあるフラグ行」の行番号リスト。
+    """
+    gid_of = {}
+    for c in codes:
+        if c >= 0 and c not in gid_of:
+            gid_of[c] = len(gid_of)
+    n = len(gid_of)
+    gids = [gid_of[c] if c >= 0 else -1 for c in codes]
+    result = [list(gid_of), _bincount([g for g in gids if g >= 0], n)]
+    pairs = {(g << 32) | l for g, l in zip(gids, lead) if g >= 0 and l >= 0}
+    result.append(_bincount([p >> 32 for p in pairs], n))
+    for rows in flag_cols:
+        pairs = {(gids[i] << 32) | lead[i] for i in rows if gids[i] >= 0}
+        result.append(_bincount([p >> 32 for p in pairs], n))
+    return result
+
+
+def _group_counts_np(codes, lead, flag_cols):
+    """_group_counts_py の NumPy 版（戻り値も同じ形。flag_cols はフラグ列そのもの）。"""
+    codes = np.asarray(codes, dtype=np.int64)
+    lead = np.asarray(lead, dtype=np.int64)
+    valid = codes >= 0
+    uniq, first, inverse = np.unique(
+        codes[valid], return_index=True, return_inverse=True)
+    perm = np.argsort(first, kind="stable")  # 出現順 → uniq の添字
+    order = uniq[perm]
+    n = len(order)
+    rank = np.empty(n, dtype=np.int64)  # uniq の添字 → 出現順
+    rank[perm] = np.arange(n)
+    gid = np.full(len(codes), -1, dtype=np.int64)
+    gid[valid] = rank[inverse]
+
+    result = [order.tolist(), np.bincount(gid[valid], minlength=n).tolist()]
+    has_lead = valid & (lead >= 0)
+    for mask in [has_lead] + [has_lead & (np.asarray(f, dtype=bool)) for f in flag_cols]:
+        pairs = np.unique((gid[mask] << 32) | lead[mask])
+        result.append(np.bincount(pairs >> 32, minlength=n).tolist())
+    return result
+
+
+def _composite_codes_py(month, key_cols, cond_cols):
+    """(月, 集計軸...) を混合基数で1つの整数にまとめる。対象外の行は -1。
+
+    key_cols は (コード列, 基数) のリスト、cond_cols は条件軸のコード列のリスト。
+    """
+    codes = list(month)
+    for col, mult in key_cols:
+        codes = [c + v * mult if c >= 0 and v >= 0 else -1 for c, v in zip(codes, col)]
+    for col in cond_cols:
+        codes = [c if v >= 0 else -1 for c, v in zip(codes, col)]
+    return codes
+
+
+def _composite_codes_np(month, key_cols, cond_cols):
+    """_composite_codes_py の NumPy 版。"""
+    codes = np.asarray(month, dtype=np.int64)
+    for col, mult in key_cols:
+        v = np.asarray(col, dtype=np.int64)
+        codes = np.where((codes >= 0) & (v >= 0), codes + v * mult, -1)
+    for col in cond_cols:
+        codes = np.where(np.asarray(col) >= 0, codes, -1)
+    return codes
+
+
+def build_count_cubes(cols, use_numpy=False):
+    """Q4Columns から月ごとの CountCube を列演算 + bincount で構築する。
+
+    集計軸の辞書コードを混合基数で1つの整数（合成コード）にまとめ、
+    キー種別ごとに全グループの件数を一括で求める。結果は build_funnel_cubes と同一。
+    use_numpy=True なら NumPy で計算する（numpy が import できること）。
+    """
+    n_months = len(cols.months)
+    axes = cube_axes(cols)
+    sizes = {axis: max(len(labels), 1) for axis, (_, labels) in axes.items()}
+    flag_cols = (cols.connect, cols.sal, cols.task)
+    if use_numpy:
+        composite, count = _composite_codes_np, _group_counts_np
+    else:
+        composite, count = _composite_codes_py, _group_counts_py
+        lead = cols.lead
+        flag_cols = tuple(
+            [i for i, f in enumerate(flags) if f and lead[i] >= 0] for flags in flag_cols
+        )
+
+    cubes = {m: CountCube() for m in cols.months}
+    for kind, key_axes, cond_axes in CUBE_KINDS:
+        key_cols = []
+        mult = n_months
+        for axis in key_axes:
+            key_cols.append((axes[axis][0], mult))
+            mult *= sizes[axis]
+        codes = composite(cols.month, key_cols, [axes[a][0] for a in cond_axes])
+
+        order, rows, *counts = count(codes, cols.lead, flag_cols)
+        for i, code in enumerate(order):
+            month, rest = code % n_months, code // n_months
+            key = [kind]
+            for axis in key_axes:
+                key.append(axes[axis][1][rest % sizes[axis]])
+                rest //= sizes[axis]
+            key = tuple(key)
+            cube = cubes[cols.months[month]]
+            cube.groups[key] = tuple(c[i] for c in counts)
+            cube.row_counts[key] = rows[i]
+            cube.members[key[:-1]].append(key[-1])
+    return cubes
+
+
+# ================================================================
+# Q4 差分更新（前日の集計状態 + 当日CSVの lead 単位の差分）
+# ================================================================
+
+CUBE_STATE_VERSION = 2
+
+
+def lead_facts(cols):
+    """lead コードごとの行ファクト（月はラベル化）と、(月, チャネル, CV) の出現順。"""
+    by_lead = defaultdict(list)
+    cv_order = {}
+    for fact in cols.facts():
+        month = cols.months[fact[0]]
+        by_lead[fact[1]].append((month,) + fact[2:])
+        cv_order.setdefault((month, fact[2], fact[3]), None)
+    return {lead: tuple(rows) for lead, rows in by_lead.items()}, list(cv_order)
+
+
+def month_facts(rows):
+    """lead_facts の行を月ごとの [(キー列, フラグ), ...] にまとめる。"""
+    by_month = defaultdict(list)
+    for month, ch, cv, bh, hol, rep, wk, connect, sal, task in rows:
+        by_month[month].append(
+            (row_cube_keys(ch, cv, bh, hol, rep, wk), flag_bits(connect, sal, task)))
+    return by_month
+
+
+def apply_lead_delta(cubes, lead, old_rows, new_rows):
+    """1 lead 分の行を差し替える（旧行をすべて除いてから新行を加える）。
+
+    lead < 0（id 空欄の行の集まり）はキーの登録数だけを更新する。
+    """
+    for month, facts in month_facts(old_rows).items():
+        cube = cubes[month]
+        if lead >= 0:
+            cube.clear_lead(lead, facts)
+        for keys, _ in facts:
+            for key in keys:
+                cube.unregister(key)
+    for month, facts in month_facts(new_rows).items():
+        cube = cubes[month]
+        for keys, _ in facts:
+            for key in keys:
+                cube.register(key)
+        if lead >= 0:
+            cube.set_lead(lead, facts)
+
+
+def update_funnel_cubes(state, cols):
+    """前日の状態に当日との差分だけを適用してキューブを更新する。
+
+    戻り値は (cubes, lead_rows, delta)。delta は新規/変更/削除 lead 数。
+    """
+    cubes = state["cubes"]
+    old = state["lead_rows"]
+    new, cv_order = lead_facts(cols)
+    delta = {"added": 0, "changed": 0, "removed": 0}
+
+    for lead, new_rows in new.items():
+        old_rows = old.get(lead, ())
+        if old_rows == new_rows:
+            continue
+        delta["changed" if old_rows else "added"] += 1
+        apply_lead_delta(cubes, lead, old_rows, new_rows)
+    for lead, old_rows in old.items():
+        if lead not in new:
+            delta["removed"] += 1
+            apply_lead_delta(cubes, lead, old_rows, ())
+
+    # 表示順が出力に影響する CV の並びだけは当日の出現順に揃え直す
+    cv_members = defaultdict(list)
+    for month, ch, cv in cv_order:
+        cv_members[(month, ch)].append(cv)
+    for (month, ch), cvs in cv_members.items():
+        cubes[month].members[("cv", ch)] = cvs
+
+    return cubes, new, delta
+
+
+def cube_state_path(cache_dir, date_str):
+    return Path(cache_dir) / "state" / f"q4_cube-{date_str}.pickle"
+
+
+def load_prev_cube_state(cache_dir, date_str, months):
+    """date_str 以前で最新の集計状態を読む。対象月が異なれば使わない。"""
+    state_dir = Path(cache_dir) / "state"
+    if not state_dir.exists():
+        return None
+    candidates = sorted(
+        p for p in state_dir.glob("q4_cube-*.pickle")
+        if p.stem[len("q4_cube-"):] <= date_str
+    )
+    if not candidates:
+        return None
+    try:
+        with open(candidates[-1], "rb") as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if state.get("version") != CUBE_STATE_VERSION or state["months"] != list(months):
+        return None
+    state["source"] = candidates[-1].name
+    return state
+
+
+def save_cube_state(cache_dir, date_str, months, lead_codes, lead_rows, cubes):
+    path = cube_state_path(cache_dir, date_str)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    state = {
+        "version": CUBE_STATE_VERSION,
+        "months": list(months),
+        "lead_codes": lead_codes,
+        "lead_rows": lead_rows,
+        "cubes": cubes,
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def cube_mismatches(cubes_a, cubes_b):
+    """2つのキューブ集合の差異（キー）を列挙する。整合性チェック用。"""
+    diffs = []
+    for month in cubes_a:
+        a, b = cubes_a[month], cubes_b[month]
+        for key in set(a.groups) | set(b.groups):
+            if (a.row_counts.get(key) != b.row_counts.get(key)
+                    or a.funnel(key) != b.funnel(key)):
+                diffs.append((month, key))
+        for prefix in set(a.members) | set(b.members):
+            if prefix[:1] == ("cv",) and a.children(*prefix) != b.children(*prefix):
+                diffs.append((month, prefix + ("<order>",)))
+    return diffs
+
+
 # ================================================================
 # STEP 1: 数値進捗サマリ
 # ================================================================
@@ -468,7 +1418,10 @@ def compute_step1_landing(q_rows, prev_q_rows, label,
             fmt_int(forecast) if forecast is not None else "-",
             fmt_int(target), ach_display, prev_display, diff_display, judgment,
         ])
-        results[ch] = {"ach": ach, "judgment": judgment, "prev_ach": prev_ach}
+        results[ch] = {
+            "cumulative": cum, "forecast": forecast, "target": target,
+            "ach": ach, "judgment": judgment, "prev_ach": prev_ach,
+        }
 
     table = md_table(headers, rows_out)
     if not prev_q_rows and not fallback_prev_actuals:
@@ -480,8 +1433,10 @@ def compute_step1_landing(q_rows, prev_q_rows, label,
 
 
 def compute_step1_issues(results_1, results_2, results_3):
+    """課題チャネル表と、表と同じ並びのレコード（_results.json 用）を返す。"""
     headers = ["チャネル", "着電", "SAL", "商談実施", "Bad数", "位置づけ"]
     rows_out = []
+    records = {}
 
     for ch in CHANNELS:
         r1 = results_1.get(ch, {})
@@ -512,6 +1467,14 @@ def compute_step1_issues(results_1, results_2, results_3):
             f"**{ch}**" if bad_count >= 2 else ch,
             ach1, ach2, ach3, str(bad_count), position,
         ])
+        records[rows_out[-1][0]] = {
+            "channel": ch, "bad_count": bad_count,
+            "position": position.replace("**", ""),
+            "kpis": {
+                label: {"ach": r.get("ach"), "judgment": r.get("judgment", "-")}
+                for label, r in [("着電", r1), ("SAL", r2), ("商談実施", r3)]
+            },
+        }
 
     rows_out.sort(key=lambda r: (-int(r[4]), r[0]))
 
@@ -538,17 +1501,14 @@ def compute_step1_issues(results_1, results_2, results_3):
     if commentary:
         table += "\n\n" + "\n".join(commentary)
 
-    return table
+    return table, [records[r[0]] for r in rows_out]
 
 
 # ================================================================
 # STEP 2-1: ファネル転換率
 # ================================================================
 
-def compute_step2_funnel(q4_cur, q4_prev):
-    cur_groups = group_by(q4_cur, lambda r: r.get("inflow_route_media", ""))
-    prev_groups = group_by(q4_prev, lambda r: r.get("inflow_route_media", ""))
-
+def compute_step2_funnel(cube_cur, cube_prev):
     headers = [
         "チャネル", "リード数", "前月比", "CN率", "前月比",
         "SAL率", "前月比", "タスク完了率", "前月比",
@@ -556,12 +1516,27 @@ def compute_step2_funnel(q4_cur, q4_prev):
     rows_out = []
     cur_metrics = {}
     prev_metrics = {}
+    records = []
 
     for ch in CHANNELS:
-        cm = compute_funnel(cur_groups.get(ch, []))
-        pm = compute_funnel(prev_groups.get(ch, []))
+        cm = cube_cur.funnel(("ch", ch))
+        pm = cube_prev.funnel(("ch", ch))
         cur_metrics[ch] = cm
         prev_metrics[ch] = pm
+        pp = {
+            rate: pp_diff(cm[rate], pm[rate])
+            for rate in ["cn_rate", "sal_rate", "task_rate"]
+        }
+        records.append({
+            "channel": ch, "current": cm, "previous": pm,
+            "lead_change_pct": (
+                (cm["leads"] - pm["leads"]) / pm["leads"] * 100 if pm["leads"] else None
+            ),
+            "pp_diff": pp,
+            "worsened": {
+                rate: v is not None and v <= PP_WORSEN for rate, v in pp.items()
+            },
+        })
 
         rows_out.append([
             ch,
@@ -594,40 +1569,31 @@ def compute_step2_funnel(q4_cur, q4_prev):
 
     ref_table = md_table(ref_headers, ref_rows)
 
-    return main_table + "\n\n参考: 絶対数\n\n" + ref_table, cur_metrics, prev_metrics
+    return (main_table + "\n\n参考: 絶対数\n\n" + ref_table,
+            cur_metrics, prev_metrics, records)
 
 
 # ================================================================
 # STEP 2-2: CVコンテンツ別
 # ================================================================
 
-def compute_step2_cv(q4_cur, q4_prev, cur_channel_metrics):
+def compute_step2_cv(cube_cur, cube_prev, cur_channel_metrics):
+    """CVコンテンツ別 Top10 と、チャネル別のレコード（_results.json 用）を返す。"""
     output_sections = []
+    records = {}
 
     for ch in CHANNELS:
-        ch_rows_cur = [r for r in q4_cur if r.get("inflow_route_media") == ch]
-        ch_rows_prev = [r for r in q4_prev if r.get("inflow_route_media") == ch]
-
-        if not ch_rows_cur:
+        if not cube_cur.has(("ch", ch)):
             continue
 
         ch_avg = cur_channel_metrics.get(ch, {})
         ch_cn_avg = ch_avg.get("cn_rate")
         ch_sal_avg = ch_avg.get("sal_rate")
 
-        cv_groups_cur = group_by(
-            ch_rows_cur,
-            lambda r: r.get("cv_content_sub__c") or "(空)",
-        )
-        cv_groups_prev = group_by(
-            ch_rows_prev,
-            lambda r: r.get("cv_content_sub__c") or "(空)",
-        )
-
         cv_data = []
-        for cv, rows in cv_groups_cur.items():
-            m = compute_funnel(rows)
-            pm = compute_funnel(cv_groups_prev.get(cv, []))
+        for cv in cube_cur.children("cv", ch):
+            m = cube_cur.funnel(("cv", ch, cv))
+            pm = cube_prev.funnel(("cv", ch, cv))
             cv_data.append((cv, m, pm))
 
         cv_data.sort(key=lambda x: -x[1]["leads"])
@@ -638,6 +1604,7 @@ def compute_step2_cv(q4_cur, q4_prev, cur_channel_metrics):
             "SAL率", "差分", "前月CN比", "前月SAL比",
         ]
         rows_out = []
+        cv_records = []
 
         for cv, m, pm in top10:
             # vs channel average
@@ -678,6 +1645,12 @@ def compute_step2_cv(q4_cur, q4_prev, cur_channel_metrics):
                 fmt_pct(m["sal_rate"]), sal_diff_s,
                 cn_prev_s, sal_prev_s,
             ])
+            cv_records.append({
+                "cv": cv, "current": m, "previous": pm,
+                "cn_vs_avg": cn_vs_avg, "sal_vs_avg": sal_vs_avg,
+                "cn_below_avg": bool(cn_flag), "sal_below_avg": bool(sal_flag),
+                "is_new": pm["leads"] == 0,
+            })
 
         ch_section = f"#### {ch} Top10 CVコンテンツ\n\n"
         ch_section += (
@@ -686,8 +1659,9 @@ def compute_step2_cv(q4_cur, q4_prev, cur_channel_metrics):
         )
         ch_section += md_table(headers, rows_out)
         output_sections.append(ch_section)
+        records[ch] = {"cn_avg": ch_cn_avg, "sal_avg": ch_sal_avg, "top10": cv_records}
 
-    return "\n\n".join(output_sections)
+    return "\n\n".join(output_sections), records
 
 
 # ================================================================
@@ -761,32 +1735,19 @@ def compute_step2_sal_speed(q5_cur, q5_prev):
 # STEP 2-4: 時系列トレンド
 # ================================================================
 
-def compute_step2_timeseries(q4_cur):
+def compute_step2_timeseries(cube_cur):
     sections = []
 
     # Weekly trend per channel
     for ch in CHANNELS:
-        ch_rows = [r for r in q4_cur if r.get("inflow_route_media") == ch]
-        if not ch_rows:
+        if not cube_cur.has(("ch", ch)):
             continue
 
-        weekly_groups = defaultdict(list)
-        for row in ch_rows:
-            d = parse_date(row.get("created_date_jst", ""))
-            if d:
-                weekly_groups[iso_week_key(d)].append(row)
-
         wk_headers = ["週", "リード数", "CN率", "SAL率"]
         wk_rows = []
-        for wk in sorted(weekly_groups.keys()):
-            rows = weekly_groups[wk]
-            m = compute_funnel(rows)
-            dates = [
-                parse_date(r.get("created_date_jst", ""))
-                for r in rows
-                if parse_date(r.get("created_date_jst", ""))
-            ]
-            label = iso_week_label(min(dates)) if dates else f"W{wk[1]:02d}"
+        for wk in sorted(cube_cur.children("wk", ch)):
+            m = cube_cur.funnel(("wk", ch, wk))
+            label = cube_cur.week_label(("wk", ch, wk))
             wk_rows.append([
                 label, fmt_int(m["leads"]),
                 fmt_pct(m["cn_rate"]), fmt_pct(m["sal_rate"]),
@@ -801,12 +1762,9 @@ def compute_step2_timeseries(q4_cur):
     bh_headers = ["区分", "チャネル", "リード数", "CN率", "SAL率"]
     bh_rows = []
     for ch in CHANNELS:
-        ch_rows = [r for r in q4_cur if r.get("inflow_route_media") == ch]
-        bh_groups = group_by(ch_rows, lambda r: r.get("business_hours_class", ""))
         for bh in ["営業時間内(10_19)", "営業時間外"]:
-            bh_r = bh_groups.get(bh, [])
-            if bh_r:
-                m = compute_funnel(bh_r)
+            if cube_cur.has(("bh", ch, bh)):
+                m = cube_cur.funnel(("bh", ch, bh))
                 lbl = "営業時間内" if "内" in bh else "営業時間外"
                 bh_rows.append([
                     lbl, ch, fmt_int(m["leads"]),
@@ -822,12 +1780,9 @@ def compute_step2_timeseries(q4_cur):
     hol_headers = ["区分", "チャネル", "リード数", "CN率", "SAL率"]
     hol_rows = []
     for ch in CHANNELS:
-        ch_rows = [r for r in q4_cur if r.get("inflow_route_media") == ch]
-        hol_groups = group_by(ch_rows, lambda r: r.get("is_holiday", ""))
         for hol in ["平日", "休日"]:
-            hol_r = hol_groups.get(hol, [])
-            if hol_r:
-                m = compute_funnel(hol_r)
+            if cube_cur.has(("hol", ch, hol)):
+                m = cube_cur.funnel(("hol", ch, hol))
                 hol_rows.append([
                     hol, ch, fmt_int(m["leads"]),
                     fmt_pct(m["cn_rate"]), fmt_pct(m["sal_rate"]),
@@ -845,26 +1800,12 @@ def compute_step2_timeseries(q4_cur):
 # STEP 2-5: 担当者別パフォーマンス
 # ================================================================
 
-def filter_analysis_reps(rows):
-    result = []
-    for row in rows:
-        cls = classify_user(row.get("user_name", ""))
-        if cls is not None:
-            row_copy = dict(row)
-            row_copy["_rep"] = cls
-            result.append(row_copy)
-    return result
+REP_ORDER = IS_REPS + ["外注（合算）"]
 
 
-def compute_step2_user_summary(q4_cur, q4_prev):
-    cur_reps = filter_analysis_reps(q4_cur)
-    prev_reps = filter_analysis_reps(q4_prev)
-
-    overall_cur = compute_funnel(cur_reps)
-    overall_prev = compute_funnel(prev_reps)
-
-    cur_groups = group_by(cur_reps, lambda r: r["_rep"])
-    prev_groups = group_by(prev_reps, lambda r: r["_rep"])
+def compute_step2_user_summary(cube_cur, cube_prev):
+    overall_cur = cube_cur.funnel(("reps",))
+    overall_prev = cube_prev.funnel(("reps",))
 
     headers = [
         "担当者", "リード数", "CN率", "vs平均", "vs前月",
@@ -887,10 +1828,9 @@ def compute_step2_user_summary(q4_cur, q4_prev):
         "-",
     ])
 
-    rep_order = IS_REPS + ["外注（合算）"]
-    for rep in rep_order:
-        cm = compute_funnel(cur_groups.get(rep, []))
-        pm = compute_funnel(prev_groups.get(rep, []))
+    for rep in REP_ORDER:
+        cm = cube_cur.funnel(("rep", rep))
+        pm = cube_prev.funnel(("rep", rep))
 
         cn_va = pp_diff(cm["cn_rate"], overall_cur["cn_rate"])
         sal_va = pp_diff(cm["sal_rate"], overall_cur["sal_rate"])
@@ -928,30 +1868,20 @@ def compute_step2_user_summary(q4_cur, q4_prev):
     return md_table(headers, rows_out)
 
 
-def compute_step2_user_channel(q4_cur):
-    cur_reps = filter_analysis_reps(q4_cur)
-
-    ch_groups = group_by(cur_reps, lambda r: r.get("inflow_route_media", ""))
-    ch_avgs = {ch: compute_funnel(rows) for ch, rows in ch_groups.items()}
-
+def compute_step2_user_channel(cube_cur):
     headers = [
         "担当者", "チャネル", "リード数", "CN率", "差分",
         "SAL率", "差分", "要注意",
     ]
     rows_out = []
 
-    rep_order = IS_REPS + ["外注（合算）"]
-    for rep in rep_order:
-        rep_rows = [r for r in cur_reps if r["_rep"] == rep]
-        rep_ch = group_by(rep_rows, lambda r: r.get("inflow_route_media", ""))
-
+    for rep in REP_ORDER:
         for ch in CHANNELS:
-            ch_rows = rep_ch.get(ch, [])
-            if not ch_rows:
+            if not cube_cur.has(("rep_ch", rep, ch)):
                 continue
 
-            m = compute_funnel(ch_rows)
-            avg = ch_avgs.get(ch, {})
+            m = cube_cur.funnel(("rep_ch", rep, ch))
+            avg = cube_cur.funnel(("reps_ch", ch))
 
             cn_d = pp_diff(m["cn_rate"], avg.get("cn_rate"))
             sal_d = pp_diff(m["sal_rate"], avg.get("sal_rate"))
@@ -974,42 +1904,29 @@ def compute_step2_user_channel(q4_cur):
     return md_table(headers, rows_out)
 
 
-def compute_step2_user_impact(q4_cur):
-    cur_reps = filter_analysis_reps(q4_cur)
-
-    # Channel SAL/leads rate (overall, from analysis reps)
-    ch_groups = group_by(cur_reps, lambda r: r.get("inflow_route_media", ""))
-    ch_sal_rates = {}
-    for ch, rows in ch_groups.items():
-        m = compute_funnel(rows)
-        ch_sal_rates[ch] = safe_div(m["sals"], m["leads"])
-
+def compute_step2_user_impact(cube_cur):
     headers = [
         "チャネル", "担当者", "リード数", "実SAL", "期待SAL", "差分", "判定",
     ]
     rows_out = []
 
-    rep_order = IS_REPS + ["外注（合算）"]
     for ch in CHANNELS:
-        ch_reps_rows = [r for r in cur_reps if r.get("inflow_route_media") == ch]
-        if not ch_reps_rows:
+        if not cube_cur.has(("reps_ch", ch)):
             continue
 
-        ch_rate = ch_sal_rates.get(ch)
+        # Channel SAL/leads rate (overall, from analysis reps)
+        ch_m = cube_cur.funnel(("reps_ch", ch))
+        ch_rate = safe_div(ch_m["sals"], ch_m["leads"])
         if ch_rate is None:
             continue
 
-        rep_groups = group_by(ch_reps_rows, lambda r: r["_rep"])
-
-        for rep in rep_order:
-            rep_rows = rep_groups.get(rep, [])
-            if not rep_rows:
+        for rep in REP_ORDER:
+            if not cube_cur.has(("rep_ch", rep, ch)):
                 continue
 
-            leads = count_distinct(rep_rows)
-            sals = count_distinct_where(
-                rep_rows, lambda r: str(r.get("is_sal", "0")) == "1"
-            )
+            m = cube_cur.funnel(("rep_ch", rep, ch))
+            leads = m["leads"]
+            sals = m["sals"]
             expected = leads * ch_rate
             diff = sals - expected
 
@@ -1032,33 +1949,16 @@ def compute_step2_user_impact(q4_cur):
     return md_table(headers, rows_out)
 
 
-def compute_step2_user_weekly(q4_cur):
-    cur_reps = filter_analysis_reps(q4_cur)
+def compute_step2_user_weekly(cube_cur):
     alerts = []
 
-    rep_order = IS_REPS + ["外注（合算）"]
-    for rep in rep_order:
-        rep_rows = [r for r in cur_reps if r["_rep"] == rep]
-
-        weekly = defaultdict(list)
-        for row in rep_rows:
-            d = parse_date(row.get("created_date_jst", ""))
-            if d:
-                weekly[iso_week_key(d)].append(row)
-
+    for rep in REP_ORDER:
         prev_cn = None
         prev_sal = None
 
-        for wk in sorted(weekly.keys()):
-            rows = weekly[wk]
-            m = compute_funnel(rows)
-
-            dates = [
-                parse_date(r.get("created_date_jst", ""))
-                for r in rows
-                if parse_date(r.get("created_date_jst", ""))
-            ]
-            label = iso_week_label(min(dates)) if dates else f"W{wk[1]:02d}"
+        for wk in sorted(cube_cur.children("rep_wk", rep)):
+            m = cube_cur.funnel(("rep_wk", rep, wk))
+            label = cube_cur.week_label(("rep_wk", rep, wk))
 
             if prev_cn is not None and m["cn_rate"] is not None:
                 cn_d = (m["cn_rate"] - prev_cn) * 100
@@ -1098,7 +1998,9 @@ def compute_step2_user_weekly(q4_cur):
 # データ検証
 # ================================================================
 
-def validate_data(data_dir, date_str, q1, q2, q3, q4, q5, q6):
+def validate_data(data_dir, date_str, q1, q2, q3, q4, q5, q6, cache=None,
+                  use_archive=True, skipped=()):
+    """q1-q6 は CsvSnapshot（ファイルなしは None）。skipped は読み込まなかったクエリ。"""
     lines = ["# データ検証レポート\n"]
     warnings = []
     errors = []
@@ -1110,24 +2012,26 @@ def validate_data(data_dir, date_str, q1, q2, q3, q4, q5, q6):
     ]
     lines.append("| クエリ | 行数 | ステータス |")
     lines.append("|--------|------|----------|")
-    for name, rows in files_info:
-        if rows is not None:
-            lines.append(f"| {name} | {len(rows):,} | OK |")
+    for name, snap in files_info:
+        if name[:2].lower() in skipped:
+            lines.append(f"| {name} | - | 未読み込み（--tables） |")
+        elif snap is not None:
+            lines.append(f"| {name} | {snap.total:,} | OK |")
         else:
             lines.append(f"| {name} | - | ファイルなし |")
             if "Q4" in name or "Q1" in name or "Q2" in name or "Q3" in name:
                 errors.append(f"{name}: ファイルが見つかりません")
 
     # Column checks
-    if q4:
-        missing = [c for c in Q4_REQUIRED if c not in q4[0]]
+    if q4 and q4.total:
+        missing = [c for c in Q4_REQUIRED if c not in q4.header]
         if missing:
             errors.append(f"Q4 必須カラム不足: {missing}")
         else:
             lines.append("\n- Q4 必須カラム: 全て存在 ✓")
 
-    if q5:
-        missing = [c for c in Q5_REQUIRED if c not in q5[0]]
+    if q5 and q5.total:
+        missing = [c for c in Q5_REQUIRED if c not in q5.header]
         if missing:
             errors.append(f"Q5 必須カラム不足: {missing}")
         else:
@@ -1138,15 +2042,46 @@ def validate_data(data_dir, date_str, q1, q2, q3, q4, q5, q6):
         datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=1)
     ).strftime("%Y-%m-%d")
     prev_q4_path = find_csv(data_dir, "q4", prev_date)
-    if prev_q4_path and q4:
-        prev_q4 = load_csv_file(prev_q4_path)
-        if prev_q4:
-            ratio = len(q4) / len(prev_q4)
-            if ratio < 0.8 or ratio > 1.2:
-                warnings.append(
-                    f"Q4 行数変動: 前日{len(prev_q4):,}行 → "
-                    f"当日{len(q4):,}行 ({ratio:.1%})"
-                )
+    manifest = DataManifest.load(data_dir)
+    prev_total = manifest.rows("q4", prev_date, prev_q4_path) if manifest else None
+    if prev_total is None and q4 and q4.total:
+        # 行数だけならアーカイブ・ストアのメタデータで足りる（前日CSVを開かない）
+        prev_arch = (
+            find_archive(data_dir, "q4", prev_date, prev_q4_path) if use_archive else None
+        )
+        prev_info = stored_day_info(data_dir, "q4", prev_date, prev_q4_path)
+        if prev_arch is not None:
+            prev_total = prev_arch.total
+        elif prev_info is not None:
+            prev_total = prev_info["rows"]
+        elif prev_q4_path:
+            prev_total = count_csv_rows(prev_q4_path, Q4_REQUIRED, cache)
+    if prev_total and q4 and q4.total:
+        ratio = q4.total / prev_total
+        if ratio < 0.8 or ratio > 1.2:
+            warnings.append(
+                f"Q4 行数変動: 前日{prev_total:,}行 → "
+                f"当日{q4.total:,}行 ({ratio:.1%})"
+            )
+
+    cur_info = stored_day_info(data_dir, "q4", date_str, find_csv(data_dir, "q4", date_str))
+    if (cur_info is not None and cur_info["prev_date"]
+            and cur_info["rows"] == (q4.total if q4 else None)):
+        if not cur_info["keyed"] or cur_info["header_changed"]:
+            # キーなし・ヘッダ変更の日は行の入れ替わりになり、リード単位の変更件数にならない
+            lines.append(
+                f"- Q4 {cur_info['prev_date']} からの変更: ヘッダ変更またはリードIDなしのため比較なし"
+            )
+        else:
+            line = (
+                f"- Q4 {cur_info['prev_date']} からの変更: 追加 {cur_info['added']:,} / 変更 {cur_info['changed']:,}"
+                f" / 削除 {cur_info['removed']:,} 件（リードID単位）"
+            )
+            fmt_cols = cur_info.get("format_columns")
+            if fmt_cols:
+                line += "。形式のみの変更（除外）: " + ", ".join(
+                    f"{c} {n:,}件" for c, n in fmt_cols.items())
+            lines.append(line)
 
     if errors:
         lines.append("\n## エラー\n")
@@ -1163,152 +2098,641 @@ def validate_data(data_dir, date_str, q1, q2, q3, q4, q5, q6):
 
 
 # ================================================================
-# メイン
+# タスクグラフ（独立したテーブル計算・書き込みの並行実行）
 # ================================================================
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="デモ電話チーム 月次分析テーブル確定計算"
-    )
-    parser.add_argument("--date", required=True, help="データ日付 (YYYY-MM-DD)")
-    parser.add_argument("--data-dir", default="data", help="データディレクトリ")
-    parser.add_argument("--output-dir", default="data/computed", help="出力ディレクトリ")
-    args = parser.parse_args()
+# (出力ファイル名, 計算ノード, ノード結果から本文を取り出す関数)
+TABLE_OUTPUTS = [
+    ("step1_着電着予.md", "landing_call", lambda r: r[0]),
+    ("step1_SAL着予.md", "landing_sal", lambda r: r[0]),
+    ("step1_商談実施着予.md", "landing_meeting", lambda r: r[0]),
+    ("step1_課題チャネル.md", "issues", lambda r: r[0]),
+    ("step2_ファネル転換率.md", "funnel", lambda r: r[0]),
+    ("step2_CVコンテンツ.md", "cv", lambda r: r[0]),
+    ("step2_SALスピード.md", "sal_speed", lambda r: r),
+    ("step2_時系列.md", "timeseries", lambda r: r),
+    ("step2_担当者サマリ.md", "user_summary", lambda r: r),
+    ("step2_担当者チャネル.md", "user_channel", lambda r: r),
+    ("step2_インパクト試算.md", "user_impact", lambda r: r),
+    ("step2_週次急落.md", "user_weekly", lambda r: r),
+]
+
+# _results.json の元になるノード（write_results の引数順）
+RESULTS_NODES = ["landing_call", "landing_sal", "landing_meeting", "issues", "funnel", "cv"]
+
+# 計算ノード: (依存ノード, prepare_date に求める任意入力, 計算関数, 計測上の処理行数)
+# 任意入力: q5 / q6（読み込み）、prev_landing（前月 Q1-Q3）。Q1-Q4・キューブは常に用意する。
+# 計算関数は DateInputs と依存ノードの結果（依存の順）を受け取る。
+TABLE_NODES = {
+    "landing_call": ((), ("prev_landing",), lambda inp: compute_step1_landing(
+        inp.snapshots["q1"].rows, inp.prev_landing["q1"], "着電", inp.fallbacks["q1"]),
+        lambda inp: len(inp.snapshots["q1"].rows)),
+    "landing_sal": ((), ("prev_landing",), lambda inp: compute_step1_landing(
+        inp.snapshots["q2"].rows, inp.prev_landing["q2"], "SAL", inp.fallbacks["q2"]),
+        lambda inp: len(inp.snapshots["q2"].rows)),
+    "landing_meeting": ((), ("prev_landing", "q6"), lambda inp: compute_step1_landing(
+        inp.snapshots["q3"].rows, inp.prev_landing["q3"], "商談実施", inp.fallbacks["q3"]),
+        lambda inp: len(inp.snapshots["q3"].rows)),
+    "issues": (("landing_call", "landing_sal", "landing_meeting"), (),
+               lambda inp, r1, r2, r3: compute_step1_issues(r1[1], r2[1], r3[1]), None),
+    # キューブ系テーブルの処理行数は当月+前月（当月のみのテーブルは当月）の eligible 行数
+    "funnel": ((), (), lambda inp: compute_step2_funnel(inp.cube_cur, inp.cube_prev),
+               lambda inp: inp.cube_rows()),
+    "cv": (("funnel",), (),
+           lambda inp, funnel: compute_step2_cv(inp.cube_cur, inp.cube_prev, funnel[1]),
+           lambda inp: inp.cube_rows()),
+    "sal_speed": ((), ("q5",), lambda inp: compute_step2_sal_speed(inp.q5_cur, inp.q5_prev),
+                  lambda inp: len(inp.q5_cur) + len(inp.q5_prev)),
+    "timeseries": ((), (), lambda inp: compute_step2_timeseries(inp.cube_cur),
+                   lambda inp: inp.cube_rows(previous=False)),
+    "user_summary": ((), (), lambda inp: compute_step2_user_summary(inp.cube_cur, inp.cube_prev),
+                     lambda inp: inp.cube_rows()),
+    "user_channel": ((), (), lambda inp: compute_step2_user_channel(inp.cube_cur),
+                     lambda inp: inp.cube_rows(previous=False)),
+    "user_impact": ((), (), lambda inp: compute_step2_user_impact(inp.cube_cur),
+                    lambda inp: inp.cube_rows(previous=False)),
+    "user_weekly": ((), (), lambda inp: compute_step2_user_weekly(inp.cube_cur),
+                    lambda inp: inp.cube_rows(previous=False)),
+}
+
+# --tables でまとめて指定できる名前
+TABLE_GROUPS = {
+    # publish_report.py が読むファイル
+    "publish": [f for f, node, _ in TABLE_OUTPUTS if node in RESULTS_NODES] + [RESULTS_FILENAME],
+}
+
+
+def resolve_tables(names):
+    """--tables の指定 → 書き出すファイル名の集合（None は全ファイル）。
+
+    名前は出力ファイル名（.md は省略可）、ノード名、TABLE_GROUPS のグループ名。
+    _results.json の元になるテーブルを選んだ場合は _results.json も書き直す
+    （publish_report.py が古い値を読まないように）。
+    """
+    if not names:
+        return None
+    by_name = {}
+    for filename, node, _ in TABLE_OUTPUTS:
+        by_name[filename] = by_name[filename[:-3]] = by_name[node] = [filename]
+    by_name[RESULTS_FILENAME] = [RESULTS_FILENAME]
+    by_name.update(TABLE_GROUPS)
+    files = set()
+    for name in names:
+        if name not in by_name:
+            choices = [node for _, node, _ in TABLE_OUTPUTS] + [RESULTS_FILENAME, *TABLE_GROUPS]
+            raise ValueError(f"不明なテーブル: {name}（ファイル名または {', '.join(choices)}）")
+        files.update(by_name[name])
+    nodes = {node for filename, node, _ in TABLE_OUTPUTS if filename in files}
+    if nodes & set(RESULTS_NODES):
+        files.add(RESULTS_FILENAME)
+    return files
+
+
+def table_inputs(files):
+    """files（None は全ファイル）の計算に必要なノードと、prepare_date の任意入力。"""
+    targets = [node for filename, node, _ in TABLE_OUTPUTS if files is None or filename in files]
+    if files is None or RESULTS_FILENAME in files:
+        targets += RESULTS_NODES
+    nodes = set()
+    while targets:
+        node = targets.pop()
+        if node not in nodes:
+            nodes.add(node)
+            targets.extend(TABLE_NODES[node][0])
+    inputs = {i for node in nodes for i in TABLE_NODES[node][1]}
+    return nodes, inputs
+
+
+class TaskGraph:
+    """依存関係付きタスクを、依存が揃ったものから順にスレッドプールで実行する。
+
+    各タスクは依存タスクの結果を deps の順で位置引数として受け取る。
+    perf を渡すと各タスクを1ステージとして計測する（rows は処理行数）。
+    """
+
+    def __init__(self, perf=None):
+        self.tasks = {}
+        self.perf = perf
+
+    def add(self, name, func, deps=(), rows=None):
+        if self.perf is not None:
+            func = self.perf.timed(name, rows)(func)
+        self.tasks[name] = (func, tuple(deps))
+
+    def required(self, targets):
+        """targets とその推移的な依存タスクの名前の集合。"""
+        need = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in need:
+                continue
+            if name not in self.tasks:
+                raise ValueError(f"未定義のタスク: {name}")
+            need.add(name)
+            stack.extend(self.tasks[name][1])
+        return need
+
+    def run(self, max_workers=4, targets=None):
+        """全タスク（targets を渡した場合は targets とその依存タスクだけ）を実行する。"""
+        results = {}
+        if targets is None:
+            pending = dict(self.tasks)
+        else:
+            need = self.required(targets)
+            pending = {name: t for name, t in self.tasks.items() if name in need}
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                ready = [
+                    name for name, (_, deps) in pending.items()
+                    if all(d in results for d in deps)
+                ]
+                if not ready and not running:
+                    raise ValueError(f"解決できない依存関係: {sorted(pending)}")
+                for name in ready:
+                    func, deps = pending.pop(name)
+                    fut = pool.submit(func, *[results[d] for d in deps])
+                    running[fut] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[running.pop(fut)] = fut.result()
+        return results
 
+
+# ================================================================
+# メイン
+# ================================================================
+
+class DateInputs:
+    """1日付分のテーブル計算の入力（prepare_date の結果）。"""
+
+    def __init__(self, date_str, current_month, previous_month, period, snapshots,
+                 q4_cols, cubes, prev_landing, fallbacks, q5_cur, q5_prev, validation):
+        self.date_str = date_str
+        self.current_month = current_month
+        self.previous_month = previous_month
+        self.period = period
+        self.snapshots = snapshots          # qid → CsvSnapshot（ファイルなしは None）
+        self.q4_cols = q4_cols
+        self.cubes = cubes                  # 月 → FunnelCube
+        self.prev_landing = prev_landing    # 前月 Q1-Q3（load_prev_month_landing、未読み込みは None）
+        self.fallbacks = fallbacks          # 前月 Q1-Q3 がない場合の Q4/Q6 からの代替値
+        self.q5_cur = q5_cur
+        self.q5_prev = q5_prev
+        self.validation = validation        # 検証レポート（_validation.md の内容）
+
+    @property
+    def cube_cur(self):
+        return self.cubes[self.current_month]
+
+    @property
+    def cube_prev(self):
+        return self.cubes[self.previous_month]
+
+    def cube_rows(self, previous=True):
+        """当月（previous なら +前月）の eligible 行数（計測上の処理行数）。"""
+        counts = self.q4_cols.row_counts
+        return counts[self.current_month] + (counts[self.previous_month] if previous else 0)
+
+    def frontmatter(self):
+        return frontmatter(self.date_str, self.current_month, self.previous_month,
+                           *self.period)
+
+    def meta(self):
+        return {
+            "data_date": self.date_str, "current_month": self.current_month,
+            "previous_month": self.previous_month,
+            "period_start": self.period[0], "period_end": self.period[1],
+        }
+
+
+def prepare_date(args, date_str, output_dir, perf, prev_landing=None, inputs=None):
+    """CSV の読み込み・検証・Q4 キューブの構築まで（テーブル計算の入力を揃える）。
+
+    検証レポートは output_dir に書き出す（output_dir が None の常駐モードでは書き出さず、
+    DateInputs.validation に保持する）。検証エラー・当月データなしは None。
+    prev_landing は load_prev_month_landing の結果（バックフィル時に共有）。
+    inputs は用意する任意入力（TABLE_NODES の q5 / q6 / prev_landing、None は全て）。
+    """
     data_dir = Path(args.data_dir)
-    output_dir = Path(args.output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    date_str = args.date
+    cache = None if args.no_cache else CsvCache(data_dir / ".cache")
+    skipped = [] if inputs is None else [q for q in ("q5", "q6") if q not in inputs]
 
     # ---- Load CSVs ----
     print(f"[1/7] CSVファイル読み込み中... (date={date_str})")
 
+    # Q4 を先に読んで当月/前月を確定し、Q5/Q6 は対象月の行だけを保持する
+    # 列指向アーカイブがあれば CSV の代わりに必要なパーティション・カラムだけを読む
+    paths = {
+        qid: find_csv(data_dir, qid, date_str) for qid in CSV_PREFIXES if qid not in skipped
+    }
+    archives = {
+        qid: None if args.no_archive else find_archive(data_dir, qid, date_str, path)
+        for qid, path in paths.items()
+    }
+    current_month = None
+    months = set()
+
     q1 = q2 = q3 = q4 = q5 = q6 = None
-    for qid in ["q1", "q2", "q3", "q4", "q5", "q6"]:
-        path = find_csv(data_dir, qid, date_str)
-        if path:
-            data = load_csv_file(path)
-            print(f"   {qid}: {path.name} ({len(data):,}行)")
-            if qid == "q1": q1 = data
-            elif qid == "q2": q2 = data
-            elif qid == "q3": q3 = data
-            elif qid == "q4": q4 = data
-            elif qid == "q5": q5 = data
-            elif qid == "q6": q6 = data
-        else:
+    for qid in ["q4", "q1", "q2", "q3", "q5", "q6"]:
+        if qid in skipped:
+            continue
+        path = paths[qid]
+        arch = archives[qid]
+        if not path and not arch:
+            continue
+        with perf.stage(f"load:{qid}") as st:
+            if qid == "q4" and arch is not None:
+                q4, current_month = load_q4_window_archive(arch)
+                if current_month:
+                    months = {current_month, prev_month_str(current_month)}
+                snap = q4
+            elif qid == "q5" and arch is not None:
+                q5 = snap = load_archive_projected(arch, Q5_REQUIRED, sorted(months))
+            elif qid == "q6" and arch is not None:
+                prev_ym = prev_month_str(current_month) if current_month else None
+                q6 = snap = load_archive_projected(
+                    arch, Q6_REQUIRED, [prev_ym] if prev_ym else []
+                )
+            elif arch is not None:
+                snap = load_archive_snapshot(arch)
+                if qid == "q1": q1 = snap
+                elif qid == "q2": q2 = snap
+                else: q3 = snap
+            elif qid == "q4":
+                q4, current_month = load_q4_window(path, cache)
+                if current_month:
+                    months = {current_month, prev_month_str(current_month)}
+                snap = q4
+            elif qid == "q5":
+                q5 = snap = load_csv_projected(
+                    path, Q5_REQUIRED,
+                    keep=lambda r: r.created_date_jst[:7] in months, cache=cache,
+                )
+            elif qid == "q6":
+                prev_ym = prev_month_str(current_month) if current_month else None
+                q6 = snap = load_csv_projected(
+                    path, Q6_REQUIRED,
+                    keep=lambda r: r.first_meeting_date[:7] == prev_ym, cache=cache,
+                )
+            elif qid == "q1": q1 = snap = load_csv_snapshot(path)
+            elif qid == "q2": q2 = snap = load_csv_snapshot(path)
+            elif qid == "q3": q3 = snap = load_csv_snapshot(path)
+            st["rows"] = snap.total
+
+    loaded = {"q1": q1, "q2": q2, "q3": q3, "q4": q4, "q5": q5, "q6": q6}
+    for qid, snap in loaded.items():
+        if qid in skipped:
+            print(f"   {qid}: 読み込みなし（--tables の対象テーブルで不要）")
+        elif snap is None:
             print(f"   {qid}: ファイルなし")
+        elif len(snap.rows) != snap.total:
+            print(f"   {qid}: {snap.path.name} ({snap.total:,}行, 保持 {len(snap.rows):,}行)")
+        else:
+            print(f"   {qid}: {snap.path.name} ({snap.total:,}行)")
 
     # ---- Validate ----
     print("[2/7] データ検証中...")
-    validation_report, has_errors = validate_data(
-        data_dir, date_str, q1, q2, q3, q4, q5, q6
-    )
-    write_file(output_dir / "_validation.md", validation_report)
+    with perf.stage("validate"):
+        validation_report, has_errors = validate_data(
+            data_dir, date_str, q1, q2, q3, q4, q5, q6, cache,
+            use_archive=not args.no_archive, skipped=skipped,
+        )
+        if output_dir is not None:
+            write_file(output_dir / "_validation.md", validation_report)
 
     if has_errors:
-        print(
-            f"❌ データ検証エラー。{output_dir}/_validation.md を確認してください。"
-        )
-        sys.exit(1)
+        if output_dir is None:
+            print("❌ データ検証エラー:")
+            for line in validation_report.splitlines():
+                if line.startswith("- ❌"):
+                    print(f"   {line[2:]}")
+        else:
+            print(
+                f"❌ データ検証エラー。{output_dir}/_validation.md を確認してください。"
+            )
+        return None
 
     # ---- Detect months ----
-    current_month = detect_current_month_q4(q4) if q4 else None
     if not current_month:
         print("❌ 当月データが見つかりません")
-        sys.exit(1)
+        return None
 
     previous_month = prev_month_str(current_month)
     print(f"   当月: {current_month}, 前月: {previous_month}")
 
-    # ---- Filter Q4 ----
-    q4_cur = filter_q4(q4, current_month) if q4 else []
-    q4_prev = filter_q4(q4, previous_month) if q4 else []
-    print(f"   Q4 eligible: 当月={len(q4_cur):,}行, 前月={len(q4_prev):,}行")
+    # ---- Filter Q4 + build cubes (前日状態があれば差分更新) ----
+    months = [current_month, previous_month]
+    state = None
+    # 差分更新は --incremental 指定時のみ。前日の集計状態は data/.cache/ のローカル
+    # ファイル（CI には残らない）なので、既定では毎回全件から構築する。
+    # array / numpy バックエンドは件数しか持たないため差分更新の状態を使わない
+    incremental = args.incremental and cache is not None and args.backend == "sets"
+    if args.incremental and not incremental:
+        print("   --incremental は --backend sets かつキャッシュ使用時のみ有効です（全件再計算）")
+    if incremental:
+        with perf.stage("load_cube_state"):
+            state = load_prev_cube_state(cache.cache_dir, date_str, months)
+
+    cube_stage = "cubes:incremental" if state is not None else f"cubes:{args.backend}"
+    with perf.stage(cube_stage, rows=len(q4.rows)):
+        if state is not None:
+            q4_cols = Q4Columns.from_rows(q4.rows, months, state["lead_codes"])
+            cubes, lead_rows, delta = update_funnel_cubes(state, q4_cols)
+            print(
+                f"   Q4 差分更新 ({state['source']} 基準): 新規={delta['added']:,}, "
+                f"変更={delta['changed']:,}, 削除={delta['removed']:,} lead"
+            )
+            if args.check_incremental:
+                full = build_funnel_cubes(
+                    Q4Columns.from_rows(q4.rows, months, dict(q4_cols.lead_codes))
+                )
+                diffs = cube_mismatches(cubes, full)
+                if diffs:
+                    print(f"   ⚠️ 差分更新と全件再計算が不一致 ({len(diffs)}件)。全件再計算の結果を使用します")
+                    for month, key in diffs[:10]:
+                        print(f"      {month} {key}")
+                    cubes = full
+                else:
+                    print("   差分更新 整合性チェック: 全件再計算と一致 ✓")
+        elif args.backend != "sets":
+            q4_cols = Q4Columns.from_rows(q4.rows, months)
+            cubes = build_count_cubes(q4_cols, use_numpy=args.backend == "numpy")
+        else:
+            q4_cols = Q4Columns.from_rows(q4.rows, months)
+            cubes = build_funnel_cubes(q4_cols)
+            lead_rows = lead_facts(q4_cols)[0] if incremental else None
+
+    if incremental:
+        with perf.stage("save_cube_state"):
+            save_cube_state(cache.cache_dir, date_str, months,
+                            q4_cols.lead_codes, lead_rows, cubes)
+
+    cube_cur = cubes[current_month]
+    cube_prev = cubes[previous_month]
+    print(
+        f"   Q4 eligible: 当月={q4_cols.row_counts[current_month]:,}行, "
+        f"前月={q4_cols.row_counts[previous_month]:,}行"
+    )
 
     # ---- Detect period ----
-    cur_dates = sorted(set(
-        r.get("created_date_jst", "")[:10]
-        for r in q4_cur if r.get("created_date_jst")
-    ))
-    period_start = cur_dates[0] if cur_dates else ""
-    period_end = cur_dates[-1] if cur_dates else ""
+    period_start, period_end = q4_cols.periods.get(current_month, ["", ""])
     if period_start:
         print(f"   参照期間: {period_start} 〜 {period_end}")
 
-    fm = frontmatter(date_str, current_month, previous_month,
-                     period_start, period_end)
-
     # Previous month Q1-Q3 CSVs
-    prev_q1_path = find_prev_month_csv(data_dir, "q1", date_str)
-    prev_q2_path = find_prev_month_csv(data_dir, "q2", date_str)
-    prev_q3_path = find_prev_month_csv(data_dir, "q3", date_str)
-    prev_q1 = load_csv_file(prev_q1_path) if prev_q1_path else None
-    prev_q2 = load_csv_file(prev_q2_path) if prev_q2_path else None
-    prev_q3 = load_csv_file(prev_q3_path) if prev_q3_path else None
+    if prev_landing is None and (inputs is None or "prev_landing" in inputs):
+        with perf.stage("load:prev_month_landing"):
+            prev_landing = load_prev_month_landing(data_dir, date_str)
 
     # Fallback: Q4/Q6から前月実績を構築（前月CSVがない場合）
     fallback_q1 = fallback_q2 = fallback_q3 = None
-    if not prev_q1 and q4_prev:
-        fallback_q1 = build_prev_actuals_from_q4(q4_prev)
-        print(f"   Q1前月フォールバック: Q4から着電数代替計算")
-    if not prev_q2 and q4_prev:
-        fallback_q2 = build_prev_sal_from_q4(q4_prev)
-        print(f"   Q2前月フォールバック: Q4からSAL数代替計算")
-    if not prev_q3 and q6:
-        fallback_q3 = build_prev_meetings_from_q6(q6, previous_month)
-        print(f"   Q3前月フォールバック: Q6から商談実施数代替計算")
-
-    # ---- STEP 1 ----
-    print("[3/7] STEP1 計算中...")
-    table_1_1, results_1 = compute_step1_landing(q1, prev_q1, "着電",
-                                                  fallback_q1)
-    table_1_2, results_2 = compute_step1_landing(q2, prev_q2, "SAL",
-                                                  fallback_q2)
-    table_1_3, results_3 = compute_step1_landing(q3, prev_q3, "商談実施",
-                                                  fallback_q3)
-    table_1_4 = compute_step1_issues(results_1, results_2, results_3)
-
-    write_file(output_dir / "step1_着電着予.md", fm + table_1_1)
-    write_file(output_dir / "step1_SAL着予.md", fm + table_1_2)
-    write_file(output_dir / "step1_商談実施着予.md", fm + table_1_3)
-    write_file(output_dir / "step1_課題チャネル.md", fm + table_1_4)
-
-    # ---- STEP 2 ----
-    print("[4/7] STEP2 ファネル・CV計算中...")
-    funnel_table, cur_ch, prev_ch = compute_step2_funnel(q4_cur, q4_prev)
-    cv_table = compute_step2_cv(q4_cur, q4_prev, cur_ch)
-
-    write_file(output_dir / "step2_ファネル転換率.md", fm + funnel_table)
-    write_file(output_dir / "step2_CVコンテンツ.md", fm + cv_table)
-
-    print("[5/7] STEP2 SALスピード・時系列計算中...")
-    q5_cur = filter_q5(q5, current_month) if q5 else []
-    q5_prev = filter_q5(q5, previous_month) if q5 else []
-    print(f"   Q5: 当月={len(q5_cur):,}行, 前月={len(q5_prev):,}行")
-
-    sal_speed_table = compute_step2_sal_speed(q5_cur, q5_prev)
-    timeseries_table = compute_step2_timeseries(q4_cur)
-
-    write_file(output_dir / "step2_SALスピード.md", fm + sal_speed_table)
-    write_file(output_dir / "step2_時系列.md", fm + timeseries_table)
-
-    print("[6/7] STEP2 担当者分析計算中...")
-    user_summary = compute_step2_user_summary(q4_cur, q4_prev)
-    user_channel = compute_step2_user_channel(q4_cur)
-    user_impact = compute_step2_user_impact(q4_cur)
-    user_weekly = compute_step2_user_weekly(q4_cur)
-
-    write_file(output_dir / "step2_担当者サマリ.md", fm + user_summary)
-    write_file(output_dir / "step2_担当者チャネル.md", fm + user_channel)
-    write_file(output_dir / "step2_インパクト試算.md", fm + user_impact)
-    write_file(output_dir / "step2_週次急落.md", fm + user_weekly)
+    if prev_landing is not None:
+        if not prev_landing["q1"] and cube_prev.has(("all",)):
+            fallback_q1 = build_prev_actuals_from_q4(cube_prev)
+            print(f"   Q1前月フォールバック: Q4から着電数代替計算")
+        if not prev_landing["q2"] and cube_prev.has(("all",)):
+            fallback_q2 = build_prev_sal_from_q4(cube_prev)
+            print(f"   Q2前月フォールバック: Q4からSAL数代替計算")
+        if not prev_landing["q3"] and q6 and q6.total:
+            fallback_q3 = build_prev_meetings_from_q6(q6.rows, previous_month)
+            print(f"   Q3前月フォールバック: Q6から商談実施数代替計算")
+
+    q5_cur = q5_prev = []
+    if "q5" not in skipped:
+        with perf.stage("filter:q5", rows=len(q5.rows) if q5 else 0):
+            q5_cur = filter_q5(q5.rows, current_month) if q5 else []
+            q5_prev = filter_q5(q5.rows, previous_month) if q5 else []
+        print(f"   Q5: 当月={len(q5_cur):,}行, 前月={len(q5_prev):,}行")
+
+    return DateInputs(
+        date_str, current_month, previous_month, (period_start, period_end), loaded,
+        q4_cols, cubes, prev_landing,
+        {"q1": fallback_q1, "q2": fallback_q2, "q3": fallback_q3}, q5_cur, q5_prev,
+        validation_report,
+    )
+
+
+def add_table_tasks(graph, inp):
+    """STEP1・STEP2 の各テーブルの計算タスク（TABLE_NODES）を graph に追加する。
+
+    入力が揃った後の各テーブルは互いに独立なので、タスクグラフで並行に計算する。
+    """
+    for node, (deps, _, compute, rows) in TABLE_NODES.items():
+        graph.add(node, lambda *results, compute=compute: compute(inp, *results),
+                  deps=deps, rows=rows(inp) if rows else None)
+
+
+def add_write_tasks(graph, inp, output_dir):
+    """計算済みのテーブルから順に output_dir へ書き出すタスクを追加する。
+
+    タスク名は "write:{ファイル名}"。
+    """
+    fm = inp.frontmatter()
+    for filename, node, pick in TABLE_OUTPUTS:
+        graph.add(
+            f"write:{filename}",
+            lambda result, filename=filename, pick=pick: write_file(
+                output_dir / filename, fm + pick(result)),
+            deps=[node],
+        )
+    meta = inp.meta()
+    graph.add(
+        f"write:{RESULTS_FILENAME}",
+        lambda r1, r2, r3, issues, funnel, cv: write_results(
+            output_dir / RESULTS_FILENAME, meta,
+            {"着電": r1[1], "SAL": r2[1], "商談": r3[1]},
+            issues[1], funnel[3], cv[1],
+        ),
+        deps=RESULTS_NODES,
+    )
+
+
+def run_date(args, date_str, output_dir, prev_landing=None):
+    """1日付分のテーブル（--tables の指定があればその分だけ）を計算して output_dir に書き出す。
+
+    失敗時は False。prev_landing は load_prev_month_landing の結果（バックフィル時に共有）。
+    """
+    files = resolve_tables(args.tables)
+    nodes, inputs = table_inputs(files)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    perf = PerfRecorder("compute_tables")
+    inp = prepare_date(args, date_str, output_dir, perf, prev_landing,
+                       inputs=None if files is None else inputs)
+    if inp is None:
+        perf.save(output_dir)
+        return False
+
+    # ---- STEP 1 / STEP 2 ----
+    if files is None:
+        print(f"[3-6/7] STEP1・STEP2 テーブル並行計算中... (workers={args.workers})")
+    else:
+        print(f"[3-6/7] 指定テーブル計算中: {', '.join(sorted(files))} "
+              f"(計算ノード {len(nodes)}/{len(TABLE_NODES)}, workers={args.workers})")
+    graph = TaskGraph(perf=perf)
+    add_table_tasks(graph, inp)
+    add_write_tasks(graph, inp, output_dir)
+    # 書き出すファイルのタスクと、その推移的な依存タスクだけを実行する
+    targets = [f for f, _, _ in TABLE_OUTPUTS] + [RESULTS_FILENAME]
+    if files is not None:
+        targets = [f for f in targets if f in files]
+    results = graph.run(max_workers=args.workers, targets=[f"write:{f}" for f in targets])
+    written = [path for name, path in results.items() if name.startswith("write:")]
+    print(f"   テーブル書き出し完了 ({len(written)}ファイル)")
 
     # ---- Summary ----
     print("[7/7] 完了!")
     print(f"   出力先: {output_dir}/")
-    print(f"   ファイル数: 13")
-    total_leads = count_distinct(q4_cur)
-    print(f"   当月eligible リード数: {total_leads:,} ({current_month})")
+    # 書き出したテーブル + prepare_date が書き出した検証レポート（_perf.json は別）
+    written.append(output_dir / "_validation.md")
+    print(f"   ファイル数: {len(written)}")
+    if files is not None:
+        print(f"   {', '.join(sorted(p.name for p in written))}")
+    total_leads = inp.cube_cur.funnel(("all",))["leads"]
+    print(f"   当月eligible リード数: {total_leads:,} ({inp.current_month})")
+    perf_path = perf.save(output_dir)
+    print(f"   {perf.summary()} → {perf_path.name}")
+    return True
+
+
+# ================================================================
+# バックフィル（複数日付をプロセス並列で再計算）
+# ================================================================
+
+_PREV_LANDING = {}
+
+
+def backfill_dates(data_dir, date_from, date_to):
+    """期間内で Q4（CSV、または CSV を削除した日付の列指向アーカイブ）がある日付を列挙する。"""
+    d = datetime.strptime(date_from, "%Y-%m-%d").date()
+    end = datetime.strptime(date_to, "%Y-%m-%d").date()
+    dates = []
+    while d <= end:
+        ds = d.isoformat()
+        if find_csv(data_dir, "q4", ds) or find_archive(data_dir, "q4", ds):
+            dates.append(ds)
+        d += timedelta(days=1)
+    return dates
+
+
+def _init_backfill_worker(prev_landing):
+    global _PREV_LANDING
+    _PREV_LANDING = prev_landing
+
+
+def _backfill_one(args, date_str, output_dir):
+    start = time.perf_counter()
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        ok = run_date(args, date_str, output_dir,
+                      prev_landing=_PREV_LANDING.get(date_str[:7]))
+    return date_str, ok, buf.getvalue(), time.perf_counter() - start
+
+
+def run_backfill(args):
+    """--from/--to の各日付を data/computed/YYYY-MM-DD/ に並列出力する。
+
+    前月 Q1-Q3 CSV は月ごとに1回だけ読み、ワーカー起動時に共有する。
+    指標定義の変更後に使う想定のため、前日の集計状態は使わず全件再計算する。
+    """
+    data_dir = Path(args.data_dir)
+    dates = backfill_dates(data_dir, args.date_from, args.date_to)
+    if not dates:
+        print(f"❌ {args.date_from} 〜 {args.date_to} に対象データがありません")
+        return False
+
+    prev_landing = {}
+    for ds in dates:
+        if ds[:7] not in prev_landing:
+            prev_landing[ds[:7]] = load_prev_month_landing(data_dir, ds)
+
+    args.incremental = False
+    output_root = Path(args.output_dir)
+    jobs = min(args.jobs or os.cpu_count() or 1, len(dates))
+    print(f"バックフィル: {len(dates)}日付 ({dates[0]} 〜 {dates[-1]}), workers={jobs}")
+
+    start = time.perf_counter()
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_backfill_worker,
+                             initargs=(prev_landing,)) as pool:
+        futures = [
+            pool.submit(_backfill_one, args, ds, output_root / ds) for ds in dates
+        ]
+        for fut in futures:
+            ds, ok, log, elapsed = fut.result()
+            mark = "✅" if ok else "❌"
+            print(f"{mark} {ds} ({elapsed:.2f}s) → {output_root / ds}/")
+            if not ok:
+                failed.append(ds)
+                print(log)
+
+    print(f"完了: {len(dates) - len(failed)}/{len(dates)}日付, "
+          f"{time.perf_counter() - start:.2f}s")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="デモ電話チーム 月次分析テーブル確定計算"
+    )
+    parser.add_argument("--date", help="データ日付 (YYYY-MM-DD)")
+    parser.add_argument("--from", dest="date_from",
+                        help="バックフィル開始日 (YYYY-MM-DD、--to と併用)")
+    parser.add_argument("--to", dest="date_to",
+                        help="バックフィル終了日 (YYYY-MM-DD)")
+    parser.add_argument("--jobs", type=int, default=0,
+                        help="バックフィルの並列プロセス数（0 = CPU数）")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="テーブル計算・書き込みの並行スレッド数")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリ")
+    parser.add_argument("--output-dir", default="data/computed", help="出力ディレクトリ")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="解析済みCSVキャッシュ (data/.cache/) を使わない")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="列指向アーカイブ (.dca) があっても CSV を読む")
+    parser.add_argument("--incremental", action="store_true",
+                        help="前日の集計状態（data/.cache/state/）から Q4 キューブを差分更新する")
+    parser.add_argument("--check-incremental", action="store_true",
+                        help="差分更新の結果を全件再計算と突き合わせる（--incremental 時）")
+    parser.add_argument("--backend", choices=["sets", "array", "numpy"], default="sets",
+                        help="Q4 キューブの集計方式（sets: lead集合・差分更新対応, "
+                             "array: 列演算+bincount, numpy: array の NumPy 版）")
+    parser.add_argument("--tables", type=lambda v: [t for t in v.split(",") if t],
+                        help="計算するテーブル（カンマ区切り。ファイル名・ノード名・"
+                             f"{'/'.join(TABLE_GROUPS)}）。依存するテーブルと入力だけを計算する")
+    parser.add_argument("--serve", action="store_true",
+                        help="常駐して最新日付の集計状態を保持し、ローカルHTTPで問い合わせに答える"
+                             "（scripts/analysis_server.py）")
+    parser.add_argument("--port", type=int, default=8765, help="--serve の待ち受けポート (127.0.0.1)")
+    parser.add_argument("--socket", help="--serve を TCP の代わりに Unix ソケットで待ち受ける")
+    parser.add_argument("--poll", type=float, default=5.0,
+                        help="--serve で data/ の更新を確認する間隔（秒）")
+    args = parser.parse_args()
+    if args.backend == "numpy" and np is None:
+        parser.error("--backend numpy には numpy が必要です（array を使ってください）")
+
+    try:
+        resolve_tables(args.tables)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.serve:
+        if args.date_from or args.date_to:
+            parser.error("--serve は --from/--to と併用できません")
+        from analysis_server import serve
+        ok = serve(args)
+    elif args.date_from or args.date_to:
+        if not (args.date_from and args.date_to) or args.date:
+            parser.error("--from と --to は両方指定し、--date とは併用しないでください")
+        ok = run_backfill(args)
+    elif args.date:
+        ok = run_date(args, args.date, Path(args.output_dir))
+    else:
+        parser.error("--date または --from/--to を指定してください")
+
+    if not ok:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+"""
+mmap ベースの列指向CSVスキャナ（標準ライブラリのみ）
+
+ファイルをメモリマップして1回でデコードし、行・フィールドの分割を列単位で行う。
+  - 全行のカンマ数がヘッダと同じ区間は、区間全体を1回の split でフィールドの
+    平坦リストにし、列 j を [j::列数] のスライスで取り出す（行ごとのリストや
+    dict を作らず、Python レベルの行ループもない）
+  - エクスポートに実際に現れる引用（"..." と "" のエスケープ、中にカンマ・改行なし）は
+    引用符を含む行の該当フィールドだけ外す
+  - カンマ数が合わない行・引用フィールド内にカンマや改行がある行は、その行
+    （複数行にまたがるレコード）だけ csv モジュールで読む
+ファイルは約 64KB ごとのチャンク（行境界で区切る）に分けて処理し、チャンク単位で
+列の値を yield する（iter_scan）。全体の値が必要なときは scan_csv で連結する。
+CR を含むファイルと、引用符が値の途中にあるファイルは csv モジュールで読む。
+値は csv.reader（newline=""）で読んだ場合と同じになる。
+"""
+
+import csv
+import io
+import mmap
+import os
+import re
+from bisect import bisect_left
+from itertools import repeat
+
+CHUNK_BYTES = 1 << 16
+
+
+class CsvScan:
+    """スキャン結果。values は columns と同じ並びの列ごとの値リスト。
+
+    fallback_rows は csv モジュールで読んだ行数（カンマ数が合わない行を含む）。
+    """
+
+    def __init__(self, header, total, values, fallback_rows):
+        self.header = header
+        self.total = total
+        self.values = values
+        self.fallback_rows = fallback_rows
+
+
+# 引用フィールドがカンマ・改行を含まない1行のレコード（[j::列数] で切り出せる）
+_SIMPLE_RECORD = re.compile(r'(?:[^",]*|"(?:[^",]|"")*")(?:,(?:[^",]*|"(?:[^",]|"")*"))*')
+# 引用フィールド内のカンマ・改行を許す一般のレコード（csv モジュールで読む）
+_RECORD = re.compile(
+    r'(?:[^",\n]*|"(?:[^"]|"")*")(?:,(?:[^",\n]*|"(?:[^"]|"")*"))*', re.DOTALL
+)
+
+
+class _Fallback(Exception):
+    """引用符が値の途中にあるなど、行単位で切り出せないファイル。"""
+
+
+def _unquote(v):
+    """"..." の引用を外す（_SIMPLE_RECORD に一致した行のフィールド）。"""
+    return v[1:-1].replace('""', '"')
+
+
+def _column_index(header, columns):
+    if columns is None:
+        return list(range(len(header)))
+    pos = {name: i for i, name in enumerate(header)}
+    return [pos.get(c) for c in columns]
+
+
+def _append_row(values, idx, raw, missing):
+    n = len(raw)
+    for col, i in zip(values, idx):
+        col.append(raw[i] if i is not None and i < n else missing)
+
+
+def _irregular_lines(lines, commas, quoted):
+    """カンマ数が合わない行・空行・引用が _SIMPLE_RECORD に合わない行の位置（昇順）。"""
+    counts = list(map(str.count, lines, repeat(",")))
+    bad = []
+    if counts.count(commas) != len(counts):
+        bad = [i for i, c in enumerate(counts) if c != commas]
+    if commas == 0:
+        bad += [i for i, line in enumerate(lines) if not line]
+    bad += [i for i in quoted if not _SIMPLE_RECORD.fullmatch(lines[i])]
+    return sorted(set(bad))
+
+
+def _iter_with_csv(f, columns, stats, missing, header=None):
+    """テキストストリーム f（newline=""）を csv モジュールで読む。
+
+    header を渡した場合、f はデータ行の途中（レコード境界）から始まる。
+    """
+    reader = csv.reader(f)
+    if header is None:
+        header = next(reader, [])
+    stats["header"] = header
+    idx = _column_index(header, columns)
+    values = [[] for _ in idx]
+    n = 0
+    for raw in reader:
+        if not raw:
+            continue
+        n += 1
+        _append_row(values, idx, raw, missing)
+    stats["total"] += n
+    stats["fallback_rows"] += n
+    if n:
+        yield values
+
+
+def _scan_lines(lines, idx, width, missing, stats, at_eof):
+    """1チャンク分の行を列単位で読む。→ (列ごとの値, 次のチャンクへ持ち越す行)
+
+    チャンク末尾で引用符が閉じていない行（複数行レコードの途中）は持ち越す。
+    """
+    quoted = [i for i, line in enumerate(lines) if '"' in line]
+    values = [[] for _ in idx]
+    total = 0
+    fallback = 0
+
+    def take_run(start, stop):
+        """lines[start:stop]（全行のカンマ数が規則どおり）を列単位で取り込む。"""
+        nonlocal total
+        n = stop - start
+        if n <= 0:
+            return
+        total += n
+        if not idx:
+            return  # 行数だけ数える
+        flat = ",".join(lines[start:stop]).split(",")
+        # 引用符を含む行だけ、該当フィールドの引用を外す
+        for q in quoted[bisect_left(quoted, start):bisect_left(quoted, stop)]:
+            base = (q - start) * width
+            for k in range(base, base + width):
+                if '"' in flat[k]:
+                    flat[k] = _unquote(flat[k])
+        for col, i in zip(values, idx):
+            col.extend(flat[i::width] if i is not None else [missing] * n)
+
+    start = 0
+    n_lines = len(lines)
+    carry = []
+    for i in _irregular_lines(lines, width - 1, quoted):
+        if i < start:
+            continue  # 直前の複数行レコードに含まれた行
+        take_run(start, i)
+        j = i + 1
+        if lines[i]:
+            # 引用符が閉じるまで次の行をつなげる（フィールド内の改行）
+            quotes = lines[i].count('"')
+            while quotes & 1 and j < n_lines:
+                quotes += lines[j].count('"')
+                j += 1
+            if quotes & 1 and not at_eof:
+                carry = lines[i:]
+                start = n_lines
+                break
+            text = "\n".join(lines[i:j])
+            if quotes & 1 or not _RECORD.fullmatch(text):
+                raise _Fallback
+            for raw in csv.reader(io.StringIO(text, newline="")):
+                if raw:
+                    total += 1
+                    fallback += 1
+                    _append_row(values, idx, raw, missing)
+        start = j
+    take_run(start, n_lines)
+    stats["total"] += total
+    stats["fallback_rows"] += fallback
+    return values, carry
+
+
+def iter_scan(filepath, columns, stats, missing=""):
+    """CSV の columns（None は全カラム）をチャンクごとに列単位で yield する。
+
+    yield するのは columns と同じ並びの値リストのリスト（チャンク内の行分）。
+    stats にはヘッダ（header）、全データ行数（total）、csv モジュールで読んだ
+    行数（fallback_rows、カンマ数が合わない行を含む）を書き込む。
+    ヘッダにないカラムと、行の不足セルは missing になる。空行は数えない。
+    """
+    stats["total"] = 0
+    stats["fallback_rows"] = 0
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            stats["header"] = []
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b"\r") != -1:
+                with open(filepath, "r", encoding="utf-8", newline="") as tf:
+                    yield from _iter_with_csv(tf, columns, stats, missing)
+                return
+            size = len(mm)
+            end = mm.find(b"\n")
+            if end == -1:
+                end = size
+            header = next(csv.reader([mm[:end].decode("utf-8")]), [])
+            stats["header"] = header
+            idx = _column_index(header, columns)
+            width = len(header)
+            pos = end + 1
+            carry = []
+            while pos < size:
+                stop = mm.find(b"\n", pos + CHUNK_BYTES)
+                stop = size if stop == -1 else stop + 1
+                lines = mm[pos:stop].decode("utf-8").split("\n")
+                if lines[-1] == "":
+                    lines.pop()  # 末尾の改行
+                counts = (stats["total"], stats["fallback_rows"])
+                try:
+                    values, next_carry = _scan_lines(
+                        carry + lines, idx, width, missing, stats, stop >= size
+                    )
+                except _Fallback:
+                    # このチャンクの先頭（レコード境界）から残りを csv モジュールで読む
+                    stats["total"], stats["fallback_rows"] = counts
+                    text = "".join(line + "\n" for line in carry) + mm[pos:].decode("utf-8")
+                    yield from _iter_with_csv(
+                        io.StringIO(text, newline=""), columns, stats, missing, header
+                    )
+                    return
+                carry = next_carry
+                pos = stop
+                if values and values[0]:
+                    yield values
+
+
+def scan_csv(filepath, columns=None, missing=""):
+    """iter_scan の全チャンクを連結した CsvScan を返す。"""
+    stats = {}
+    values = None
+    for chunk in iter_scan(filepath, columns, stats, missing):
+        if values is None:
+            values = chunk
+        else:
+            for col, part in zip(values, chunk):
+                col.extend(part)
+    if values is None:
+        values = [[] for _ in _column_index(stats["header"], columns)]
+    return CsvScan(stats["header"], stats["total"], values, stats["fallback_rows"])
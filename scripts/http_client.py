@@ -0,0 +1,173 @@
+"""
+Notion / Slack 共通 HTTP クライアント（http.client ベース、標準ライブラリのみ）
+
+  - ホストごとに接続をプールし、Keep-Alive で TLS ハンドシェイクを使い回す
+  - 429 / 5xx は Retry-After を尊重し、ジッター付き指数バックオフで再試行。
+    POST / PATCH（冪等でない）は 429 と送信前の接続エラーだけ再試行し、
+    サーバーが処理したかもしれない失敗（5xx・応答待ちの切断）は再送しない
+  - 1回の実行あたりのリクエスト数に上限（budget）を設ける
+  - 呼び出し種別ごとのレイテンシ統計をログ用に集計する
+"""
+
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class HttpError(Exception):
+    """再試行しても成功しなかったリクエスト（status は接続エラー時 None）。"""
+
+    def __init__(self, message, status=None, body=""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class HttpClient:
+    """スレッドから共有できる Keep-Alive 接続プール付きクライアント。"""
+
+    def __init__(self, max_retries=5, budget=1000, timeout=30,
+                 backoff_base=0.5, backoff_max=30.0):
+        self.max_retries = max_retries
+        self.budget = budget
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sent = 0
+        self._idle = defaultdict(list)  # (scheme, host, port) -> [接続]
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"latencies": [], "retries": 0, "throttled": 0,
+                                           "errors": 0})
+
+    # ---- 接続プール ----
+
+    def _acquire(self, origin):
+        with self._lock:
+            if self._idle[origin]:
+                return self._idle[origin].pop()
+        scheme, host, port = origin
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def _release(self, origin, conn):
+        with self._lock:
+            self._idle[origin].append(conn)
+
+    def close(self):
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+    # ---- リクエスト ----
+
+    def _take_budget(self):
+        with self._lock:
+            if self.sent >= self.budget:
+                raise HttpError(f"request budget exhausted ({self.budget})")
+            self.sent += 1
+
+    def _backoff(self, attempt, retry_after=None):
+        """Retry-After があればそれに従い、なければ full jitter の指数バックオフ。"""
+        if retry_after is not None:
+            try:
+                return float(retry_after) + random.uniform(0, self.backoff_base)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, body=None, headers=None, label=None, idempotent=None):
+        """リクエストを送り (status, body bytes) を返す。
+
+        429 / 5xx / 接続エラーは max_retries 回まで再試行し、それでも失敗すれば
+        HttpError を送出する。それ以外の 4xx はそのまま返す。
+        idempotent=False（POST / PATCH の既定）では重複作成を避けるため、再試行は
+        429 と送信完了前の接続エラーに限り、5xx や応答待ちの切断はすぐ HttpError にする
+        （検索用の POST など再送しても安全なものは idempotent=True を渡す）。
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        stats = self._stats[label or f"{method} {parts.hostname}"]
+
+        for attempt in range(self.max_retries + 1):
+            self._take_budget()
+            conn = self._acquire(origin)
+            start = time.perf_counter()
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                sent = True
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                # 切れた Keep-Alive 接続の再利用などは接続を捨てて再試行する
+                conn.close()
+                stats["errors"] += 1
+                if attempt == self.max_retries or (sent and not idempotent):
+                    raise HttpError(f"{method} {url}: {e}") from e
+                stats["retries"] += 1
+                time.sleep(self._backoff(attempt))
+                continue
+            stats["latencies"].append(time.perf_counter() - start)
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(origin, conn)
+
+            if resp.status in RETRY_STATUSES:
+                if resp.status == 429:
+                    stats["throttled"] += 1
+                if attempt == self.max_retries or (resp.status != 429 and not idempotent):
+                    raise HttpError(
+                        f"{method} {url}: HTTP {resp.status}", resp.status,
+                        data.decode("utf-8", errors="replace"),
+                    )
+                stats["retries"] += 1
+                time.sleep(self._backoff(attempt, resp.getheader("Retry-After")))
+                continue
+            return resp.status, data
+
+    def request_json(self, method, url, payload=None, headers=None, label=None,
+                     idempotent=None):
+        """JSON を送受信する。戻り値は (status, パース済み JSON または None)。"""
+        body = json.dumps(payload).encode() if payload is not None else None
+        hdrs = {"Content-Type": "application/json"}
+        hdrs.update(headers or {})
+        status, data = self.request(method, url, body, hdrs, label, idempotent)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    # ---- 統計 ----
+
+    def summary_lines(self):
+        """呼び出し種別ごとの件数・レイテンシ・再試行数（ログ用）。"""
+        lines = []
+        for label, st in sorted(self._stats.items()):
+            lat = sorted(st["latencies"])
+            if not lat and not st["errors"]:
+                continue
+            line = f"HTTP {label}: {len(lat)}件"
+            if lat:
+                p50 = lat[len(lat) // 2]
+                p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+                line += f", p50 {p50:.2f}s, p95 {p95:.2f}s, max {lat[-1]:.2f}s"
+            if st["retries"]:
+                line += f", 再試行 {st['retries']}回 (429: {st['throttled']})"
+            if st["errors"]:
+                line += f", 接続エラー {st['errors']}回"
+            lines.append(line)
+        return lines
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+日次スナップショットの取り込み（data/YYYY-MM-DD/*.csv → 分析用ストア）
+
+Usage:
+    # 列指向アーカイブ（data/YYYY-MM-DD/{prefix}-YYYY-MM-DD.dca）を作成
+    python3 scripts/ingest.py archive --date 2026-02-27
+    python3 scripts/ingest.py archive --all --codec lzma
+    # 作成後に内容を照合して元CSVを削除（リポジトリにはアーカイブのみ残す）
+    python3 scripts/ingest.py archive --date 2026-02-27 --prune-csv
+
+    # 重複排除ストア（data/_store/）に日付を追加 / 全日付で作り直す
+    python3 scripts/ingest.py store --date 2026-02-27
+    python3 scripts/ingest.py store --all
+    # 前日比の変更件数 / 任意の日付の復元
+    python3 scripts/ingest.py changes --query q4
+    python3 scripts/ingest.py restore --query q4 --date 2026-02-25 --out /tmp/q4.csv
+
+    # SQLite 分析ストア（data/analytics.sqlite）に Q4/Q5/Q6 を取り込み、集計と照合
+    python3 scripts/ingest.py sqlite --all --check
+    python3 scripts/ingest.py sql "SELECT cv_content_sub__c, COUNT(DISTINCT lead_id) FROM q4
+        WHERE snapshot_date = '2026-02-27' AND eligible AND month = '2026-02'
+          AND inflow_route_media = 'LIS' AND user_name = '村松 亜茉音' AND is_holiday != '平日'
+        GROUP BY 1"
+
+    # マニフェスト（data/_manifest.json: 日付ごとのファイル・行数・カラム・ハッシュ）を更新
+    # （archive / store / sqlite も対象日付のマニフェストを更新する）
+    python3 scripts/ingest.py manifest --all
+"""
+
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import analytics_db
+from columnar import ARCHIVE_SUFFIX, CODECS, ColumnarArchive, source_info, write_archive
+from compute_tables import (
+    CSV_PREFIXES, Q4Columns, Q6_REQUIRED, build_funnel_cubes, build_prev_meetings_from_q6,
+    find_archive, find_csv, get_row_month, load_archive_projected, load_csv_projected,
+    load_q4_window, load_q4_window_archive, prev_month_str,
+)
+from manifest import DataManifest
+from snapshot_store import STORE_DIR, SnapshotStore
+
+# ================================================================
+# 列指向アーカイブ
+# ================================================================
+
+def partition_func(qid, header):
+    """compute_tables.py が行を絞り込む月でパーティションを切る関数を返す。
+
+    Q4: get_row_month（month、なければ created_date_jst）
+    Q5: created_date_jst の年月、Q6: first_meeting_date の年月
+    Q1-Q3: 小さいので分けない
+    """
+    pos = {name: i for i, name in enumerate(header)}
+
+    def col(values, name):
+        i = pos.get(name)
+        return (values[i] or "") if i is not None else ""
+
+    if qid == "q4":
+        return lambda v: get_row_month(
+            {"month": col(v, "month"), "created_date_jst": col(v, "created_date_jst")})
+    if qid == "q5":
+        return lambda v: col(v, "created_date_jst")[:7]
+    if qid == "q6":
+        return lambda v: col(v, "first_meeting_date")[:7]
+    return lambda v: ""
+
+
+def archive_path_for(csv_path):
+    return csv_path.with_suffix(ARCHIVE_SUFFIX)
+
+
+def verify_archive(csv_path, archive_path):
+    """アーカイブを全カラム展開し、CSV の各行（不足セルは空文字扱い）と一致するか。"""
+    arch = ColumnarArchive(archive_path)
+    by_part = {}
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if header != arch.header:
+            return False
+        part_of = partition_func(arch.meta.get("query", ""), header)
+        width = len(header)
+        for raw in reader:
+            if not raw:
+                continue
+            values = (raw + [""] * width)[:width]
+            by_part.setdefault(part_of(values) or "", []).append(values)
+    expected = [r for k in sorted(by_part) for r in by_part[k]]
+    columns = arch.read(arch.header)
+    return len(expected) == arch.total and all(
+        list(row) == exp for row, exp in zip(zip(*columns), expected)
+    )
+
+
+def archive_snapshot(data_dir, date_str, codec, prune):
+    total_csv = total_arch = 0
+    for qid, prefix in CSV_PREFIXES.items():
+        path = find_csv(data_dir, qid, date_str)
+        if not path:
+            continue
+        start = time.perf_counter()
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            out = archive_path_for(path)
+            meta = write_archive(out, header, reader, partition_func(qid, header),
+                                 codec=codec, source=source_info(path), query=qid)
+        csv_size, arch_size = path.stat().st_size, out.stat().st_size
+        total_csv += csv_size
+        total_arch += arch_size
+        print(f"   {qid}: {path.name} {meta['total']:,}行, "
+              f"{len(meta['partitions'])}パーティション, "
+              f"{csv_size / 1024:,.0f}KB → {arch_size / 1024:,.0f}KB "
+              f"({arch_size / csv_size:.1%}), {time.perf_counter() - start:.2f}s")
+        if prune:
+            if verify_archive(path, out):
+                path.unlink()
+                print(f"      照合OK → {path.name} を削除")
+            else:
+                print(f"      ⚠️ 照合NG: {path.name} は削除しません", file=sys.stderr)
+    return total_csv, total_arch
+
+
+# ================================================================
+# 重複排除ストア
+# ================================================================
+
+# エンティティのキー（Q6 はスキーマが日によって変わり、opportunity_id がない日は行全体）
+STORE_KEYS = {
+    "q1": ["lead_date", "dimension"],
+    "q2": ["lead_date", "dimension"],
+    "q3": ["lead_date", "dimension"],
+    "q4": ["id"],
+    "q5": [
+        "created_date_jst", "f_initial_deal_acquisition_date", "business_hours_class",
+        "is_holiday", "user_name", "demo_call_type_summary_v2", "cv_content_sub__c",
+    ],
+    "q6": ["opportunity_id"],
+}
+
+
+def read_snapshot(data_dir, qid, date_str):
+    """→ (ヘッダ, 行リスト, 作成元情報)。CSV を優先し、削除済みならアーカイブから読む。"""
+    path = find_csv(data_dir, qid, date_str)
+    if path:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            rows = list(reader)
+        return header, rows, source_info(path)
+    arch = find_archive(data_dir, qid, date_str)
+    if arch is None:
+        return None
+    # アーカイブの行順はパーティション順（ストアの行順も同じになる）
+    rows = list(zip(*arch.read(arch.header, missing=None))) if arch.header else []
+    return arch.header, [list(r) for r in rows], arch.source
+
+
+def store_snapshot(store, data_dir, date_str):
+    for qid in CSV_PREFIXES:
+        snap = read_snapshot(data_dir, qid, date_str)
+        if snap is None:
+            continue
+        header, rows, source = snap
+        if date_str in store.dates(qid):
+            print(f"   {qid}: 登録済み")
+            continue
+        start = time.perf_counter()
+        info = store.append(qid, date_str, header, rows, STORE_KEYS[qid], source)
+        note = "" if info["keyed"] else "（キーカラムなし: 行全体をキーに使用、追加/削除は行の入れ替わり）"
+        if info["header_changed"]:
+            note += "（ヘッダ変更あり: 前日との比較は参考値）"
+        if info["format_columns"]:
+            note += "（形式のみの変更: " + ", ".join(info["format_columns"]) + "）"
+        print(f"   {qid}: {info['rows']:,}行, 追加 {info['added']:,} / 変更 {info['changed']:,}"
+              f" / 削除 {info['removed']:,}, {info['bytes'] / 1024:,.0f}KB, "
+              f"{time.perf_counter() - start:.2f}s{note}")
+
+
+def print_changes(store, qids):
+    for qid in qids:
+        index = store.index(qid)
+        if not index:
+            continue
+        print(f"## {qid} ({CSV_PREFIXES[qid]})")
+        print("| 日付 | 行数 | 追加 | 変更 | 削除 | 差分サイズ | 主な変更カラム |")
+        print("|------|------|------|------|------|-----------|----------------|")
+        for day in index["days"]:
+            cols = sorted(day["changed_columns"].items(), key=lambda kv: -kv[1])[:3]
+            col_text = ", ".join(f"{c}={n:,}" for c, n in cols)
+            if day.get("format_columns"):
+                col_text += " / 形式のみ " + ", ".join(day["format_columns"])
+            if not day["keyed"]:
+                col_text = "キーなし " + col_text
+            if day["header_changed"]:
+                col_text = "ヘッダ変更 " + col_text
+            print(f"| {day['date']} | {day['rows']:,} | {day['added']:,} | {day['changed']:,}"
+                  f" | {day['removed']:,} | {day['bytes'] / 1024:,.0f}KB | {col_text.strip()} |")
+        print()
+
+
+def restore_snapshot(store, qid, date_str, out):
+    header, rows = store.view(qid, date_str)
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        # 不足セル（None）は元の短い行に戻す
+        for row in rows:
+            while row and row[-1] is None:
+                row.pop()
+            writer.writerow(row)
+    print(f"{qid} {date_str}: {len(rows):,}行 → {out}")
+
+
+# ================================================================
+# SQLite 分析ストア
+# ================================================================
+
+def sqlite_snapshot(conn, data_dir, date_str):
+    for qid in analytics_db.RECORDS:
+        snap = read_snapshot(data_dir, qid, date_str)
+        if snap is None:
+            continue
+        header, rows, source = snap
+        start = time.perf_counter()
+        n = analytics_db.load_snapshot(conn, qid, date_str, header, rows, source)
+        print(f"   {qid}: {n:,}行, {time.perf_counter() - start:.2f}s")
+
+
+def check_sqlite(conn, data_dir, date_str):
+    """SQL の集計が compute_tables.py（Q4 キューブ・Q6 前月商談実施数）と一致するか。"""
+    # CSV を削除した日付（archive --prune-csv）はアーカイブから読む（prepare_date と同じ）
+    q4_path = find_csv(data_dir, "q4", date_str)
+    q6_path = find_csv(data_dir, "q6", date_str)
+    q4_arch = None if q4_path else find_archive(data_dir, "q4", date_str)
+    q6_arch = None if q6_path else find_archive(data_dir, "q6", date_str)
+    if q4_path:
+        snap, latest = load_q4_window(q4_path)
+    elif q4_arch is not None:
+        snap, latest = load_q4_window_archive(q4_arch)
+    else:
+        print(f"   {date_str}: Q4 のCSV・アーカイブがないため照合をスキップ")
+        return True
+    months = [prev_month_str(latest), latest]
+    cubes = build_funnel_cubes(Q4Columns.from_rows(snap.rows, months))
+    ok = True
+    for month in months:
+        start = time.perf_counter()
+        by_sql = analytics_db.funnel(conn, month, date_str)
+        elapsed = time.perf_counter() - start
+        cube = cubes[month]
+        mismatched = [k for k in cube.groups if cube.funnel(k) != by_sql.get(k)]
+        extra = set(by_sql) - set(cube.groups)
+        ok = ok and not mismatched and not extra
+        print(f"   {date_str} {month}: ファネル {len(by_sql):,}キー, "
+              f"不一致 {len(mismatched) + len(extra)}, SQL {elapsed * 1000:.0f}ms")
+    if q6_path or q6_arch is not None:
+        if q6_path:
+            q6 = load_csv_projected(q6_path, Q6_REQUIRED).rows
+        else:
+            q6 = load_archive_projected(q6_arch, Q6_REQUIRED, [months[0]]).rows
+        same = (analytics_db.prev_meetings(conn, months[0], date_str)
+                == build_prev_meetings_from_q6(q6, months[0]))
+        ok = ok and same
+        print(f"   {date_str} {months[0]}: 商談実施数 {'一致' if same else '不一致'}")
+    return ok
+
+
+def print_sql(conn, sql):
+    start = time.perf_counter()
+    columns, rows = analytics_db.run_sql(conn, sql)
+    elapsed = time.perf_counter() - start
+    if columns:
+        print("| " + " | ".join(columns) + " |")
+        print("|" + "---|" * len(columns))
+        for row in rows:
+            print("| " + " | ".join("" if v is None else str(v) for v in row) + " |")
+    print(f"\n{len(rows):,}行, {elapsed * 1000:.1f}ms")
+
+
+# ================================================================
+# マニフェスト
+# ================================================================
+
+def update_manifest(data_dir, dates, rebuild=False):
+    """dates の各クエリのファイル（CSV、削除済みならアーカイブ）をマニフェストに記録する。"""
+    manifest = None if rebuild else DataManifest.load(data_dir)
+    manifest = manifest or DataManifest(data_dir)
+    counts = {"recorded": 0, "removed": 0}
+    for date_str in dates:
+        for qid in CSV_PREFIXES:
+            path = find_csv(data_dir, qid, date_str)
+            if path is None:
+                arch = data_dir / date_str / f"{CSV_PREFIXES[qid]}-{date_str}{ARCHIVE_SUFFIX}"
+                path = arch if arch.exists() else None
+            if path is None:
+                if manifest.entry(qid, date_str) is not None:
+                    manifest.forget(qid, date_str)
+                    counts["removed"] += 1
+                continue
+            manifest.record(qid, date_str, path)
+            counts["recorded"] += 1
+    manifest.save()
+    print(f"[manifest] {counts['recorded']}ファイルを記録"
+          + (f", {counts['removed']}件を削除" if counts["removed"] else "")
+          + f" → {manifest.path}")
+
+
+# ================================================================
+# メイン
+# ================================================================
+
+def snapshot_dates(data_dir):
+    dates = []
+    for d in sorted(data_dir.iterdir()):
+        if d.is_dir():
+            try:
+                datetime.strptime(d.name, "%Y-%m-%d")
+            except ValueError:
+                continue
+            dates.append(d.name)
+    return dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日次スナップショットの取り込み")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_arch = sub.add_parser("archive", help="CSV を列指向アーカイブ (.dca) に変換")
+    p_arch.add_argument("--date", help="対象日付 (YYYY-MM-DD)")
+    p_arch.add_argument("--all", action="store_true", help="data/ 配下の全日付")
+    p_arch.add_argument("--data-dir", default="data", help="データディレクトリ")
+    p_arch.add_argument("--codec", choices=sorted(CODECS), default="zlib", help="圧縮方式")
+    p_arch.add_argument("--prune-csv", action="store_true",
+                        help="アーカイブの内容を照合できた CSV を削除する")
+    p_store = sub.add_parser("store", help="重複排除ストア (data/_store/) に日付を追加")
+    p_store.add_argument("--date", help="対象日付 (YYYY-MM-DD)")
+    p_store.add_argument("--all", action="store_true", help="全日付でストアを作り直す")
+    p_store.add_argument("--data-dir", default="data", help="データディレクトリ")
+
+    p_changes = sub.add_parser("changes", help="ストアの前日比変更件数を表示")
+    p_changes.add_argument("--query", choices=sorted(CSV_PREFIXES), help="対象クエリ")
+    p_changes.add_argument("--data-dir", default="data", help="データディレクトリ")
+
+    p_restore = sub.add_parser("restore", help="ストアから任意の日付のCSVを復元")
+    p_restore.add_argument("--query", choices=sorted(CSV_PREFIXES), required=True)
+    p_restore.add_argument("--date", required=True, help="対象日付 (YYYY-MM-DD)")
+    p_restore.add_argument("--out", required=True, help="出力CSV")
+    p_restore.add_argument("--data-dir", default="data", help="データディレクトリ")
+    p_sqlite = sub.add_parser("sqlite", help="Q4/Q5/Q6 を SQLite 分析ストアに取り込む")
+    p_sqlite.add_argument("--date", help="対象日付 (YYYY-MM-DD)")
+    p_sqlite.add_argument("--all", action="store_true", help="data/ 配下の全日付")
+    p_sqlite.add_argument("--data-dir", default="data", help="データディレクトリ")
+    p_sqlite.add_argument("--db", help=f"データベース（既定: data/{analytics_db.DB_NAME}）")
+    p_sqlite.add_argument("--check", action="store_true",
+                          help="取り込み後に SQL の集計を compute_tables.py と照合する")
+
+    p_manifest = sub.add_parser("manifest", help="マニフェスト (data/_manifest.json) を更新")
+    p_manifest.add_argument("--date", help="対象日付 (YYYY-MM-DD)")
+    p_manifest.add_argument("--all", action="store_true", help="全日付でマニフェストを作り直す")
+    p_manifest.add_argument("--data-dir", default="data", help="データディレクトリ")
+
+    p_sql = sub.add_parser("sql", help="SQLite 分析ストアにアドホッククエリを実行")
+    p_sql.add_argument("query", help="SQL")
+    p_sql.add_argument("--data-dir", default="data", help="データディレクトリ")
+    p_sql.add_argument("--db", help=f"データベース（既定: data/{analytics_db.DB_NAME}）")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    store = SnapshotStore(data_dir / STORE_DIR)
+    if args.command == "store":
+        if bool(args.date) == bool(args.all):
+            parser.error("--date か --all のどちらか一方を指定してください")
+        if args.all:
+            for qid in CSV_PREFIXES:
+                store.clear(qid)
+        dates = snapshot_dates(data_dir) if args.all else [args.date]
+        for date_str in dates:
+            print(f"[store] {date_str}")
+            store_snapshot(store, data_dir, date_str)
+        update_manifest(data_dir, dates)
+    elif args.command == "changes":
+        print_changes(store, [args.query] if args.query else list(CSV_PREFIXES))
+    elif args.command == "restore":
+        restore_snapshot(store, args.query, args.date, args.out)
+    elif args.command == "sqlite":
+        if bool(args.date) == bool(args.all):
+            parser.error("--date か --all のどちらか一方を指定してください")
+        conn = analytics_db.connect(args.db or analytics_db.default_db_path(data_dir))
+        dates = snapshot_dates(data_dir) if args.all else [args.date]
+        for date_str in dates:
+            print(f"[sqlite] {date_str}")
+            sqlite_snapshot(conn, data_dir, date_str)
+        update_manifest(data_dir, dates)
+        if args.check:
+            print("[check]")
+            if not all([check_sqlite(conn, data_dir, d) for d in dates]):
+                sys.exit(1)
+    elif args.command == "manifest":
+        if bool(args.date) == bool(args.all):
+            parser.error("--date か --all のどちらか一方を指定してください")
+        update_manifest(data_dir, snapshot_dates(data_dir) if args.all else [args.date],
+                        rebuild=args.all)
+    elif args.command == "sql":
+        conn = analytics_db.connect(args.db or analytics_db.default_db_path(data_dir))
+        print_sql(conn, args.query)
+    if args.command == "archive":
+        if bool(args.date) == bool(args.all):
+            parser.error("--date か --all のどちらか一方を指定してください")
+        dates = snapshot_dates(data_dir) if args.all else [args.date]
+        total_csv = total_arch = 0
+        for date_str in dates:
+            print(f"[archive] {date_str}")
+            c, a = archive_snapshot(data_dir, date_str, args.codec, args.prune_csv)
+            total_csv += c
+            total_arch += a
+        if total_csv:
+            print(f"合計: {total_csv / 2**20:.1f}MB → {total_arch / 2**20:.1f}MB "
+                  f"({total_arch / total_csv:.1%})")
+        update_manifest(data_dir, dates)
+
+
+if __name__ == "__main__":
+    main()
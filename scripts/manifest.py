@@ -0,0 +1,172 @@
+"""
+日次スナップショットのマニフェスト（data/_manifest.json、標準ライブラリのみ）
+
+data/ 配下のスナップショットを (クエリ, 日付) ごとに1件ずつ記録する。
+  - file: data/ からの相対パス（CSV を削除した日付は .dca）
+  - size / mtime_ns: 記録時のファイル情報（一致すれば rows 等をそのまま使う）
+  - rows: データ行数、schema: カラム一覧（schemas への番号、日をまたいで共有）
+  - sha256: CSV の内容ハッシュ（.dca は作成元CSVのハッシュ）
+compute_tables.py は前月ファイルの探索と前日行数の検証で参照し、日付フォルダが
+増えても data/ を走査しない。マニフェストがない、該当する記録がない、または記録より
+新しい日付フォルダがある（ingest.py 実行後に取得した日付）場合は従来どおり
+ディレクトリを探す。
+更新は scripts/ingest.py（archive / store / sqlite / manifest）が行う。
+"""
+
+import json
+import os
+from pathlib import Path
+
+from columnar import ARCHIVE_SUFFIX, ColumnarArchive, file_sha256
+from csv_scan import scan_csv
+
+MANIFEST_NAME = "_manifest.json"
+MANIFEST_VERSION = 1
+
+# data_dir → (mtime_ns, DataManifest)。1プロセス内で何度も読み直さない
+_LOADED = {}
+
+
+class DataManifest:
+    """data/_manifest.json の内容（クエリ → 日付 → 記録）。"""
+
+    def __init__(self, data_dir, data=None):
+        self.data_dir = Path(data_dir)
+        data = data or {}
+        self.schemas = data.get("schemas", [])
+        self.queries = data.get("queries", {})
+        self._schema_ids = {tuple(s): i for i, s in enumerate(self.schemas)}
+
+    @property
+    def path(self):
+        return self.data_dir / MANIFEST_NAME
+
+    @classmethod
+    def load(cls, data_dir):
+        """data_dir のマニフェスト（なければ None）。"""
+        path = Path(data_dir) / MANIFEST_NAME
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+        hit = _LOADED.get(path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        manifest = cls(data_dir, data)
+        _LOADED[path] = (mtime, manifest)
+        return manifest
+
+    # ---- 参照 ----
+
+    def entry(self, qid, date_str):
+        return self.queries.get(qid, {}).get(date_str)
+
+    def dates(self, qid):
+        return sorted(self.queries.get(qid, {}))
+
+    def file(self, qid, date_str):
+        """記録されたファイルのパス（記録がない・ファイルが消えていれば None）。"""
+        entry = self.entry(qid, date_str)
+        if entry is None:
+            return None
+        path = self.data_dir / entry["file"]
+        return path if path.exists() else None
+
+    def latest_in_month(self, qid, ym):
+        """ym（YYYY-MM）の記録のうち最新の (日付, ファイル)（記録がなければ None）。
+
+        記録は ingest.py を実行した時点のもの。それより後に増えた日付フォルダは
+        含まれないので、呼び出し側で確かめる（find_prev_month_csv 参照）。
+        """
+        for date_str in reversed(self.dates(qid)):
+            if date_str[:7] == ym:
+                path = self.file(qid, date_str)
+                if path is not None:
+                    return date_str, path
+        return None
+
+    def columns(self, qid, date_str):
+        entry = self.entry(qid, date_str)
+        return self.schemas[entry["schema"]] if entry else None
+
+    def rows(self, qid, date_str, path=None):
+        """データ行数。path（実ファイル）が記録時と違う内容なら None。
+
+        サイズ + 更新時刻で判定し、更新時刻だけ違う場合（チェックアウト直後など）は
+        sha256 で確かめる（ColumnarArchive.matches_source と同じ）。
+        """
+        entry = self.entry(qid, date_str)
+        if entry is None:
+            return None
+        if path is not None:
+            if Path(path).name != Path(entry["file"]).name:
+                return None
+            st = os.stat(path)
+            if st.st_size != entry["size"]:
+                return None
+            if st.st_mtime_ns != entry["mtime_ns"] and file_sha256(path) != entry["sha256"]:
+                return None
+        return entry["rows"]
+
+    # ---- 更新 ----
+
+    def _schema_id(self, header):
+        key = tuple(header)
+        sid = self._schema_ids.get(key)
+        if sid is None:
+            sid = self._schema_ids[key] = len(self.schemas)
+            self.schemas.append(list(header))
+        return sid
+
+    def record(self, qid, date_str, path):
+        """path（CSV または .dca）を記録する。サイズ・更新時刻が同じなら読み直さない。"""
+        path = Path(path)
+        st = path.stat()
+        rel = path.relative_to(self.data_dir).as_posix()
+        old = self.entry(qid, date_str)
+        if (old is not None and old["file"] == rel and old["size"] == st.st_size
+                and old["mtime_ns"] == st.st_mtime_ns):
+            return old
+        if path.suffix == ARCHIVE_SUFFIX:
+            arch = ColumnarArchive(path)
+            header, rows = arch.header, arch.total
+            sha256 = (arch.source or {}).get("sha256")
+        else:
+            scan = scan_csv(path, [])
+            header, rows = scan.header, scan.total
+            sha256 = file_sha256(path)
+        entry = {
+            "file": rel, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "rows": rows,
+            "schema": self._schema_id(header), "sha256": sha256,
+        }
+        self.queries.setdefault(qid, {})[date_str] = entry
+        return entry
+
+    def forget(self, qid, date_str):
+        self.queries.get(qid, {}).pop(date_str, None)
+
+    def save(self):
+        # 参照されなくなったスキーマを詰める
+        used = sorted({e["schema"] for days in self.queries.values() for e in days.values()})
+        remap = {old: new for new, old in enumerate(used)}
+        self.schemas = [self.schemas[i] for i in used]
+        self._schema_ids = {tuple(s): i for i, s in enumerate(self.schemas)}
+        for days in self.queries.values():
+            for e in days.values():
+                e["schema"] = remap[e["schema"]]
+        data = {
+            "version": MANIFEST_VERSION, "schemas": self.schemas,
+            "queries": {q: dict(sorted(days.items())) for q, days in sorted(self.queries.items())},
+        }
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+            f.write("\n")
+        os.replace(tmp, self.path)
@@ -0,0 +1,124 @@
+"""
+処理ステージ計測 — compute_tables.py / publish_report.py 共通
+
+各ステージ（CSV読み込み・キューブ構築・compute_step*・ファイル書き出し・
+Notion/Slack 呼び出し）の壁時計時間・CPU時間・処理行数を記録し、
+data/computed/_perf.json に保存する。ログには1行サマリを出力する。
+
+環境変数:
+  PERF_TRACEMALLOC=1 — 各ステージの tracemalloc ピークも記録する
+                       （オーバーヘッドが大きいため既定では無効）
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+
+PERF_FILENAME = "_perf.json"
+
+
+def _peak_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KiB、macOS はバイト単位
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class PerfRecorder:
+    """ステージごとの計測結果を蓄積する。スレッドから並行に使ってよい。
+
+    CPU時間はステージを実行したスレッドのもの（time.thread_time）。
+    tracemalloc のピークはプロセス全体の値なので、並行実行中のステージ同士では
+    互いの確保分を含む。
+    """
+
+    def __init__(self, name, trace_memory=None):
+        self.name = name
+        self.stages = []
+        self.started_at = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._lock = threading.Lock()
+        if trace_memory is None:
+            trace_memory = os.environ.get("PERF_TRACEMALLOC", "") not in ("", "0")
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """with 内の処理を1ステージとして計測する。
+
+        yield する dict の "rows" を with 内で設定すれば処理行数として記録される。
+        """
+        rec = {"stage": name, "rows": rows}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield rec
+        finally:
+            rec["wall_s"] = round(time.perf_counter() - start, 6)
+            rec["cpu_s"] = round(time.thread_time() - cpu_start, 6)
+            rec["peak_bytes"] = (
+                tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            )
+            with self._lock:
+                self.stages.append(rec)
+
+    def timed(self, name, rows=None):
+        """関数全体を1ステージとして計測するデコレータ。"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name, rows):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "wall_s": round(time.perf_counter() - self._start, 6),
+            "cpu_s": round(time.process_time() - self._cpu_start, 6),
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "tracemalloc": self.trace_memory,
+            "stages": list(self.stages),
+        }
+
+    def summary(self, top=5):
+        """ログ用の1行サマリ（所要時間の大きい順に top 件）。"""
+        d = self.to_dict()
+        slowest = sorted(self.stages, key=lambda r: r["wall_s"], reverse=True)[:top]
+        parts = ", ".join(f"{r['stage']} {r['wall_s']:.2f}s" for r in slowest)
+        return (
+            f"⏱ {self.name}: 合計 {d['wall_s']:.2f}s (CPU {d['cpu_s']:.2f}s, "
+            f"RSS {d['peak_rss_bytes'] / 2**20:.0f}MB) | {parts}"
+        )
+
+    def save(self, output_dir, merge=False):
+        """output_dir/_perf.json に self.name をキーとして書き出す。
+
+        merge=True なら既存ファイルの他スクリプトの計測結果を残す。
+        """
+        path = Path(output_dir) / PERF_FILENAME
+        data = {}
+        if merge and path.exists():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        data[self.name] = self.to_dict()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return path
@@ -16,31 +16,64 @@ CI用レポート公開スクリプト — Notion投稿 + Slack通知
   SLACK_BOT_TOKEN    — Slack Bot Token（Webhook未設定時のDM送信用）
   SLACK_CHANNEL      — Slack チャネル/DM ID（Bot Token使用時）
   SLACK_MENTION_USER — メンション先ユーザーID
+  NOTION_PAGE_MODE   — new（既定: 毎回新規ページ）/ day（当日ページを差分更新）/
+                       month（月次ページを差分更新）。day/month は Integration に
+                       読取・更新権限が必要
+  NOTION_LAYOUT      — flat（既定: 1ページに全ブロック）/ sections（見出しごとに
+                       子ページへ分割し並列アップロード。NOTION_PAGE_MODE=new 時のみ）
+  NOTION_WORKERS     — sections 時の並列アップロード数（既定: 4）
+  PUBLISH_DESTINATIONS — 複数の Notion DB / Slack 配信先を書いた JSON ファイル
+                       （load_destinations 参照。指定時は上記の配信先変数より優先）
+  NOTION_API_URL / SLACK_API_URL — API の接続先（ローカルのスタブサーバーでの
+                       計測用。benchmarks/stub_server.py 参照）
+
+NOTION_PAGE_MODE=new・NOTION_LAYOUT=flat では送信済みチャンクを
+reports/レポート-YYYY-MM-DD.notion.json に記録し、同じレポートの再実行時は
+未送信のチャンクから再開する（同じページを使い回し、重複ページを作らない）。
+チェックポイントは gitignore 対象のローカルファイルなので、再開はローカル実行
+（run-local.sh・手動の再実行）でのみ働く。CI では毎回新しい環境で実行する。
 """
 
+import difflib
+import hashlib
 import json
 import os
 import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
+from http_client import HttpClient, HttpError
+from perf import PerfRecorder
+from report_format import RESULTS_FILENAME, RESULTS_VERSION, fmt_count_diff, fmt_pct, fmt_pp
+
 # ================================================================
 # 定数
 # ================================================================
 
 JST = timezone(timedelta(hours=9))
-NOTION_API = "https://api.notion.com/v1"
+NOTION_API = os.environ.get("NOTION_API_URL", "https://api.notion.com/v1")
 NOTION_VER = "2022-06-28"
-MAX_BLOCKS = 100
+MAX_BLOCKS = 100            # 1リクエストの children（トップレベル）上限
+MAX_REQUEST_BLOCKS = 1000   # 1リクエストのネストを含む総ブロック数上限
 MAX_RT_LEN = 2000
+MAX_RT_ITEMS = 100          # 1ブロックの rich_text 要素数上限
+CHECKPOINT_SUFFIX = ".notion.json"
+CHECKPOINT_VERSION = 1
+SECTION_INLINE_BLOCKS = 20  # これ以下のセクションは子ページにせず親ページに置く
+SECTION_SPLIT_BLOCKS = 50   # これを超える ## セクションは ### ごとの子ページに分ける
+DEFAULT_NOTION_WORKERS = 4
 
 DEFAULT_DB_ID = "311eea80-adae-80a5-a798-000bc1a1a73f"
 DEFAULT_MENTIONS = ["U07EJ6YKUPK", "U05V0RAF09M", "U07LNE4G2R0"]
 DEFAULT_CHANNEL = "C08PMM3C601"
+SLACK_API = os.environ.get("SLACK_API_URL", "https://slack.com/api")
+
+# Notion / Slack 呼び出しで共有する Keep-Alive 接続プール
+HTTP = HttpClient()
 
 CHANNEL_ORDER = ["全体", "TOP", "LIS", "DIS", "FAX・EDM", "その他"]
 
@@ -201,12 +234,112 @@ def parse_cv_tables(filepath):
     return result
 
 
+# ================================================================
+# 構造化結果（_results.json）
+# ================================================================
+
+def load_results(computed_dir):
+    """compute_tables.py が出力した _results.json を読む。
+
+    ファイルがない・壊れている・版が違う場合は None（Markdown のパースにフォールバック）。
+    """
+    path = computed_dir / RESULTS_FILENAME
+    if not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != RESULTS_VERSION:
+        return None
+    return data
+
+
+def achievement_progress_from_results(results):
+    progress = {}
+    for label in ["着電", "SAL", "商談"]:
+        for r in results["landing"].get(label, []):
+            rate = f"{r['ach'] * 100:.0f}%" if r["ach"] is not None else "-"
+            progress.setdefault(r["channel"], {})[label] = (rate, r["judgment"])
+    return progress if progress else None
+
+
+def critical_issues_from_results(results):
+    """extract_critical_issues と同じ文面を _results.json の数値・フラグから組み立てる。"""
+    funnel_by_ch = {r["channel"]: r for r in results["funnel"]}
+    cv_by_ch = results["cv"]
+
+    result = []
+    for issue in results["issues"]:
+        if issue["position"] != "重点課題":
+            continue
+
+        ch = issue["channel"]
+        funnel = funnel_by_ch.get(ch)
+        headline_parts = []
+        cn_is_bad = sal_is_bad = False
+        lead_drop = None
+        if funnel:
+            cur, prev = funnel["current"], funnel["previous"]
+            pp = funnel["pp_diff"]
+            cn_is_bad = funnel["worsened"]["cn_rate"]
+            sal_is_bad = funnel["worsened"]["sal_rate"]
+            change = funnel["lead_change_pct"]
+            # Markdown 表示（小数1桁）と同じ丸めで判定する
+            if change is not None and round(change, 1) <= -30:
+                lead_drop = round(change, 1)
+
+            if cn_is_bad:
+                headline_parts.append(
+                    f"CN率{fmt_pct(cur['cn_rate'])}（{fmt_pp(pp['cn_rate'])}）")
+            if sal_is_bad:
+                headline_parts.append(
+                    f"SAL率{fmt_pct(cur['sal_rate'])}（{fmt_pp(pp['sal_rate'])}）")
+            if lead_drop is not None:
+                desc = "半減" if lead_drop <= -40 else "大幅減"
+                headline_parts.append(
+                    f"リード{fmt_count_diff(cur['leads'], prev['leads'])}{desc}")
+
+        # Fallback: show failing KPIs from step1
+        if not headline_parts:
+            bad_kpis = []
+            for label, key in [("着電", "着電"), ("SAL", "SAL"), ("商談", "商談実施")]:
+                kpi = issue["kpis"][key]
+                if kpi["judgment"] == "❌":
+                    bad_kpis.append(f"{label}{kpi['ach'] * 100:.0f}%❌")
+            headline_parts.append("・".join(bad_kpis))
+
+        result.append(f"{ch}: {'、'.join(headline_parts)}")
+
+        # Find bad CVs for this channel
+        cv_rows = cv_by_ch.get(ch, {}).get("top10", [])
+        focus_cn = cn_is_bad or (not sal_is_bad and lead_drop is None)
+        bad_cvs = []
+        for cv in cv_rows:
+            m = cv["current"]
+            if focus_cn and cv["cn_below_avg"]:
+                bad_cvs.append((cv["cv"], f"CN{fmt_pct(m['cn_rate'])}", m["leads"]))
+            elif not focus_cn and cv["sal_below_avg"]:
+                bad_cvs.append((cv["cv"], f"SAL{fmt_pct(m['sal_rate'])}", m["leads"]))
+        bad_cvs.sort(key=lambda x: x[2], reverse=True)
+        if bad_cvs:
+            result.append(
+                "  → " + ", ".join(f"{name}({metric})" for name, metric, _ in bad_cvs[:3]))
+
+    return result if result else None
+
+
 # ================================================================
 # 進捗・課題抽出
 # ================================================================
 
 def extract_achievement_progress(computed_dir):
     """Read step1 tables and return per-channel achievement data."""
+    results = load_results(computed_dir)
+    if results:
+        return achievement_progress_from_results(results)
+
     files = [
         ("着電", computed_dir / "step1_着電着予.md"),
         ("SAL", computed_dir / "step1_SAL着予.md"),
@@ -231,6 +364,10 @@ def extract_achievement_progress(computed_dir):
 
 def extract_critical_issues(computed_dir):
     """Build critical issue descriptions with rate diagnosis and bad CVs."""
+    results = load_results(computed_dir)
+    if results:
+        return critical_issues_from_results(results)
+
     issues_path = computed_dir / "step1_課題チャネル.md"
     funnel_path = computed_dir / "step2_ファネル転換率.md"
     cv_path = computed_dir / "step2_CVコンテンツ.md"
@@ -519,19 +656,20 @@ def markdown_to_blocks(body):
         # 番号付きリスト
         m = re.match(r"^(\d+)\.\s+(.+)$", line)
         if m:
-            blocks.append({
-                "type": "numbered_list_item",
-                "numbered_list_item": {"rich_text": parse_rich_text(m.group(2))},
-            })
+            item = {"rich_text": parse_rich_text(m.group(2))}
+            blocks.append({"type": "numbered_list_item", "numbered_list_item": item})
             i += 1
-            # インデント子項目
+            # インデント子項目は番号付き項目の子ブロックにする
+            children = []
             while i < len(lines) and re.match(r"^\s+[-*]\s", lines[i]):
                 sub = re.sub(r"^\s+[-*]\s+", "", lines[i])
-                blocks.append({
+                children.append({
                     "type": "bulleted_list_item",
                     "bulleted_list_item": {"rich_text": parse_rich_text(sub)},
                 })
                 i += 1
+            if children:
+                item["children"] = children
             continue
 
         # 箇条書き
@@ -554,55 +692,458 @@ def markdown_to_blocks(body):
     return blocks
 
 
+def compact_blocks(blocks):
+    """連続する段落を改行区切りの1ブロックにまとめ、API に送るブロック数を減らす。
+
+    rich_text の要素数上限（MAX_RT_ITEMS）を超える場合はまとめない。
+    """
+    out = []
+    for block in blocks:
+        prev = out[-1] if out else None
+        if (block["type"] == "paragraph" and prev is not None
+                and prev["type"] == "paragraph"):
+            merged = (prev["paragraph"]["rich_text"]
+                      + [{"type": "text", "text": {"content": "\n"}}]
+                      + block["paragraph"]["rich_text"])
+            if len(merged) <= MAX_RT_ITEMS:
+                out[-1] = {"type": "paragraph", "paragraph": {"rich_text": merged}}
+                continue
+        out.append(block)
+    return out
+
+
+def block_count(block):
+    """ネストした子ブロック（table_row・子項目）を含むブロック数"""
+    children = (block.get(block["type"]) or {}).get("children", [])
+    return 1 + sum(block_count(c) for c in children)
+
+
+def chunk_blocks(blocks):
+    """1リクエストの上限（トップレベル MAX_BLOCKS・総数 MAX_REQUEST_BLOCKS）に収まるよう分割"""
+    chunks = []
+    current = []
+    total = 0
+    for block in blocks:
+        n = block_count(block)
+        if current and (len(current) >= MAX_BLOCKS or total + n > MAX_REQUEST_BLOCKS):
+            chunks.append(current)
+            current, total = [], 0
+        current.append(block)
+        total += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 # ================================================================
 # Notion API
 # ================================================================
 
-def _notion_req(method, path, api_key, payload=None):
-    data = json.dumps(payload).encode() if payload else None
-    req = Request(f"{NOTION_API}{path}", data=data, method=method, headers={
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "Notion-Version": NOTION_VER,
-    })
+def _notion_req(method, path, api_key, payload=None, idempotent=None):
+    label = f"notion {method} /{path.strip('/').split('/')[0]}"
     try:
-        with urlopen(req) as resp:
-            return json.loads(resp.read())
-    except HTTPError as e:
-        body = e.read().decode("utf-8", errors="replace")
-        print(f"  Notion API error: {e.code} {body}", file=sys.stderr)
+        status, result = HTTP.request_json(method, f"{NOTION_API}{path}", payload, {
+            "Authorization": f"Bearer {api_key}",
+            "Notion-Version": NOTION_VER,
+        }, label=label, idempotent=idempotent)
+    except HttpError as e:
+        print(f"  Notion API error: {e} {e.body}", file=sys.stderr)
+        return None
+    if status >= 400:
+        print(f"  Notion API error: {status} {json.dumps(result, ensure_ascii=False)}",
+              file=sys.stderr)
         return None
+    return result
 
 
-def create_notion_page(api_key, database_id, title, blocks):
-    """Notionページ作成 → URL を返す"""
-    now = datetime.now(JST)
-    page_title = f"レポート {now.strftime('%Y-%m-%d %H:%M')}"
+def notion_page_title(now, mode="new"):
+    """ページ名。差分更新モードでは同じ日（月）に同じ名前になるようにする。"""
+    if mode == "day":
+        return f"レポート {now.strftime('%Y-%m-%d')}"
+    if mode == "month":
+        return f"レポート {now.strftime('%Y-%m')}"
+    return f"レポート {now.strftime('%Y-%m-%d %H:%M')}"
+
+
+def checkpoint_path(report_path, destination="default"):
+    """レポートの横に置くチェックポイントファイル（reports/レポート-YYYY-MM-DD.notion.json）
+
+    既定以外の配信先は reports/レポート-YYYY-MM-DD.<配信先>.notion.json。
+    """
+    stem = Path(report_path).with_suffix("")
+    if destination != "default":
+        stem = Path(f"{stem}.{destination}")
+    return Path(f"{stem}{CHECKPOINT_SUFFIX}")
+
+
+def load_checkpoint(path):
+    if path is None or not Path(path).exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get("version") == CHECKPOINT_VERSION else None
+
+
+def save_checkpoint(path, state):
+    """途中で落ちても壊れたファイルが残らないよう一時ファイル経由で置き換える"""
+    if path is None:
+        return
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def chunk_hash(chunk):
+    h = hashlib.sha256()
+    for block in chunk:
+        h.update(block_fingerprint(block).encode())
+    return h.hexdigest()
+
+
+def create_notion_page(api_key, database_id, title, blocks, page_title=None,
+                       checkpoint=None):
+    """Notionページ作成 → (URL, 全チャンクを追記できたか) を返す
+
+    checkpoint（ファイルパス）を渡すと送信済みチャンクを記録し、同じ内容で
+    再実行した場合は未送信のチャンクから再開する（全て送信済みなら何もしない）。
+    """
+    if page_title is None:
+        page_title = notion_page_title(datetime.now(JST))
+    chunks = chunk_blocks(blocks) or [[]]
+    hashes = [chunk_hash(c) for c in chunks]
+
+    state = load_checkpoint(checkpoint)
+    if state and state.get("chunks") == hashes:
+        if state["acked"] >= len(chunks):
+            print(f"  Checkpoint: 送信済みのページを再利用 ({checkpoint})")
+            return state["url"], True
+        print(f"  Checkpoint: chunk {state['acked'] + 1}/{len(chunks)} から再開")
+    else:
+        result = _notion_req("POST", "/pages", api_key, {
+            "parent": {"database_id": database_id},
+            "properties": {
+                "ページ名": {"title": [{"text": {"content": page_title}}]},
+            },
+            "children": chunks[0],
+        })
+        if not result:
+            print("  Notion page creation FAILED (see error above)", file=sys.stderr)
+            return "", False
+        state = {
+            "version": CHECKPOINT_VERSION, "page_id": result["id"], "url": result["url"],
+            "chunks": hashes, "acked": 1,
+        }
+        save_checkpoint(checkpoint, state)
+
+    def ack(n):
+        state["acked"] = n
+        save_checkpoint(checkpoint, state)
+
+    ok = _append_chunks(api_key, state["page_id"], chunks, state["acked"], on_ack=ack)
+    return state["url"], ok
+
+
+def _append_chunks(api_key, block_id, chunks, done=0, on_ack=None):
+    """chunks[done:] を順に末尾へ追記する → 全件成功なら True。
+
+    同じ親への追記は順序を保つため直列。失敗したらそれ以降は追記しない。
+    on_ack(n) は n チャンク目までの追記が成功するたびに呼ばれる。
+    """
+    start = sum(len(c) for c in chunks[:done])
+    for i in range(done, len(chunks)):
+        chunk = chunks[i]
+        result = _notion_req("PATCH", f"/blocks/{block_id}/children", api_key, {
+            "children": chunk,
+        })
+        if result is None:
+            print(f"  Notion block append FAILED at chunk {i + 1}/{len(chunks)} "
+                  f"(blocks {start}-{start + len(chunk) - 1}); page is incomplete",
+                  file=sys.stderr)
+            return False
+        start += len(chunk)
+        if on_ack:
+            on_ack(i + 1)
+    return True
+
+
+def _append_blocks(api_key, block_id, blocks):
+    return _append_chunks(api_key, block_id, chunk_blocks(blocks))
+
+
+# ================================================================
+# Notion セクション分割（子ページの並列アップロード）
+# ================================================================
+
+def _split_markdown(body, prefix):
+    """prefix（"## " など）で始まる見出し行で分割 → [(見出し or None, 本文)]"""
+    parts = [(None, [])]
+    for line in body.split("\n"):
+        if line.startswith(prefix):
+            parts.append((strip_md_bold(line[len(prefix):].strip()), [line]))
+        else:
+            parts[-1][1].append(line)
+    return [
+        (heading, "\n".join(lines)) for heading, lines in parts
+        if heading is not None or any(l.strip() for l in lines)
+    ]
+
+
+def plan_sections(body):
+    """レポートを親ページ（サマリ）と子ページに分ける → (親ページの blocks, [(子ページ名, blocks)])
+
+    ## セクションを1子ページとし、SECTION_SPLIT_BLOCKS を超えるものは ### ごとに分ける
+    （## 見出しと導入部は親ページに残す）。小さいセクションは親ページに置く。
+    子ページ名は見出しとし、見出しブロック自体は子ページに含めない。
+    """
+    summary = []
+    sections = []
+    for heading, text in _split_markdown(body, "## "):
+        blocks = compact_blocks(markdown_to_blocks(text))
+        subs = _split_markdown(text, "### ")
+        if heading is None or len(blocks) <= SECTION_INLINE_BLOCKS:
+            summary.extend(blocks)
+        elif len(blocks) <= SECTION_SPLIT_BLOCKS or len(subs) < 2:
+            sections.append((heading, blocks[1:]))
+        else:
+            for sub_heading, sub_text in subs:
+                sub_blocks = compact_blocks(markdown_to_blocks(sub_text))
+                if sub_heading is None:
+                    summary.extend(sub_blocks)
+                else:
+                    sections.append((sub_heading, sub_blocks[1:]))
+    return summary, sections
+
+
+def create_notion_page_sections(api_key, database_id, title, body, page_title=None,
+                                workers=DEFAULT_NOTION_WORKERS):
+    """大きいセクションを子ページに分けて作成 → (親ページの URL, 全て作成できたか) を返す。
+
+    親ページ（小さいセクションをまとめたサマリ）を作成し、空の子ページを順に
+    作成してリンク順を確定させてから、各子ページの本文を並列に追記する。
+    子ページ内の追記は直列なので、所要時間は最大のセクションで決まる。
+    """
+    if page_title is None:
+        page_title = notion_page_title(datetime.now(JST))
+    summary, sections = plan_sections(body)
+    chunks = chunk_blocks(summary) or [[]]
 
-    first = blocks[:MAX_BLOCKS]
     result = _notion_req("POST", "/pages", api_key, {
         "parent": {"database_id": database_id},
         "properties": {
             "ページ名": {"title": [{"text": {"content": page_title}}]},
         },
-        "children": first,
+        "children": chunks[0],
     })
-
     if not result:
         print("  Notion page creation FAILED (see error above)", file=sys.stderr)
-        return ""
+        return "", False
+    parent_id = result["id"]
+    if not _append_chunks(api_key, parent_id, chunks, 1):
+        return result["url"], False
+
+    # 子ページは親ページ末尾に作成順で並ぶため、作成だけは直列に行う
+    jobs = []
+    complete = True
+    for name, blocks in sections:
+        child = _notion_req("POST", "/pages", api_key, {
+            "parent": {"page_id": parent_id},
+            "properties": {"title": {"title": [{"text": {"content": name}}]}},
+        })
+        if not child:
+            print(f"  Notion child page creation FAILED: {name}", file=sys.stderr)
+            complete = False
+            continue
+        jobs.append((child["id"], name, blocks))
 
-    page_id = result["id"]
-    page_url = result["url"]
+    def upload(job):
+        child_id, name, blocks = job
+        start = time.perf_counter()
+        ok = _append_blocks(api_key, child_id, blocks)
+        return name, len(blocks), time.perf_counter() - start, ok
 
-    # 残りブロックを追記
-    for s in range(MAX_BLOCKS, len(blocks), MAX_BLOCKS):
-        chunk = blocks[s : s + MAX_BLOCKS]
-        _notion_req("PATCH", f"/blocks/{page_id}/children", api_key, {
-            "children": chunk,
-        })
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, n_blocks, elapsed, ok in pool.map(upload, jobs):
+            status = "" if ok else " (FAILED)"
+            print(f"  子ページ「{name}」: {n_blocks} ブロック, {elapsed:.2f}s{status}")
+            complete = complete and ok
+    return result["url"], complete
 
-    return page_url
+
+# ================================================================
+# Notion 差分更新（既存ページのブロックとの内容ハッシュ比較）
+# ================================================================
+
+def _rich_text_canon(rich_text):
+    """rich_text を (文字列, 装飾) の列に正規化する。
+
+    送信形式と API の返却形式（plain_text や既定値の annotations を含む）の
+    どちらからでも同じ結果になるよう、空文字を除き、同じ装飾の連続は結合する。
+    """
+    out = []
+    for rt in rich_text or []:
+        text = rt.get("text") or {}
+        content = text.get("content", rt.get("plain_text", ""))
+        if not content:
+            continue
+        link = (text.get("link") or {}).get("url")
+        marks = sorted(k for k, v in (rt.get("annotations") or {}).items() if v is True)
+        if out and out[-1][1:] == [marks, link]:
+            out[-1][0] += content
+        else:
+            out.append([content, marks, link])
+    return out
+
+
+def block_fingerprint(block, children=None):
+    """ブロック内容の安定ハッシュ。子ブロック（children 引数または送信形式の
+    children。table なら行）も含める。"""
+    btype = block["type"]
+    body = block.get(btype) or {}
+    canon = {"type": btype}
+    if "rich_text" in body:
+        canon["text"] = _rich_text_canon(body["rich_text"])
+    if children is None:
+        children = body.get("children", [])
+    if btype == "table":
+        canon["table"] = [
+            body.get("table_width"), body.get("has_column_header"),
+            body.get("has_row_header"),
+            [[_rich_text_canon(c) for c in r["table_row"]["cells"]] for r in children],
+        ]
+    elif children:
+        canon["children"] = [block_fingerprint(c) for c in children]
+    data = json.dumps(canon, ensure_ascii=False, sort_keys=True).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_notion_page(api_key, database_id, page_title):
+    """DB 内でページ名が一致する（アーカイブされていない）ページを返す。"""
+    result = _notion_req("POST", f"/databases/{database_id}/query", api_key, {
+        "filter": {"property": "ページ名", "title": {"equals": page_title}},
+        "page_size": 1,
+    }, idempotent=True)  # 検索のみ（再送しても何も作らない）
+    if not result or not result.get("results"):
+        return None
+    return result["results"][0]
+
+
+def list_child_blocks(api_key, block_id):
+    """子ブロックを全件取得する（100件ずつページング）。失敗時は None。"""
+    blocks = []
+    cursor = None
+    while True:
+        query = f"?page_size={MAX_BLOCKS}" + (f"&start_cursor={cursor}" if cursor else "")
+        result = _notion_req("GET", f"/blocks/{block_id}/children{query}", api_key)
+        if result is None:
+            return None
+        blocks.extend(result.get("results", []))
+        if not result.get("has_more"):
+            return blocks
+        cursor = result.get("next_cursor")
+
+
+def _append_after(api_key, page_id, after, blocks):
+    """after の直後に blocks を順に挿入し、最後に挿入したブロックの id を返す。"""
+    for chunk in chunk_blocks(blocks):
+        payload = {"children": chunk}
+        if after:
+            payload["after"] = after
+        result = _notion_req("PATCH", f"/blocks/{page_id}/children", api_key, payload)
+        if not result or not result.get("results"):
+            return None
+        after = result["results"][-1]["id"]
+    return after
+
+
+def _updatable(old_blocks, new_blocks, opcode):
+    """replace 区間が同数・同種で子ブロックを持たず、PATCH による上書きで済むか。"""
+    _, i1, i2, j1, j2 = opcode
+    if i2 - i1 != j2 - j1:
+        return False
+    return all(
+        o["type"] == n["type"] and not o.get("has_children")
+        and "children" not in n[n["type"]]
+        for o, n in zip(old_blocks[i1:i2], new_blocks[j1:j2])
+    )
+
+
+def upsert_notion_page(api_key, database_id, title, blocks, mode):
+    """当日（当月）のページがあれば差分だけ反映し、なければ新規作成する → (URL, 全て反映できたか)。
+
+    既存ブロックと新ブロックを内容ハッシュで突き合わせ（difflib の編集列）、
+    同種ブロックの置き換えは PATCH /blocks/{id} で更新、それ以外は削除と
+    after 指定の挿入で反映する。先頭への挿入が必要な場合は全ブロックを入れ替える。
+    """
+    page_title = notion_page_title(datetime.now(JST), mode)
+    page = find_notion_page(api_key, database_id, page_title)
+    if page is None:
+        print(f"  Upsert: 「{page_title}」が見つからないため新規作成")
+        return create_notion_page(api_key, database_id, title, blocks, page_title)
+
+    page_id = page["id"]
+    sent_before = HTTP.sent
+    old_blocks = list_child_blocks(api_key, page_id)
+    if old_blocks is None:
+        print("  Upsert: 既存ブロックの取得に失敗", file=sys.stderr)
+        return "", False
+    old_hashes = []
+    for b in old_blocks:
+        children = None
+        if b.get("has_children"):
+            children = list_child_blocks(api_key, b["id"])
+            if children is None:
+                print("  Upsert: 既存の子ブロックの取得に失敗", file=sys.stderr)
+                return "", False
+        old_hashes.append(block_fingerprint(b, children))
+    new_hashes = [block_fingerprint(b) for b in blocks]
+
+    opcodes = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False).get_opcodes()
+    if opcodes and opcodes[0][0] in ("insert", "replace") and not (
+            opcodes[0][0] == "replace" and _updatable(old_blocks, blocks, opcodes[0])):
+        # 先頭に挿入する API がないため、全ブロックを入れ替える
+        opcodes = [("replace", 0, len(old_blocks), 0, len(blocks))]
+
+    counts = {"equal": 0, "update": 0, "delete": 0, "insert": 0}
+    after = None
+    ok = True
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            counts["equal"] += i2 - i1
+            after = old_blocks[i2 - 1]["id"]
+            continue
+        if tag == "replace" and _updatable(old_blocks, blocks, (tag, i1, i2, j1, j2)):
+            for old, new in zip(old_blocks[i1:i2], blocks[j1:j2]):
+                btype = new["type"]
+                if _notion_req("PATCH", f"/blocks/{old['id']}", api_key,
+                               {btype: new[btype]}) is None:
+                    ok = False
+                counts["update"] += 1
+            after = old_blocks[i2 - 1]["id"]
+            continue
+        for old in old_blocks[i1:i2]:
+            if _notion_req("DELETE", f"/blocks/{old['id']}", api_key) is None:
+                ok = False
+            counts["delete"] += 1
+        if j2 > j1:
+            last = _append_after(api_key, page_id, after, blocks[j1:j2])
+            if last is None:
+                print("  Upsert: ブロック挿入に失敗したため中断します", file=sys.stderr)
+                return page["url"], False
+            after = last
+            counts["insert"] += j2 - j1
+
+    print(
+        f"  Upsert: 「{page_title}」 変更なし {counts['equal']}, 更新 {counts['update']}, "
+        f"削除 {counts['delete']}, 追加 {counts['insert']} ブロック "
+        f"(API {HTTP.sent - sent_before}回)"
+    )
+    if not ok:
+        print("  Upsert: 一部ブロックの更新・削除に失敗しました", file=sys.stderr)
+    return page["url"], ok
 
 
 # ================================================================
@@ -656,37 +1197,102 @@ def build_slack_message(mention_users, now, progress, issues, notion_url,
 
 
 def send_slack_webhook(url, message):
-    data = json.dumps({"text": message}).encode()
-    req = Request(url, data=data, method="POST", headers={
-        "Content-Type": "application/json",
-    })
     try:
-        with urlopen(req):
-            print("  Slack webhook: sent")
-            return True
-    except (HTTPError, URLError) as e:
+        status, _ = HTTP.request(
+            "POST", url, json.dumps({"text": message}).encode(),
+            {"Content-Type": "application/json"}, label="slack webhook",
+        )
+    except HttpError as e:
         print(f"  Slack webhook error: {e}", file=sys.stderr)
         return False
+    if status >= 400:
+        print(f"  Slack webhook error: HTTP {status}", file=sys.stderr)
+        return False
+    print("  Slack webhook: sent")
+    return True
 
 
 def send_slack_api(token, channel, message):
-    data = json.dumps({"channel": channel, "text": message}).encode()
-    req = Request("https://slack.com/api/chat.postMessage", data=data, method="POST",
-                  headers={
-                      "Authorization": f"Bearer {token}",
-                      "Content-Type": "application/json",
-                  })
     try:
-        with urlopen(req) as resp:
-            result = json.loads(resp.read())
-            if result.get("ok"):
-                print("  Slack API: sent")
-                return True
-            print(f"  Slack API error: {result.get('error')}", file=sys.stderr)
-            return False
-    except (HTTPError, URLError) as e:
+        status, result = HTTP.request_json(
+            "POST", f"{SLACK_API}/chat.postMessage",
+            {"channel": channel, "text": message},
+            {"Authorization": f"Bearer {token}"}, label="slack chat.postMessage",
+        )
+    except HttpError as e:
         print(f"  Slack API error: {e}", file=sys.stderr)
         return False
+    if result and result.get("ok"):
+        print("  Slack API: sent")
+        return True
+    error = result.get("error") if result else f"HTTP {status}"
+    print(f"  Slack API error: {error}", file=sys.stderr)
+    return False
+
+
+# ================================================================
+# 配信先
+# ================================================================
+
+def load_destinations():
+    """配信先一覧 → (Notion 配信先, Slack 配信先)
+
+    PUBLISH_DESTINATIONS に JSON ファイルが指定されていればそれを使い、なければ
+    従来の環境変数から1件ずつ組み立てる。トークン類はファイルに書かず、
+    *_env に環境変数名を書く:
+
+      {"notion": [{"name": "team-a", "database_id": "...", "api_key_env": "NOTION_API_KEY"}],
+       "slack": [{"name": "team-a", "webhook_url_env": "SLACK_WEBHOOK_URL"},
+                 {"name": "leads", "channel": "C...", "token_env": "SLACK_BOT_TOKEN"}]}
+    """
+    path = os.environ.get("PUBLISH_DESTINATIONS", "")
+    if not path:
+        notion, slack = [], []
+        notion_key = os.environ.get("NOTION_API_KEY", "")
+        if notion_key:
+            notion.append({
+                "name": "default", "api_key": notion_key,
+                "database_id": os.environ.get("NOTION_DATABASE_ID", DEFAULT_DB_ID),
+            })
+        slack_webhook = os.environ.get("SLACK_WEBHOOK_URL", "")
+        slack_token = os.environ.get("SLACK_BOT_TOKEN", "")
+        if slack_webhook:
+            slack.append({"name": "webhook", "webhook_url": slack_webhook})
+        elif slack_token:
+            slack.append({
+                "name": "api", "token": slack_token,
+                "channel": os.environ.get("SLACK_CHANNEL", DEFAULT_CHANNEL),
+            })
+        return notion, slack
+
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    notion = []
+    for i, d in enumerate(config.get("notion", []), 1):
+        name = d.get("name", f"notion{i}")
+        env = d.get("api_key_env", "NOTION_API_KEY")
+        if not os.environ.get(env):
+            print(f"Notion {name}: skipped ({env} not set)")
+            continue
+        notion.append({
+            "name": name, "api_key": os.environ[env],
+            "database_id": d.get("database_id", DEFAULT_DB_ID),
+        })
+    slack = []
+    for i, d in enumerate(config.get("slack", []), 1):
+        name = d.get("name", f"slack{i}")
+        env = d.get("webhook_url_env") or d.get("token_env", "SLACK_BOT_TOKEN")
+        if not os.environ.get(env):
+            print(f"Slack {name}: skipped ({env} not set)")
+            continue
+        if "webhook_url_env" in d:
+            slack.append({"name": name, "webhook_url": os.environ[env]})
+        else:
+            slack.append({
+                "name": name, "token": os.environ[env],
+                "channel": d.get("channel", DEFAULT_CHANNEL),
+            })
+    return notion, slack
 
 
 # ================================================================
@@ -694,15 +1300,14 @@ def send_slack_api(token, channel, message):
 # ================================================================
 
 def main():
-    notion_key = os.environ.get("NOTION_API_KEY", "")
-    notion_db = os.environ.get("NOTION_DATABASE_ID", DEFAULT_DB_ID)
-    slack_webhook = os.environ.get("SLACK_WEBHOOK_URL", "")
-    slack_token = os.environ.get("SLACK_BOT_TOKEN", "")
-    slack_channel = os.environ.get("SLACK_CHANNEL", DEFAULT_CHANNEL)
+    notion_mode = os.environ.get("NOTION_PAGE_MODE", "new")
+    notion_layout = os.environ.get("NOTION_LAYOUT", "flat")
+    notion_workers = int(os.environ.get("NOTION_WORKERS", DEFAULT_NOTION_WORKERS))
     mention_env = os.environ.get("SLACK_MENTION_USERS", "")
     mention_users = mention_env.split(",") if mention_env else DEFAULT_MENTIONS
 
-    if not notion_key and not slack_webhook and not slack_token:
+    notion_dests, slack_dests = load_destinations()
+    if not notion_dests and not slack_dests:
         print("No credentials set. Skipping publish.")
         return
 
@@ -711,27 +1316,68 @@ def main():
         print("No report found in reports/. Skipping.")
         return
 
+    perf = PerfRecorder("publish_report")
     print(f"Report: {report_path}")
-    title, body = read_report(report_path)
+    with perf.stage("read_report"):
+        title, body = read_report(report_path)
+
+    # 配信先ごとの処理は並行に実行し、結果は (種別, 名前, 状態, 秒, URL) で集める。
+    # 状態は OK / PARTIAL（ページはできたが本文の追記・更新が途中で失敗）/ FAILED
+    pool = ThreadPoolExecutor(max_workers=max(1, len(notion_dests) + len(slack_dests)))
+
+    def publish_notion(dest):
+        checkpoint = checkpoint_path(report_path, dest["name"])
+        url, complete = "", False
+        with perf.stage(f"notion:{dest['name']}", rows=len(blocks)) as rec:
+            try:
+                if notion_mode in ("day", "month"):
+                    url, complete = upsert_notion_page(
+                        dest["api_key"], dest["database_id"], title, blocks, notion_mode)
+                elif notion_layout == "sections":
+                    url, complete = create_notion_page_sections(
+                        dest["api_key"], dest["database_id"], title, body,
+                        workers=notion_workers)
+                else:
+                    url, complete = create_notion_page(
+                        dest["api_key"], dest["database_id"], title, blocks,
+                        checkpoint=checkpoint)
+            except Exception as e:
+                print(f"  Notion {dest['name']} error: {e}", file=sys.stderr)
+        status = "OK" if url and complete else "PARTIAL" if url else "FAILED"
+        return "notion", dest["name"], status, rec["wall_s"], url
+
+    def publish_slack(dest, message):
+        ok = False
+        with perf.stage(f"slack:{dest['name']}") as rec:
+            try:
+                if "webhook_url" in dest:
+                    ok = send_slack_webhook(dest["webhook_url"], message)
+                else:
+                    ok = send_slack_api(dest["token"], dest["channel"], message)
+            except Exception as e:
+                print(f"  Slack {dest['name']} error: {e}", file=sys.stderr)
+        return "slack", dest["name"], "OK" if ok else "FAILED", rec["wall_s"], ""
 
     # --- Notion ---
-    notion_url = ""
-    if notion_key:
-        print("Publishing to Notion...")
-        blocks = markdown_to_blocks(body)
-        print(f"  Blocks: {len(blocks)}")
-        notion_url = create_notion_page(notion_key, notion_db, title, blocks)
-        if notion_url:
-            print(f"  URL: {notion_url}")
-        else:
-            print("  WARNING: Notion page creation failed, URL will not be in Slack message")
+    notion_futures = []
+    if notion_dests:
+        print(f"Publishing to Notion ({len(notion_dests)} destinations)...")
+        with perf.stage("markdown_to_blocks") as st:
+            raw = markdown_to_blocks(body)
+            blocks = compact_blocks(raw)
+            st["rows"] = len(blocks)
+        print(
+            f"  Blocks: {len(raw)} → {len(blocks)} (ネスト含む {sum(map(block_count, blocks))}), "
+            f"リクエスト {len(chunk_blocks(raw))} → {len(chunk_blocks(blocks))}"
+        )
+        notion_futures = [pool.submit(publish_notion, d) for d in notion_dests]
     else:
         print("Notion: skipped (NOTION_API_KEY not set)")
 
     # --- Slack ---
     now = datetime.now(JST)
 
-    # Try structured format from computed tables
+    # Try structured format from computed tables（Notion 送信と並行して読む）
     computed_dir = Path("data/computed")
     progress = None
     issues = None
@@ -739,20 +1385,34 @@ def main():
     period_end = ""
     if computed_dir.exists():
         try:
-            progress = extract_achievement_progress(computed_dir)
-            issues = extract_critical_issues(computed_dir)
+            with perf.stage("extract_computed"):
+                progress = extract_achievement_progress(computed_dir)
+                issues = extract_critical_issues(computed_dir)
         except Exception as e:
             print(f"  Warning: computed table parse failed: {e}", file=sys.stderr)
-        # Extract period from any computed table's frontmatter
+        # Extract period from _results.json or any computed table's frontmatter
         try:
             fm_file = computed_dir / "step2_ファネル転換率.md"
-            if fm_file.exists():
+            meta = load_results(computed_dir)
+            if meta is None and fm_file.exists():
                 meta = parse_frontmatter(fm_file)
+            if meta:
                 period_start = meta.get("period_start", "")
                 period_end = meta.get("period_end", "")
         except Exception:
             pass
 
+    # Slack に載せる URL は先頭の Notion 配信先のもの（他の配信先の完了は待たない）
+    notion_url = ""
+    if notion_futures:
+        _, _, status, _, notion_url = notion_futures[0].result()
+        if notion_url:
+            print(f"  URL: {notion_url}")
+            if status != "OK":
+                print("  WARNING: Notion page is incomplete (see errors above)")
+        else:
+            print("  WARNING: Notion page creation failed, URL will not be in Slack message")
+
     # Fallback to executive summary if computed tables unavailable
     summary_fallback = extract_executive_summary(body) if not progress else None
     message = build_slack_message(
@@ -761,15 +1421,26 @@ def main():
         period_start=period_start, period_end=period_end,
     )
 
-    if slack_webhook:
-        print("Sending Slack notification (webhook)...")
-        send_slack_webhook(slack_webhook, message)
-    elif slack_token:
-        print("Sending Slack notification (bot API)...")
-        send_slack_api(slack_token, slack_channel, message)
+    slack_futures = []
+    if slack_dests:
+        print(f"Sending Slack notification ({len(slack_dests)} destinations)...")
+        slack_futures = [pool.submit(publish_slack, d, message) for d in slack_dests]
     else:
         print("Slack: skipped (no credentials)")
 
+    print("配信結果:")
+    for future in notion_futures + slack_futures:
+        kind, name, status, elapsed, url = future.result()
+        print(f"  {kind}:{name} {status} {elapsed:.2f}s {url}".rstrip())
+    pool.shutdown()
+
+    for line in HTTP.summary_lines():
+        print(line)
+    HTTP.close()
+    print(perf.summary())
+    if computed_dir.exists():
+        # compute_tables.py の計測結果と同じファイルに並べて保存する
+        perf.save(computed_dir, merge=True)
     print("Done.")
 
 
@@ -0,0 +1,42 @@
+"""
+compute_tables.py と publish_report.py が共有する表示形式と _results.json の定数
+（標準ライブラリのみ）
+
+publish_report.py が集計・ストレージ一式（compute_tables.py）を読み込まずに
+済むよう、数値の書式と結果ファイルの名前・バージョンだけをここに置く。
+"""
+
+# 前月比の悪化警告（pp）。compute_tables.py の判定と fmt_pp の 📉 で共有する
+PP_WORSEN = -5.0
+
+# publish_report.py 向けの構造化結果（Markdown と同じ計算結果の数値・フラグ）
+RESULTS_FILENAME = "_results.json"
+RESULTS_VERSION = 1
+
+
+def fmt_pct(val, dec=1):
+    if val is None:
+        return "-"
+    return f"{val * 100:.{dec}f}%"
+
+
+def fmt_pp(val, warn_threshold=PP_WORSEN):
+    if val is None:
+        return "N/A"
+    sign = "+" if val >= 0 else ""
+    mark = "📉" if val <= warn_threshold else ""
+    return f"{sign}{val:.1f}pp{mark}"
+
+
+def fmt_count_diff(cur, prev):
+    if prev is None or prev == 0:
+        return "N/A"
+    diff_pct = (cur - prev) / prev * 100
+    sign = "+" if diff_pct >= 0 else ""
+    return f"{sign}{diff_pct:.1f}%"
+
+
+def fmt_int(val):
+    if val is None:
+        return "-"
+    return f"{val:,}"
@@ -0,0 +1,254 @@
+"""
+日次スナップショットの重複排除ストア（data/_store/、標準ライブラリのみ）
+
+日次CSVは毎回全履歴を出力し直すため、前日と大半の行が同じになる。ストアは
+エンティティ（Q4 はリードID、Q5/Q6 は行キー）ごとに最初の版を1つだけ持ち、
+以降の日付は前日からの差分だけを保存する。
+  - 追加: 新しいエンティティの全カラム
+  - 変更: カラムごとに (エンティティ番号, 新しい値) の組
+  - 削除: エンティティ番号
+  - 行順: 前日の並びからのコピー区間と挿入分（difflib の opcodes）
+index.json の変更件数は内容の変更だけを数える。カラムの全変更が表記の違い
+（日付の "YYYY-MM-DD" と "YYYY-MM-DDT00:00:00.000Z" など）なら format_columns に分ける。
+同じキーの行が複数ある場合は出現順の番号をキーに含めて区別する。
+キーカラムがヘッダにない日は行全体をキーにする（差分は追加/削除のみになる）。
+
+ファイル構成: data/_store/{q1..q6}/index.json（日付ごとの行数・変更件数）
+              data/_store/{q1..q6}/{YYYY-MM-DD}.delta（zlib 圧縮 JSON）
+作成は scripts/ingest.py store、変更件数は compute_tables.py の検証でも参照する。
+"""
+
+import json
+import os
+import re
+import zlib
+from difflib import SequenceMatcher
+from pathlib import Path
+
+STORE_DIR = "_store"
+STORE_VERSION = 1
+DELTA_SUFFIX = ".delta"
+
+_MISSING = object()
+
+# 日付カラムの出力形式の揺れ（"2026-02-01" と "2026-02-01T00:00:00.000Z"）
+_MIDNIGHT = re.compile(r"(\d{4}-\d{2}-\d{2})[T ]00:00:00(?:\.0+)?Z?")
+
+
+def _canonical(value):
+    """表記だけの違いを除いた値（形式変更の判定用。保存する値には使わない）。"""
+    if isinstance(value, str):
+        m = _MIDNIGHT.fullmatch(value)
+        if m:
+            return m.group(1)
+    return value
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class _State:
+    """ある日付時点の全エンティティ（リプレイ・差分計算用）。"""
+
+    def __init__(self):
+        self.header = []
+        self.keys = []       # エンティティ番号 → キー（削除済みは None）
+        self.values = []     # エンティティ番号 → {カラム: 値}
+        self.ids = {}        # キー → エンティティ番号
+        self.order = []      # 当日の行順（エンティティ番号の列）
+
+    def apply(self, delta):
+        for eid in delta["removed"]:
+            del self.ids[self.keys[eid]]
+            self.keys[eid] = None
+            self.values[eid] = None
+        header = delta["header"]
+        for key, row in zip(delta["added"]["keys"], delta["added"]["rows"]):
+            key = tuple(key)
+            self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.values.append(dict(zip(header, row)))
+        for col, (eids, vals) in delta["changed"].items():
+            for eid, v in zip(eids, vals):
+                self.values[eid][col] = v
+        order = []
+        for op in delta["order"]:
+            if op[0] == "=":
+                order.extend(self.order[op[1]:op[2]])
+            else:
+                order.extend(op[1])
+        self.header = header
+        self.order = order
+
+    def rows(self):
+        header = self.header
+        values = self.values
+        return [[values[eid].get(c) for c in header] for eid in self.order]
+
+
+def entity_keys(header, rows, key_columns):
+    """行ごとのエンティティキー（キーカラムの値 + 同一キー内の出現番号）。"""
+    pos = {name: i for i, name in enumerate(header)}
+    idx = [pos[c] for c in key_columns] if all(c in pos for c in key_columns) else None
+    seen = {}
+    keys = []
+    for row in rows:
+        base = tuple(row[i] for i in idx) if idx else tuple(row)
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append(base + (n,))
+    return keys, idx is not None
+
+
+class SnapshotStore:
+    """クエリ（q1-q6）ごとの差分ストア。"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    # ---- インデックス ----
+
+    def _dir(self, qid):
+        return self.root / qid
+
+    def index(self, qid):
+        try:
+            with open(self._dir(qid) / "index.json", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return index if index.get("version") == STORE_VERSION else None
+
+    def dates(self, qid):
+        index = self.index(qid)
+        return [d["date"] for d in index["days"]] if index else []
+
+    def day_info(self, qid, date_str):
+        """date_str の行数・前日からの変更件数（ストアになければ None）。"""
+        index = self.index(qid)
+        for day in (index or {}).get("days", []):
+            if day["date"] == date_str:
+                return day
+        return None
+
+    # ---- 読み込み ----
+
+    def _load_delta(self, qid, date_str):
+        with open(self._dir(qid) / f"{date_str}{DELTA_SUFFIX}", "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def _replay(self, qid, until=None):
+        state = _State()
+        for date_str in self.dates(qid):
+            if until is not None and date_str > until:
+                break
+            state.apply(self._load_delta(qid, date_str))
+        return state
+
+    def view(self, qid, date_str):
+        """date_str 時点の (ヘッダ, 行リスト) を復元する（不足セルは None）。"""
+        if date_str not in self.dates(qid):
+            raise KeyError(f"{qid} {date_str} is not in the store")
+        state = self._replay(qid, date_str)
+        return state.header, state.rows()
+
+    # ---- 書き込み ----
+
+    def append(self, qid, date_str, header, rows, key_columns, source=None):
+        """date_str のスナップショットを前日分との差分として追加する。
+
+        rows は header と同じ並びの値リスト。既存の最終日付以前は追加できない
+        （作り直す場合は clear してから古い順に追加する）。戻り値は日付の情報。
+        """
+        index = self.index(qid) or {"version": STORE_VERSION, "query": qid, "days": []}
+        if index["days"] and date_str <= index["days"][-1]["date"]:
+            raise ValueError(
+                f"{qid}: {date_str} is not after {index['days'][-1]['date']}"
+            )
+        prev = self._replay(qid)
+
+        width = len(header)
+        rows = [
+            row[:width] if len(row) >= width else list(row) + [None] * (width - len(row))
+            for row in rows if row
+        ]
+        keys, keyed = entity_keys(header, rows, key_columns)
+
+        cur_ids = []
+        added_keys, added_rows = [], []
+        changed = {}
+        next_id = len(prev.keys)
+        for key, row in zip(keys, rows):
+            eid = prev.ids.get(key)
+            if eid is None:
+                eid = next_id + len(added_keys)
+                added_keys.append(key)
+                added_rows.append(row)
+            else:
+                old = prev.values[eid]
+                for col, v in zip(header, row):
+                    if old.get(col, _MISSING) != v:
+                        eids, vals = changed.setdefault(col, ([], []))
+                        eids.append(eid)
+                        vals.append(v)
+            cur_ids.append(eid)
+        cur_set = set(cur_ids)
+        removed = [eid for eid in prev.ids.values() if eid not in cur_set]
+
+        order = []
+        matcher = SequenceMatcher(None, prev.order, cur_ids, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                order.append(["=", i1, i2])
+            elif j2 > j1:
+                order.append(["+", cur_ids[j1:j2]])
+
+        delta = {
+            "date": date_str, "header": list(header), "key_columns": list(key_columns),
+            "removed": sorted(removed),
+            "added": {"keys": added_keys, "rows": added_rows},
+            "changed": changed, "order": order,
+        }
+        data = zlib.compress(json.dumps(delta, ensure_ascii=False).encode("utf-8"), 9)
+        qdir = self._dir(qid)
+        qdir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(qdir / f"{date_str}{DELTA_SUFFIX}", data)
+
+        # 全変更が表記だけの違い（エクスポート形式の変更）のカラムは内容の変更に数えない
+        format_columns = {
+            col: len(eids) for col, (eids, vals) in changed.items()
+            if all(_canonical(prev.values[e].get(col)) == _canonical(v)
+                   for e, v in zip(eids, vals))
+        }
+        changed_entities = {
+            eid for col, (eids, _) in changed.items() if col not in format_columns
+            for eid in eids
+        }
+        info = {
+            "date": date_str,
+            "prev_date": index["days"][-1]["date"] if index["days"] else None,
+            "rows": len(rows), "entities": len(cur_set),
+            "keyed": keyed, "header_changed": bool(index["days"]) and header != prev.header,
+            "added": len(added_keys), "changed": len(changed_entities),
+            "removed": len(removed),
+            "changed_columns": {
+                c: len(e) for c, (e, _) in sorted(changed.items()) if c not in format_columns
+            },
+            "format_columns": dict(sorted(format_columns.items())),
+            "bytes": len(data), "source": source,
+        }
+        index["days"].append(info)
+        _write_atomic(qdir / "index.json",
+                      json.dumps(index, ensure_ascii=False, indent=2).encode("utf-8"))
+        return info
+
+    def clear(self, qid):
+        qdir = self._dir(qid)
+        if qdir.exists():
+            for f in qdir.iterdir():
+                if f.suffix in (DELTA_SUFFIX, ".json"):
+                    f.unlink()
@@ -0,0 +1,8 @@
+"""scripts/ と benchmarks/（合成データ生成）のモジュールをそのまま import できるようにする。"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
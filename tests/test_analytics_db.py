@@ -0,0 +1,33 @@
+"""SQLite 分析ストアの集計が compute_tables.py と一致することの確認（ingest.py sqlite --check）。"""
+
+import analytics_db
+from compute_tables import backfill_dates
+from generate_data import generate
+from ingest import archive_snapshot, check_sqlite, sqlite_snapshot
+
+DATES = ["2026-02-26", "2026-02-27"]
+
+
+def test_sql_aggregates_match_cubes(tmp_path):
+    data_dir = tmp_path / "data"
+    for seed, date_str in enumerate(DATES):
+        generate(data_dir, date_str, 2000, n_reps=6, cv_contents=20, months=3, seed=seed)
+    conn = analytics_db.connect(tmp_path / "analytics.sqlite")
+    for date_str in DATES:
+        sqlite_snapshot(conn, data_dir, date_str)
+    # 日付ごとのスナップショットを取り違えずに照合できること
+    assert all([check_sqlite(conn, data_dir, date_str) for date_str in DATES])
+
+
+def test_check_and_backfill_after_prune_csv(tmp_path):
+    data_dir = tmp_path / "data"
+    for seed, date_str in enumerate(DATES):
+        generate(data_dir, date_str, 2000, n_reps=6, cv_contents=20, months=3, seed=seed)
+    conn = analytics_db.connect(tmp_path / "analytics.sqlite")
+    for date_str in DATES:
+        sqlite_snapshot(conn, data_dir, date_str)
+        archive_snapshot(data_dir, date_str, "zlib", True)
+    assert not list(data_dir.rglob("*.csv"))
+    # CSV を削除した日付もアーカイブから列挙・照合されること
+    assert backfill_dates(data_dir, DATES[0], DATES[-1]) == DATES
+    assert all([check_sqlite(conn, data_dir, date_str) for date_str in DATES])
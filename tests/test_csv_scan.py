@@ -0,0 +1,121 @@
+"""csv_scan の値が csv モジュール（csv.reader / csv.DictReader）と一致することの確認。"""
+
+import csv
+import random
+
+import pytest
+
+import csv_scan
+from csv_scan import scan_csv
+
+CASES = [
+    'a,b,c\n1,2,3\n',
+    'a,b,c\n1,"x,y",3\n4,5,6\n',
+    'a,b,c\n1,"x\ny",3\n4,5,6\n',
+    'a,b,c\n1,"x""q""",3\n4,5\n7,8,9,10\n\n\n11,12,13',
+    'a,b,c\n1,ab"c,3\n4,5,6\n',
+    'a,b,c\n1,"ab"c,3\n4,5,6\n',
+    'a,b,c\n1,"",3\n"",,\n',
+    'a,b,c\n1,"\n\n",3\n4,5,6\n',
+    'a,"b,x",c\n1,2,3\n',
+    'a\n1\n\n2\n',
+    'a,b\n',
+    '',
+    '﻿a,b\n1,2\n',
+    'a,b,c\r\n1,2,3\r\n',
+    'a,b,c\n1,a"b,"c\nx",3\n4,5,6\n',
+    'a,b,c\n1,"x,y\nz",3\n"p""q",5,6\n',
+]
+
+
+def reference(path, columns=None, missing=""):
+    """csv.reader（newline=""）で読んだ (ヘッダ, 行数, 列ごとの値)。"""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        pos = {name: i for i, name in enumerate(header)}
+        idx = list(range(len(header))) if columns is None else [pos.get(c) for c in columns]
+        values = [[] for _ in idx]
+        total = 0
+        for raw in reader:
+            if not raw:
+                continue
+            total += 1
+            for col, i in zip(values, idx):
+                col.append(raw[i] if i is not None and i < len(raw) else missing)
+    return header, total, values
+
+
+def scanned(path, columns=None):
+    scan = scan_csv(path, columns)
+    return scan.header, scan.total, scan.values
+
+
+@pytest.fixture(params=[csv_scan.CHUNK_BYTES, 7], ids=["64KB", "7B"])
+def chunk_bytes(request, monkeypatch):
+    """既定のチャンクと、ほぼ1行ごとにチャンクが切れる小さいチャンクの両方で試す。"""
+    monkeypatch.setattr(csv_scan, "CHUNK_BYTES", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("text", CASES)
+@pytest.mark.parametrize("columns", [None, ["c", "zz", "a"], []])
+def test_matches_csv_reader(tmp_path, chunk_bytes, text, columns):
+    path = tmp_path / "case.csv"
+    path.write_text(text, encoding="utf-8", newline="")
+    assert scanned(path, columns) == reference(path, columns)
+
+
+def test_random_rows_match_csv_reader(tmp_path, chunk_bytes):
+    rnd = random.Random(1)
+    alphabet = ["a", "b", "あ", ",", '"', "\n", '""', "x y", ""]
+    path = tmp_path / "fuzz.csv"
+    for _ in range(200):
+        rows = [
+            ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 3)))
+             for _ in range(rnd.choice([2, 3, 3, 3, 4]))]
+            for _ in range(rnd.randint(0, 8))
+        ]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n",
+                                quoting=rnd.choice([csv.QUOTE_MINIMAL, csv.QUOTE_ALL]))
+            writer.writerow(["h1", "h2", "h3"])
+            writer.writerows(rows)
+        assert scanned(path) == reference(path)
+
+
+def test_random_text_matches_csv_reader(tmp_path, chunk_bytes):
+    """引用符・カンマ・改行を無作為に並べた（不正な引用を含む）テキスト。"""
+    rnd = random.Random(2)
+    path = tmp_path / "fuzz.csv"
+    for _ in range(300):
+        text = "h1,h2,h3\n" + "".join(
+            rnd.choice(["a", ",", '"', "\n", "x", '""']) for _ in range(rnd.randint(0, 40))
+        )
+        path.write_text(text, encoding="utf-8", newline="")
+        try:
+            expected = reference(path)
+        except csv.Error:
+            with pytest.raises(csv.Error):
+                scan_csv(path)
+            continue
+        assert scanned(path) == expected
+
+
+def test_rows_match_dict_reader(tmp_path, chunk_bytes):
+    """列数の揃ったファイルは csv.DictReader の行と同じ dict になる（load_csv_file の前提）。"""
+    rnd = random.Random(3)
+    header = ["id", "name", "memo", "month"]
+    path = tmp_path / "export.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        for i in range(2000):
+            memo = rnd.choice(["", "通常", 'say "hi"', "a,b", "line1\nline2"])
+            writer.writerow([f"L{i:05d}", rnd.choice(["山田", "Smith", ""]), memo,
+                             rnd.choice(["2026-01-01", "2026-02-01"])])
+    scan = scan_csv(path)
+    rows = [dict(zip(scan.header, values)) for values in zip(*scan.values)]
+    with open(path, encoding="utf-8", newline="") as f:
+        assert rows == list(csv.DictReader(f))
+    assert scan.total == 2000
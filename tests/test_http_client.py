@@ -0,0 +1,82 @@
+"""HttpClient の再試行方針（冪等でないリクエストを再送しない）の確認。"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import HttpClient, HttpError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """パスの数字をステータスとして返す。429 は2回目以降 200 にする。"""
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self.server.hits += 1
+        status = int(self.path.strip("/"))
+        if status == 429 and self.server.hits > 1:
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def send(server, method, status, idempotent=None):
+    """→ (結果, サーバーが受けた回数)。結果は応答ステータスか ("error", status)。"""
+    server.hits = 0
+    client = HttpClient(max_retries=3, backoff_base=0.001)
+    url = f"http://127.0.0.1:{server.server_port}/{status}"
+    try:
+        result = client.request(method, url, b"{}", idempotent=idempotent)[0]
+    except HttpError as e:
+        result = ("error", e.status)
+    finally:
+        client.close()
+    return result, server.hits
+
+
+@pytest.mark.parametrize("method", ["POST", "PATCH"])
+def test_non_idempotent_5xx_is_not_resent(server, method):
+    assert send(server, method, 502) == (("error", 502), 1)
+
+
+@pytest.mark.parametrize("method", ["GET", "DELETE"])
+def test_idempotent_5xx_is_retried(server, method):
+    assert send(server, method, 503) == (("error", 503), 4)
+
+
+def test_non_idempotent_429_is_retried(server):
+    assert send(server, "POST", 429) == (200, 2)
+
+
+def test_idempotent_flag_allows_retrying_post(server):
+    assert send(server, "POST", 502, idempotent=True) == (("error", 502), 4)
+
+
+def test_connection_refused_is_retried_for_post():
+    """送信前の接続エラー（サーバーに届いていない）は POST でも再試行する。"""
+    client = HttpClient(max_retries=2, backoff_base=0.001)
+    with ThreadingHTTPServer(("127.0.0.1", 0), _Handler) as httpd:
+        port = httpd.server_port  # 閉じたポート
+    with pytest.raises(HttpError):
+        client.request("POST", f"http://127.0.0.1:{port}/200", b"{}")
+    assert client.sent == 3
@@ -0,0 +1,121 @@
+"""Q4 キューブの差分更新（--incremental）が全件再計算と一致することの確認。"""
+
+import random
+from datetime import date
+
+import pytest
+
+from compute_tables import (
+    Q4Columns, Q4_REQUIRED, build_funnel_cubes, cube_mismatches, lead_facts,
+    load_prev_cube_state, load_q4_window, prev_month_str, save_cube_state,
+    update_funnel_cubes,
+)
+from generate_data import generate_leads, rep_names, write_csv
+
+DAY1 = "2026-02-26"
+DAY2 = "2026-02-27"
+DAY3 = "2026-02-28"
+
+
+@pytest.fixture
+def leads():
+    return generate_leads(random.Random(0), date(2026, 2, 26), 3000, rep_names(8), 30, 3)
+
+
+def mutate(rows, seed):
+    """翌日のエクスポート: フラグ・担当者・チャネルの変更、行の削除、新規リード。"""
+    rng = random.Random(seed)
+    out = []
+    for row in rows:
+        row = dict(row)
+        p = rng.random()
+        if p < 0.03:
+            continue  # 削除
+        if p < 0.06:
+            row["is_connect"] = "1"
+            row["is_sal"] = "1" if row["is_sal"] == "0" else "0"
+        elif p < 0.08:
+            row["user_name"] = "担当 変更"
+        elif p < 0.10:
+            row["inflow_route_media"] = "LIS" if row["inflow_route_media"] != "LIS" else "DIS"
+        elif p < 0.11:
+            row["reasons_for_ineligible_leads"] = "重複"  # eligible から外れる
+        elif p < 0.12:
+            row["cv_content_sub__c"] = "デモ電話_新CV"
+        out.append(row)
+    added = generate_leads(rng, date(2026, 2, 27), 150, rep_names(8), 30, 1)
+    for i, row in enumerate(added):
+        row["id"] = f"00QNEW{seed:04d}{i:08d}"
+    return added + out
+
+
+def load(tmp_path, date_str, rows):
+    path = tmp_path / f"デモ電話-{date_str}.csv"
+    write_csv(path, Q4_REQUIRED, rows)
+    snap, current = load_q4_window(path)
+    return snap, [current, prev_month_str(current)]
+
+
+def full_build(snap, months, lead_codes=None):
+    cols = Q4Columns.from_rows(snap.rows, months, lead_codes)
+    return cols, build_funnel_cubes(cols)
+
+
+def save_state(cache_dir, date_str, months, cols, cubes):
+    save_cube_state(cache_dir, date_str, months, cols.lead_codes, lead_facts(cols)[0], cubes)
+
+
+def incremental(cache_dir, date_str, snap, months):
+    """prepare_date の --incremental と同じ手順 → (キューブ, 全件再計算のキューブ, delta, 列)。"""
+    state = load_prev_cube_state(cache_dir, date_str, months)
+    assert state is not None
+    cols = Q4Columns.from_rows(snap.rows, months, state["lead_codes"])
+    cubes, lead_rows, delta = update_funnel_cubes(state, cols)
+    _, full = full_build(snap, months, dict(cols.lead_codes))
+    return cubes, full, delta, cols, lead_rows
+
+
+def test_incremental_matches_full_rebuild(tmp_path, leads):
+    snap1, months = load(tmp_path, DAY1, leads)
+    cols1, cubes1 = full_build(snap1, months)
+    save_state(tmp_path, DAY1, months, cols1, cubes1)
+
+    snap2, months2 = load(tmp_path, DAY2, mutate(leads, 1))
+    assert months2 == months
+    cubes, full, delta, _, _ = incremental(tmp_path, DAY2, snap2, months)
+    assert delta["added"] and delta["changed"] and delta["removed"]
+    assert cube_mismatches(cubes, full) == []
+
+
+def test_incremental_chains_across_days(tmp_path, leads):
+    """差分更新した状態を保存し、翌日もそこから差分更新する。"""
+    snap, months = load(tmp_path, DAY1, leads)
+    cols, cubes = full_build(snap, months)
+    save_state(tmp_path, DAY1, months, cols, cubes)
+
+    rows = leads
+    for seed, date_str in enumerate([DAY2, DAY3], start=1):
+        rows = mutate(rows, seed)
+        snap, _ = load(tmp_path, date_str, rows)
+        cubes, full, _, cols, lead_rows = incremental(tmp_path, date_str, snap, months)
+        assert cube_mismatches(cubes, full) == []
+        save_cube_state(tmp_path, date_str, months, cols.lead_codes, lead_rows, cubes)
+
+
+def test_unchanged_day_has_empty_delta(tmp_path, leads):
+    snap, months = load(tmp_path, DAY1, leads)
+    cols, cubes = full_build(snap, months)
+    save_state(tmp_path, DAY1, months, cols, cubes)
+
+    cubes, full, delta, _, _ = incremental(tmp_path, DAY2, snap, months)
+    assert delta == {"added": 0, "changed": 0, "removed": 0}
+    assert cube_mismatches(cubes, full) == []
+
+
+def test_state_for_other_months_is_not_used(tmp_path, leads):
+    snap, months = load(tmp_path, DAY1, leads)
+    cols, cubes = full_build(snap, months)
+    save_state(tmp_path, DAY1, months, cols, cubes)
+
+    assert load_prev_cube_state(tmp_path, "2026-03-02", ["2026-03", "2026-02"]) is None
+    assert load_prev_cube_state(tmp_path, "2026-02-25", months) is None  # それ以前の状態なし
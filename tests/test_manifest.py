@@ -0,0 +1,52 @@
+"""マニフェストを使ったファイル探索が、記録後に増えた日付フォルダを見落とさないことの確認。"""
+
+from compute_tables import CSV_PREFIXES, find_prev_month_csv
+from manifest import DataManifest
+
+PREFIX = CSV_PREFIXES["q1"]
+
+
+def add_day(data_dir, date_str):
+    folder = data_dir / date_str
+    folder.mkdir(parents=True)
+    path = folder / f"{PREFIX}-{date_str}.csv"
+    path.write_text("lead_date,dimension\n2026-01-05,LIS\n", encoding="utf-8")
+    return path
+
+
+def record(data_dir, *dates):
+    manifest = DataManifest(data_dir)
+    for date_str in dates:
+        manifest.record("q1", date_str, data_dir / date_str / f"{PREFIX}-{date_str}.csv")
+    manifest.save()
+
+
+def test_uses_manifest_record(tmp_path):
+    add_day(tmp_path, "2026-01-10")
+    latest = add_day(tmp_path, "2026-01-30")
+    record(tmp_path, "2026-01-10", "2026-01-30")
+    assert DataManifest.load(tmp_path).latest_in_month("q1", "2026-01") == ("2026-01-30", latest)
+    assert find_prev_month_csv(tmp_path, "q1", "2026-02-05") == latest
+
+
+def test_newer_folder_than_manifest_is_found(tmp_path):
+    add_day(tmp_path, "2026-01-10")
+    record(tmp_path, "2026-01-10")
+    newer = add_day(tmp_path, "2026-01-20")  # ingest.py を実行せずに取得した日付
+    assert find_prev_month_csv(tmp_path, "q1", "2026-02-05") == newer
+
+
+def test_month_without_record_falls_back_to_scan(tmp_path):
+    add_day(tmp_path, "2026-01-10")
+    record(tmp_path, "2026-01-10")
+    december = add_day(tmp_path, "2025-12-31")
+    assert find_prev_month_csv(tmp_path, "q1", "2026-01-05") == december
+
+
+def test_rows_reflect_file_changes(tmp_path):
+    path = add_day(tmp_path, "2026-01-10")
+    record(tmp_path, "2026-01-10")
+    manifest = DataManifest.load(tmp_path)
+    assert manifest.rows("q1", "2026-01-10", path) == 1
+    path.write_text("lead_date,dimension\n2026-01-05,LIS\n2026-01-06,DIS\n", encoding="utf-8")
+    assert manifest.rows("q1", "2026-01-10", path) is None  # 記録時と内容が違う
@@ -0,0 +1,151 @@
+"""Notion ページの差分更新（NOTION_PAGE_MODE=day/month）をスタブサーバーで確認する。
+
+どの編集でも差分反映後のページ内容が新しいブロックと一致すること、変更がなければ
+書き込みのリクエストを送らないことを見る。
+"""
+
+import pytest
+
+import publish_report as pr
+from stub_server import StubServer
+
+DB = "db-test"
+
+BASE = """## サマリ
+
+- 着電 120件（前月比 +5.0%）
+- SAL 30件
+
+## チャネル別
+
+| チャネル | リード | SAL率 |
+| --- | --- | --- |
+| LIS | 100 | 20.0% |
+| DIS | 50 | 10.0% |
+
+## 所感
+
+LIS は堅調。
+DIS は要確認。
+"""
+
+EDITS = {
+    "unchanged": BASE,
+    "text_updated": BASE.replace("着電 120件", "着電 125件"),
+    "table_updated": BASE.replace("| DIS | 50 | 10.0% |", "| DIS | 55 | 12.0% |"),
+    "appended": BASE + "\n## 追記\n\n- 新しい項目\n",
+    "removed": BASE.replace("- SAL 30件\n", ""),
+    "first_block_changed": BASE.replace("## サマリ", "## 概要"),
+    "reordered": BASE.replace("LIS は堅調。\nDIS は要確認。", "DIS は要確認。\nLIS は堅調。"),
+}
+
+WRITES = ("POST /v1/pages", "PATCH /v1/blocks/{id}/children", "PATCH /v1/blocks/{id}",
+          "DELETE /v1/blocks/{id}")
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StubServer(latency_ms=0, per_block_ms=0) as server:
+        yield server
+
+
+@pytest.fixture
+def stub(server, monkeypatch):
+    server.reset()
+    monkeypatch.setattr(pr, "NOTION_API", f"{server.url}/v1")
+    return server
+
+
+def blocks_of(markdown):
+    return pr.compact_blocks(pr.markdown_to_blocks(markdown))
+
+
+def page_fingerprints(page_id):
+    """スタブ上のページのブロックを API 経由で読み直した内容ハッシュ。"""
+    out = []
+    for block in pr.list_child_blocks("key", page_id):
+        children = pr.list_child_blocks("key", block["id"]) if block.get("has_children") else None
+        out.append(pr.block_fingerprint(block, children))
+    return out
+
+
+def write_requests(stub):
+    requests = stub.stats()["requests"]
+    return {k: n for k, n in requests.items() if k in WRITES}
+
+
+def test_fingerprint_matches_api_form(stub):
+    """送信形式と API の返却形式（annotations の既定値・plain_text 付き）で同じハッシュ。"""
+    blocks = blocks_of(BASE)
+    url, complete = pr.upsert_notion_page("key", DB, "t", blocks, "day")
+    page = pr.find_notion_page("key", DB, pr.notion_page_title(pr.datetime.now(pr.JST), "day"))
+    assert url and complete and page is not None
+    assert page_fingerprints(page["id"]) == [pr.block_fingerprint(b) for b in blocks]
+
+
+@pytest.mark.parametrize("edit", sorted(EDITS))
+def test_upsert_converges_to_new_content(stub, edit):
+    pr.upsert_notion_page("key", DB, "t", blocks_of(BASE), "day")
+    page = pr.find_notion_page("key", DB, pr.notion_page_title(pr.datetime.now(pr.JST), "day"))
+    before = write_requests(stub)
+
+    new_blocks = blocks_of(EDITS[edit])
+    pr.upsert_notion_page("key", DB, "t", new_blocks, "day")
+
+    assert page_fingerprints(page["id"]) == [pr.block_fingerprint(b) for b in new_blocks]
+    assert stub.stats()["pages"] == 1  # 新しいページを作らない
+    writes = {k: n - before.get(k, 0) for k, n in write_requests(stub).items()
+              if n != before.get(k, 0)}
+    if edit == "unchanged":
+        assert writes == {}
+    else:
+        assert writes
+
+
+def test_in_place_update_uses_patch(stub):
+    """同種ブロックの書き換えは削除・挿入ではなく PATCH /blocks/{id} で反映する。"""
+    pr.upsert_notion_page("key", DB, "t", blocks_of(BASE), "day")
+    before = write_requests(stub)
+    pr.upsert_notion_page("key", DB, "t", blocks_of(EDITS["text_updated"]), "day")
+    after = write_requests(stub)
+    assert after.get("PATCH /v1/blocks/{id}", 0) - before.get("PATCH /v1/blocks/{id}", 0) == 1
+    assert after.get("DELETE /v1/blocks/{id}", 0) == before.get("DELETE /v1/blocks/{id}", 0)
+
+
+def fail_requests(monkeypatch, method, children):
+    """method のリクエストのうち /children への（children=False ならそれ以外の）ものを失敗させる。"""
+    real = pr._notion_req
+
+    def req(m, path, *args, **kwargs):
+        if m == method and path.endswith("/children") == children:
+            return None
+        return real(m, path, *args, **kwargs)
+
+    monkeypatch.setattr(pr, "_notion_req", req)
+
+
+def test_create_reports_incomplete_page(stub, monkeypatch):
+    """ページは作成できても本文の追記に失敗したら未完了として返す。"""
+    blocks = blocks_of("\n".join(f"- 項目 {i}" for i in range(pr.MAX_BLOCKS + 10)))
+    assert len(pr.chunk_blocks(blocks)) == 2
+    fail_requests(monkeypatch, "PATCH", True)
+    url, complete = pr.create_notion_page("key", DB, "t", blocks)
+    assert url and not complete
+
+
+def test_sections_report_failed_child_upload(stub, monkeypatch):
+    body = "# t\n\n- サマリ\n\n## 大きいセクション\n\n" + "\n".join(
+        f"- 項目 {i}" for i in range(pr.SECTION_INLINE_BLOCKS + 5))
+    assert pr.plan_sections(body)[1]
+    url, complete = pr.create_notion_page_sections("key", DB, "t", body)
+    assert url and complete
+    fail_requests(monkeypatch, "PATCH", True)
+    url, complete = pr.create_notion_page_sections("key", DB, "t", body)
+    assert url and not complete
+
+
+def test_upsert_reports_failed_update(stub, monkeypatch):
+    pr.upsert_notion_page("key", DB, "t", blocks_of(BASE), "day")
+    fail_requests(monkeypatch, "PATCH", False)  # PATCH /blocks/{id} による書き換え
+    url, complete = pr.upsert_notion_page("key", DB, "t", blocks_of(EDITS["text_updated"]), "day")
+    assert url and not complete
@@ -0,0 +1,107 @@
+"""重複排除ストアのリプレイ・復元と変更件数の確認。"""
+
+import os
+import random
+
+import pytest
+
+from compute_tables import find_csv, stored_day_info
+from generate_data import generate
+from ingest import store_snapshot
+from snapshot_store import STORE_DIR, SnapshotStore
+
+HEADER = ["id", "name", "month", "score"]
+
+
+def day_rows(seed, n=300):
+    rng = random.Random(seed)
+    return [[f"L{i:04d}", rng.choice(["山田", "Smith", ""]), "2026-02-01", str(rng.randrange(5))]
+            for i in range(n)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(tmp_path / "_store")
+
+
+def test_every_day_restores_exactly(store):
+    rng = random.Random(0)
+    days = {}
+    rows = day_rows(0)
+    for d in range(1, 8):
+        rows = [list(r) for r in rows if rng.random() > 0.05]      # 削除
+        for r in rng.sample(rows, 20):
+            r[3] = str(int(r[3]) + 1)                               # 変更
+        rows += [[f"N{d}{i:03d}", "新規", "2026-02-01", "0"] for i in range(10)]
+        rng.shuffle(rows)                                           # 行順の入れ替え
+        if d == 4:
+            rows.append(list(rows[0]))                              # 同じキーの重複行
+        date_str = f"2026-02-{d:02d}"
+        store.append("q4", date_str, HEADER, rows, ["id"])
+        days[date_str] = [list(r) for r in rows]
+    for date_str, expected in days.items():
+        assert store.view("q4", date_str) == (HEADER, expected)
+
+
+def test_header_change_and_missing_cells(store):
+    store.append("q6", "2026-02-01", HEADER, day_rows(1), ["id"])
+    header2 = ["id", "name", "score", "stage"]
+    rows2 = [[r[0], r[1], r[3], "商談"] for r in day_rows(1)]
+    rows2[5] = rows2[5][:2]                                         # 不足セル
+    store.append("q6", "2026-02-02", header2, rows2, ["id"])
+    restored = store.view("q6", "2026-02-02")
+    assert restored[0] == header2
+    assert restored[1][5] == rows2[5] + [None, None]
+    assert restored[1][:5] == rows2[:5]
+    assert store.view("q6", "2026-02-01") == (HEADER, day_rows(1))
+    assert store.day_info("q6", "2026-02-02")["header_changed"]
+
+
+def test_unkeyed_day_uses_whole_row(store):
+    store.append("q6", "2026-02-01", HEADER, day_rows(2), ["opportunity_id"])
+    info = store.day_info("q6", "2026-02-01")
+    assert not info["keyed"]
+    rows = day_rows(2)[1:]
+    info = store.append("q6", "2026-02-02", HEADER, rows, ["opportunity_id"])
+    assert (info["added"], info["changed"], info["removed"]) == (0, 0, 1)
+    assert store.view("q6", "2026-02-02") == (HEADER, rows)
+
+
+def test_format_only_changes_are_not_entity_changes(store):
+    rows = day_rows(3)
+    store.append("q4", "2026-02-01", HEADER, [r[:2] + ["2026-02-01T00:00:00.000Z"] + r[3:]
+                                             for r in rows], ["id"])
+    changed = [list(r) for r in rows]
+    changed[0][3] = "99"
+    info = store.append("q4", "2026-02-02", HEADER, changed, ["id"])
+    assert info["changed"] == 1
+    assert info["changed_columns"] == {"score": 1}
+    assert info["format_columns"] == {"month": len(rows)}
+    assert store.view("q4", "2026-02-02") == (HEADER, changed)
+
+
+def test_append_rejects_older_dates(store):
+    store.append("q4", "2026-02-02", HEADER, day_rows(4), ["id"])
+    with pytest.raises(ValueError):
+        store.append("q4", "2026-02-01", HEADER, day_rows(4), ["id"])
+
+
+def test_stored_day_info_detects_same_size_edit(tmp_path):
+    """CSV がサイズそのままで書き換えられたらストアの日付情報を使わない（mtime → sha256）。"""
+    data_dir = tmp_path / "data"
+    generate(data_dir, "2026-02-27", 300, n_reps=4, cv_contents=10, months=2, seed=0)
+    store_snapshot(SnapshotStore(data_dir / STORE_DIR), data_dir, "2026-02-27")
+    path = find_csv(data_dir, "q4", "2026-02-27")
+    assert stored_day_info(data_dir, "q4", "2026-02-27", path) is not None
+
+    # 内容が同じなら mtime が変わっても使える
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert stored_day_info(data_dir, "q4", "2026-02-27", path) is not None
+
+    data = bytearray(path.read_bytes())
+    i = next(i for i in range(data.index(b"\n"), len(data)) if data[i:i + 1].isdigit())
+    data[i] = ord("1") if data[i] != ord("1") else ord("2")
+    path.write_bytes(bytes(data))
+    assert path.stat().st_size == st.st_size
+    assert stored_day_info(data_dir, "q4", "2026-02-27", path) is None
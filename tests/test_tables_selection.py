@@ -0,0 +1,56 @@
+"""compute_tables.py --tables（指定テーブルだけを計算・書き出し）の確認。"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from compute_tables import RESULTS_FILENAME, TABLE_GROUPS
+from generate_data import generate
+
+SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "compute_tables.py"
+DATE = "2026-02-27"
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    root = tmp_path_factory.mktemp("data")
+    generate(root, DATE, 2000, n_reps=6, cv_contents=20, months=3)
+    return root
+
+
+def run_tables(data_dir, out_dir, tables):
+    return subprocess.run(
+        [sys.executable, str(SCRIPT), "--date", DATE, "--data-dir", str(data_dir),
+         "--output-dir", str(out_dir), "--no-cache", "--tables", tables],
+        capture_output=True, text=True,
+    )
+
+
+def listed_files(stdout):
+    """完了サマリの「ファイル数」とその次行のファイル名一覧。"""
+    lines = stdout.splitlines()
+    i = next(i for i, line in enumerate(lines) if "ファイル数:" in line)
+    return int(lines[i].split(":")[1]), set(lines[i + 1].strip().split(", "))
+
+
+@pytest.mark.parametrize("tables, expected", [
+    ("publish", set(TABLE_GROUPS["publish"])),
+    ("step2_SALスピード", {"step2_SALスピード.md"}),
+    ("funnel", {"step2_ファネル転換率.md", RESULTS_FILENAME}),
+])
+def test_writes_and_lists_selected_files(data_dir, tmp_path, tables, expected):
+    result = run_tables(data_dir, tmp_path, tables)
+    assert result.returncode == 0, result.stdout + result.stderr
+    expected = expected | {"_validation.md"}
+    count, names = listed_files(result.stdout)
+    assert names == expected
+    assert count == len(expected)
+    assert {p.name for p in tmp_path.iterdir()} == expected | {"_perf.json"}
+
+
+def test_unknown_table_is_rejected(data_dir, tmp_path):
+    result = run_tables(data_dir, tmp_path, "no_such_table")
+    assert result.returncode == 2
+    assert "no_such_table" in result.stderr